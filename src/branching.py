@@ -0,0 +1,96 @@
+import os
+import time
+import marshal
+import hashlib
+import traceback
+import argparse
+import emulator
+import hamboy
+
+#Explores input branches from one game state. branch() forks the headless
+#emulator once per input sequence, the children start with the parent's
+#memory, registers and events as they are, copied on write by the kernel,
+#play their sequence and send back a hash of the screen and the RAM values
+#asked for through a pipe. Nothing is copied by hand. POSIX only, and the
+#process must not have other threads running (no Tk).
+
+def screen_hash(instance):
+    return hashlib.sha1(b"".join(bytes(line) for line in instance.screen())).hexdigest()
+
+#sequences are lists of joypad bits, one per frame. At most processes
+#children are alive at once. Results are (screen hash, ram values) in the
+#order of sequences, or None for a child that failed.
+def branch(instance, sequences, ram_addresses = (), processes = None):
+    processes = processes or os.cpu_count() or 1
+    results = [None for sequence in sequences]
+    running = []
+    for index, sequence in enumerate(sequences):
+        if len(running) >= processes:
+            collect(running.pop(0), results)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = 1
+            try:
+                play(instance, sequence, ram_addresses, write_fd)
+                status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        running.append((index, pid, read_fd))
+    for child in running:
+        collect(child, results)
+    return results
+
+def play(instance, sequence, ram_addresses, write_fd):
+    # battery RAM is a shared mapping of the .sav file, a branch gets its own
+    instance._hamulator._cart.close_save()
+    for buttons in sequence:
+        instance.run_frame(buttons)
+    data = marshal.dumps((screen_hash(instance), [instance.read_mem(addr) for addr in ram_addresses]))
+    while data:
+        data = data[os.write(write_fd, data):]
+    os.close(write_fd)
+
+def collect(child, results):
+    index, pid, read_fd = child
+    chunks = []
+    while True:
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+    if status == 0:
+        results[index] = marshal.loads(b"".join(chunks))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play a ROM headless, then try every button held on its own from that point.')
+    parser.add_argument('-s', help='frames to run before branching', type=int, default=60)
+    parser.add_argument('-m', help='frames each branch runs', type=int, default=30)
+    parser.add_argument('-a', help='RAM addresses to report, comma separated hex, e.g. FE04,FE05', default="")
+    parser.add_argument('-u', help='print unimplemented instructions', action="store_true")
+    parser.add_argument('rom_file', help='rom file')
+    args = parser.parse_args()
+
+    ram_addresses = [int(addr, 16) for addr in args.a.split(",") if addr]
+    instance = hamboy.HeadlessRenderer(emulator.Emulator(emulator.read_rom(args.rom_file, save = False)), args.u)
+    for frame in range(0, args.s):
+        instance.run_frame()
+
+    buttons = ("NONE",) + hamboy.JOYPAD_BUTTONS
+    sequences = [[hamboy.JOYPAD_BUTTON_MASKS.get(button, 0)] * args.m for button in buttons]
+    start = time.monotonic()
+    results = branch(instance, sequences, ram_addresses)
+    elapsed = time.monotonic() - start
+    for button, result in zip(buttons, results):
+        if result is None:
+            print(f"{button:<7} failed")
+        else:
+            print(f"{button:<7} {result[0][:16]} " + " ".join("{0:02X}".format(value) for value in result[1]))
+    print(f"{len(sequences)} branches of {args.m} frames in {elapsed:.2f} s")
+    instance.end()
@@ -0,0 +1,287 @@
+import sys
+import disassembler
+import rom_cache
+
+#Breakpoints and watchpoints for the driver's run loop. Nothing is checked per
+#instruction: a breakpoint wraps the handler of the one opcode at its address,
+#a watchpoint adds entries to the driver's IO read/write tables for the
+#addresses it covers and marks their pages for the read hooks, and stepping
+#swaps in a whole table of pausing handlers. With none set, the run loop is
+#exactly what it was.
+
+REGISTERS = ("a", "f", "b", "c", "d", "e", "h", "l", "sp", "pc")
+
+def parse_address(text):
+    return int(text.lstrip("$"), 16)
+
+#"C000" or "C000-C0FF", inclusive
+def parse_range(text):
+    if "-" in text:
+        start, end = text.split("-", 1)
+        return parse_address(start), parse_address(end)
+    return parse_address(text), parse_address(text)
+
+class Debugger:
+    def __init__(self, driver):
+        self._driver = driver
+        self._hamulator = driver._hamulator
+        self._breakpoints = {} # address: compiled condition or None
+        self._wrapped = {}     # opcode: handler it had before the breakpoint wrapped it
+        self._read_watches = set()
+        self._write_watches = set()
+        self._chained_reads = {}  # address: IO read handler the watchpoint replaced
+        self._chained_writes = {} # address: IO write handler the watchpoint replaced
+        self._stepping = None  # the real handler table while single stepping
+        self._reason = None
+        self.watch_hit = None  # (kind, address) of the watchpoint behind this pause
+        self._code = None      # the ROM's blocks and loops, from the first listing on
+        self.on_pause = self.console
+
+    def opcode_at(self, addr):
+        mem = self._hamulator._mem
+        opcode = mem[addr]
+        if opcode == 0xCB:
+            opcode = 0xCB00 | mem[(addr + 1) & 0xFFFF]
+        return opcode
+
+    #the handlers in the real table, even while stepping
+    def isa(self):
+        return self._stepping if self._stepping is not None else self._hamulator._isa
+
+    # breakpoints
+
+    #the opcode is the one at the address when the breakpoint is set, code that
+    #changes under it (bank switches, code in RAM) needs the breakpoint set again
+    def add_breakpoint(self, addr, condition = None):
+        code = compile(condition, "<condition>", "eval") if condition else None
+        self._breakpoints[addr] = code
+        opcode = self.opcode_at(addr)
+        if opcode in self._wrapped:
+            return
+        self._driver.prepare_opcode(opcode)
+        isa = self.isa()
+        if opcode not in isa:
+            return
+        handler = isa[opcode]
+        self._wrapped[opcode] = handler
+        size = 1 if opcode < 256 else 2
+        regs = self._hamulator._regs
+        breakpoints = self._breakpoints
+        def break_catch():
+            addr = regs["pc"] - size
+            if addr in breakpoints and self.condition_met(breakpoints[addr], addr):
+                if not self.pause(opcode, addr, size, f"breakpoint ${addr:04X}"):
+                    return
+            handler()
+        isa[opcode] = break_catch
+
+    def remove_breakpoint(self, addr):
+        self._breakpoints.pop(addr, None)
+        # put the handler back once no breakpoint uses its opcode
+        used = {self.opcode_at(bp) for bp in self._breakpoints}
+        for opcode in list(self._wrapped):
+            if opcode not in used:
+                self.isa()[opcode] = self._wrapped.pop(opcode)
+
+    def condition_met(self, code, addr):
+        if code is None:
+            return True
+        regs = self._hamulator._regs
+        names = {name: regs[name] for name in REGISTERS}
+        names.update(pc = addr,
+                     af = regs["a"] << 8 | regs["f"], bc = regs["b"] << 8 | regs["c"],
+                     de = regs["d"] << 8 | regs["e"], hl = regs["h"] << 8 | regs["l"],
+                     mem = self._hamulator._mem)
+        try:
+            return eval(code, {}, names)
+        except Exception as e:
+            print(f"debugger: condition at ${addr:04X} failed, {e}", flush=True)
+            return True
+
+    # watchpoints
+
+    #the access is reported at the start of the next instruction, the one
+    #that made it has finished by then
+    def add_watch(self, start, end, kinds = "w"):
+        for addr in range(start, end + 1):
+            if "r" in kinds and addr not in self._read_watches:
+                self._read_watches.add(addr)
+                chained = self._driver._io_reads.get(addr)
+                if chained is not None:
+                    self._chained_reads[addr] = chained
+                self._driver._io_reads[addr] = self.watch_catch(addr, "read", chained)
+            if "w" in kinds and addr not in self._write_watches:
+                self._write_watches.add(addr)
+                chained = self._driver._io_writes.get(addr)
+                if chained is not None:
+                    self._chained_writes[addr] = chained
+                self._driver._io_writes[addr] = self.watch_catch(addr, "write", chained)
+        self._driver.update_io_read_pages()
+
+    def remove_watch(self, start, end, kinds = "rw"):
+        for addr in range(start, end + 1):
+            if "r" in kinds and addr in self._read_watches:
+                self._read_watches.remove(addr)
+                self.unchain(self._driver._io_reads, self._chained_reads, addr)
+            if "w" in kinds and addr in self._write_watches:
+                self._write_watches.remove(addr)
+                self.unchain(self._driver._io_writes, self._chained_writes, addr)
+        self._driver.update_io_read_pages()
+
+    def unchain(self, table, chained, addr):
+        if addr in chained:
+            table[addr] = chained.pop(addr)
+        else:
+            del table[addr]
+
+    def watch_catch(self, addr, kind, chained):
+        mem = self._hamulator._mem
+        def catch():
+            if chained is not None:
+                chained()
+            # a read is caught before the load, a write after the store
+            self.watch_hit = (kind, addr)
+            self.step(f"{kind} watchpoint ${addr:04X}, value ${mem[addr]:02X}")
+        return catch
+
+    # pausing
+
+    #pause before the next instruction, whatever it is
+    def step(self, reason = None):
+        self._reason = reason
+        if self._stepping is not None:
+            return
+        self._stepping = self._hamulator._isa
+        for opcode in self._driver._all_ops:
+            self._driver.prepare_opcode(opcode)
+        # past any breakpoint, the step has paused already
+        stepping = {}
+        for opcode, handler in self._stepping.items():
+            stepping[opcode] = self.step_catch(opcode, self._wrapped.get(opcode, handler))
+        self._hamulator._isa = stepping
+
+    def step_catch(self, opcode, handler):
+        size = 1 if opcode < 256 else 2
+        regs = self._hamulator._regs
+        def catch():
+            self._hamulator._isa = self._stepping
+            self._stepping = None
+            if self.pause(opcode, regs["pc"] - size, size, self._reason or "step"):
+                handler()
+        return catch
+
+    def remove_all(self):
+        for addr in list(self._breakpoints):
+            self.remove_breakpoint(addr)
+        self.remove_watch(0, 0xFFFF)
+
+    #pc is wound back to the instruction while paused, so it reads as the
+    #address of the next instruction to run. False when it was moved
+    #elsewhere and the instruction should not run.
+    def pause(self, opcode, addr, size, reason):
+        self._reason = None
+        regs = self._hamulator._regs
+        regs["pc"] = addr
+        self.on_pause(reason)
+        self.watch_hit = None
+        if regs["pc"] == addr:
+            regs["pc"] = addr + size
+            return True
+
+        # the run loop still checks the stores of the skipped opcode, once
+        ram_catch = self._driver._ram_catch
+        store_catch = ram_catch[opcode]
+        def skip_catch():
+            ram_catch[opcode] = store_catch
+        ram_catch[opcode] = skip_catch
+        return False
+
+    #memory written from the debugger, the screen is redrawn in case it was VRAM or OAM
+    def poke(self, addr, values):
+        self._hamulator._mem[addr:addr + len(values)] = values
+        if addr < 0xC000 and addr + len(values) > 0xA000:
+            self._hamulator.save_ram()
+        self._driver._bg_changes += 1
+        self._driver._window_changes += 1
+        self._driver._sprite_changes += 1
+
+    def print_registers(self):
+        regs = self._hamulator._regs
+        f = regs["f"]
+        flags = "".join(flag if f & bit else "-" for flag, bit in (("Z", 0x80), ("N", 0x40), ("H", 0x20), ("C", 0x10)))
+        print("af ${0:02X}{1:02X} bc ${2:02X}{3:02X} de ${4:02X}{5:02X} hl ${6:02X}{7:02X} sp ${8:04X} pc ${9:04X} {10} ime {11} cycles {12}".format(
+              regs["a"], f, regs["b"], regs["c"], regs["d"], regs["e"], regs["h"], regs["l"],
+              regs["sp"], regs["pc"], flags, int(self._hamulator._interrupts_enabled), self._hamulator._cycles), flush=True)
+
+    def code(self):
+        if self._code is None:
+            self._code = rom_cache.load_code(self._hamulator._cart)
+        return self._code
+
+    #from the start of pc's block when the ROM analysis knows it
+    def disassemble(self, pc, after = 6):
+        start = pc
+        blocks = self.code()["blocks"]
+        for block_start, block in blocks.items():
+            if block_start <= pc < block[0] and pc - block_start < 0x20 and block_start < start:
+                start = block_start
+        lines = []
+        addr = start
+        while addr <= 0xFFFD and (addr <= pc or after > 0):
+            if addr > pc:
+                after -= 1
+            instr = disassembler.Instruction(self._hamulator._mem, addr)
+            marker = "=>" if addr == pc else "  "
+            lines.append("{0} {1:04X}  {2:<9} {3}".format(marker, addr, instr.bytes.hex(" ").upper(), instr.text()))
+            addr += max(instr.length, 1)
+        print("\n".join(lines), flush=True)
+
+    def dump(self, addr, count = 16):
+        mem = self._hamulator._mem
+        for row in range(addr, min(addr + count, 0x10000), 16):
+            values = mem[row:min(row + 16, addr + count, 0x10000)]
+            print("{0:04X}  {1}".format(row, " ".join("{0:02X}".format(value) for value in values)), flush=True)
+
+    #paused from the emulation thread, Tk carries on drawing the last frame
+    def console(self, reason):
+        print(f"debugger: {reason}", flush=True)
+        self.print_registers()
+        self.disassemble(self._hamulator._regs["pc"])
+        while True:
+            sys.stdout.write("(hamboy) ")
+            sys.stdout.flush()
+            line = sys.stdin.readline()
+            if not line:
+                return
+            words = line.split()
+            if not words:
+                continue
+            command, args = words[0], words[1:]
+            try:
+                if command == "c":
+                    return
+                elif command == "s":
+                    self.step()
+                    return
+                elif command == "r":
+                    self.print_registers()
+                elif command == "l":
+                    self.disassemble(parse_address(args[0]) if args else self._hamulator._regs["pc"])
+                elif command == "x":
+                    self.dump(parse_address(args[0]), int(args[1], 0) if len(args) > 1 else 16)
+                elif command == "b":
+                    self.add_breakpoint(parse_address(args[0]), " ".join(args[1:]) or None)
+                elif command == "d":
+                    self.remove_breakpoint(parse_address(args[0]))
+                elif command == "w":
+                    self.add_watch(*parse_range(args[0]), args[1] if len(args) > 1 else "w")
+                elif command == "u":
+                    self.remove_watch(*parse_range(args[0]))
+                elif command == "q":
+                    self._driver._ending = True
+                    return
+                else:
+                    print("c continue, s step, r registers, l [addr] list, x addr [count] dump,\n"
+                          "b addr [condition] break, d addr delete, w start[-end] [r|w|rw] watch, u start[-end] unwatch, q quit", flush=True)
+            except (IndexError, ValueError, SyntaxError) as e:
+                print(f"debugger: {e}", flush=True)
@@ -0,0 +1,384 @@
+import sys
+import json
+import time
+import argparse
+import emulator
+import opcodes
+
+#Static analysis of a ROM: recursive disassembly from the entry point and the
+#interrupt vectors into basic blocks, with the IO/VRAM accesses and loops of
+#each block annotated. Only the 32 KB mapped at boot is followed, jumps and
+#calls anywhere else (HRAM routines, other banks) are listed as external.
+
+ENTRY_POINT = 0x0100
+ROM_END = 0x8000
+
+#IO registers by their hardware.inc names
+IO_NAMES = \
+    {0xFF00: "rP1",
+     0xFF01: "rSB",
+     0xFF02: "rSC",
+     0xFF04: "rDIV",
+     0xFF05: "rTIMA",
+     0xFF06: "rTMA",
+     0xFF07: "rTAC",
+     0xFF0F: "rIF",
+     0xFF40: "rLCDC",
+     0xFF41: "rSTAT",
+     0xFF42: "rSCY",
+     0xFF43: "rSCX",
+     0xFF44: "rLY",
+     0xFF45: "rLYC",
+     0xFF46: "rDMA",
+     0xFF47: "rBGP",
+     0xFF48: "rOBP0",
+     0xFF49: "rOBP1",
+     0xFF4A: "rWY",
+     0xFF4B: "rWX",
+     0xFFFF: "rIE"}
+
+#(first address past the region, name)
+REGIONS = ((0x8000, "rom"),
+           (0xA000, "vram"),
+           (0xC000, "sram"),
+           (0xE000, "wram"),
+           (0xFE00, "echo"),
+           (0xFEA0, "oam"),
+           (0xFF00, "unusable"),
+           (0xFF80, "io"),
+           (0xFFFF, "hram"),
+           (0x10000, "io"))
+
+def region(addr):
+    for end, name in REGIONS:
+        if addr < end:
+            return name
+
+def address_name(addr):
+    if addr in IO_NAMES:
+        return IO_NAMES[addr]
+    return "${0:04X}".format(addr)
+
+class Instruction:
+    def __init__(self, rom, addr):
+        self.addr = addr
+        self.opcode = rom[addr]
+        if self.opcode == 0xCB and addr + 1 < len(rom):
+            self.opcode = 0xCB00 | rom[addr + 1]
+        self.mnemonic, self.length, self.cycles, self.cycles_not_taken, self.flags = opcodes.OPCODES[self.opcode]
+
+        opcode_bytes = 1 if self.opcode < 256 else 2
+        self.bytes = bytes(rom[addr:addr + max(self.length, 1)])
+        # cut off by the end of the image, it reads as an undefined opcode
+        # (length 0), which ends a block like one
+        if len(self.bytes) < self.length:
+            self.mnemonic, self.length, self.cycles, self.cycles_not_taken, self.flags = opcodes.OPCODES[0xD3]
+        operands = self.bytes[opcode_bytes:]
+
+        # the one immediate, if there is one
+        self.value = None
+        if "n16" in self.mnemonic:
+            self.value = operands[0] | operands[1] << 8
+        elif "a8" in self.mnemonic:
+            self.value = 0xFF00 + operands[0]
+        elif "n8" in self.mnemonic:
+            self.value = operands[0]
+        elif "s8" in self.mnemonic:
+            self.value = operands[0] if operands[0] < 128 else operands[0] - 256
+
+        words = self.mnemonic.split(" ")
+        self.name = words[0]
+        self.operands = words[1].split(",") if len(words) > 1 else []
+
+        # where control can go next
+        self.target = None
+        self.falls_through = True
+        self.is_call = False
+        if self.name in ("jp", "jr", "call", "rst", "ret", "reti"):
+            conditional = len(self.operands) > 1 or (self.name in ("ret", "reti") and self.operands)
+            if self.name == "jr":
+                self.target = addr + self.length + self.value
+            elif self.name == "rst":
+                self.target = int(self.operands[0][:-1], 16)
+            elif self.operands and self.operands[-1] == "n16":
+                self.target = self.value
+            self.is_call = self.name in ("call", "rst")
+            self.falls_through = conditional or self.is_call
+
+        # constant addresses read or written
+        self.reads = []
+        self.writes = []
+        for i, operand in enumerate(self.operands):
+            if operand[0] != "[":
+                continue
+            inner = operand[1:-1]
+            if inner in ("n16", "a8"):
+                addr_read = self.value
+            elif inner == "c":
+                addr_read = "io"
+            else:
+                continue
+            if i == 0 and (self.name.startswith("ld") or len(self.operands) == 1):
+                self.writes.append(addr_read)
+            else:
+                self.reads.append(addr_read)
+
+        # ld hl,$9800 and friends, the pointer is noted when it is not into ROM
+        self.pointer = None
+        if self.name == "ld" and self.operands[0] in ("bc", "de", "hl") and self.operands[1] == "n16" and self.value >= ROM_END:
+            self.pointer = self.value
+
+    def text(self):
+        operands = []
+        for operand in self.operands:
+            if "n16" in operand or "a8" in operand:
+                operand = operand.replace("n16", address_name(self.value)).replace("a8", address_name(self.value))
+            elif "n8" in operand:
+                operand = operand.replace("n8", "${0:02X}".format(self.value))
+            elif "s8" in operand:
+                if self.name == "jr":
+                    operand = "${0:04X}".format(self.target)
+                else:
+                    operand = operand.replace("+s8", "{0:+d}".format(self.value)).replace("s8", "{0:+d}".format(self.value))
+            operands.append(operand)
+        return self.name + (" " + ",".join(operands) if operands else "")
+
+    def annotation(self):
+        notes = []
+        for addr in self.reads:
+            notes.append("reads " + (addr if addr == "io" else region(addr) + " " + address_name(addr)))
+        for addr in self.writes:
+            notes.append("writes " + (addr if addr == "io" else region(addr) + " " + address_name(addr)))
+        if self.pointer is not None:
+            notes.append("points at " + region(self.pointer) + " " + address_name(self.pointer))
+        if self.target is not None and not 0 <= self.target < ROM_END:
+            notes.append("external")
+        return ", ".join(notes)
+
+class Block:
+    def __init__(self, start):
+        self.start = start
+        self.end = start
+        self.instructions = []
+        self.successors = []
+        self.predecessors = []
+        self.calls = []
+        self.external = []
+        self.loop_header = False
+
+    def accesses(self):
+        reads = set()
+        writes = set()
+        for instr in self.instructions:
+            reads.update(instr.reads)
+            writes.update(instr.writes)
+        return reads, writes
+
+class Loop:
+    def __init__(self, header, latches, blocks):
+        self.header = header
+        self.latches = latches
+        self.blocks = blocks
+        self.reads = set()
+        self.writes = set()
+        self.halts = False
+
+    #a loop that only polls IO (or halts) and writes nothing is waiting for the hardware
+    def is_idle(self):
+        io_reads = [addr for addr in self.reads if addr == "io" or region(addr) == "io"]
+        return (bool(io_reads) or self.halts) and not self.writes
+
+class Analysis:
+    def __init__(self, rom):
+        self._rom = rom
+        self.roots = [ENTRY_POINT] + [vector for vector in emulator.INTERRUPT_VECTORS if self.has_code(vector)]
+        self.instructions = {}
+        self.functions = set()
+        self.blocks = {}
+        self.loops = []
+
+        self.decode()
+        self.build_blocks()
+        self.find_loops()
+
+    #vectors that are all $00 or $FF are not set up
+    def has_code(self, addr):
+        return addr < len(self._rom) and any(self._rom[addr + i] not in (0x00, 0xFF) for i in range(0, 8))
+
+    def in_rom(self, addr):
+        return 0 <= addr < min(len(self._rom), ROM_END)
+
+    #recursive descent from the roots, with a worklist instead of recursion
+    def decode(self):
+        work = list(self.roots)
+        self.leaders = set(self.roots)
+        while work:
+            addr = work.pop()
+            while self.in_rom(addr) and addr not in self.instructions:
+                instr = Instruction(self._rom, addr)
+                if instr.length == 0:
+                    break
+                self.instructions[addr] = instr
+                next_addr = addr + instr.length
+
+                if instr.target is not None and self.in_rom(instr.target):
+                    self.leaders.add(instr.target)
+                    work.append(instr.target)
+                    if instr.is_call:
+                        self.functions.add(instr.target)
+                if instr.target is not None or instr.name in ("ret", "reti") or instr.mnemonic == "jp hl":
+                    self.leaders.add(next_addr)
+
+                if not instr.falls_through:
+                    break
+                addr = next_addr
+
+    def build_blocks(self):
+        for leader in sorted(self.leaders):
+            if leader not in self.instructions:
+                continue
+            block = Block(leader)
+            addr = leader
+            while True:
+                instr = self.instructions[addr]
+                block.instructions.append(instr)
+                addr += instr.length
+                if instr.target is not None:
+                    if not self.in_rom(instr.target):
+                        block.external.append(instr.target)
+                    elif instr.is_call:
+                        block.calls.append(instr.target)
+                    else:
+                        block.successors.append(instr.target)
+                if not instr.falls_through:
+                    break
+                if addr in self.leaders or addr not in self.instructions:
+                    if addr in self.instructions:
+                        block.successors.append(addr)
+                    break
+            block.end = addr
+            self.blocks[leader] = block
+
+        # a branch to an undefined opcode has nowhere to go
+        for block in self.blocks.values():
+            block.successors = [successor for successor in block.successors if successor in self.blocks]
+            for successor in block.successors:
+                self.blocks[successor].predecessors.append(block.start)
+
+    #back edges found by a depth first search, each with its natural loop
+    def find_loops(self):
+        state = {} # 1 on the stack, 2 done
+        back_edges = {}
+        for root in sorted(set(self.roots) | self.functions):
+            if root in state or root not in self.blocks:
+                continue
+            state[root] = 1
+            stack = [(root, iter(self.blocks[root].successors))]
+            while stack:
+                start, successors = stack[-1]
+                for successor in successors:
+                    if state.get(successor) == 1:
+                        back_edges.setdefault(successor, []).append(start)
+                    elif successor not in state:
+                        state[successor] = 1
+                        stack.append((successor, iter(self.blocks[successor].successors)))
+                        break
+                else:
+                    state[start] = 2
+                    stack.pop()
+
+        for header in sorted(back_edges):
+            latches = sorted(back_edges[header])
+            body = {header}
+            work = [latch for latch in latches if latch != header]
+            body.update(work)
+            while work:
+                for predecessor in self.blocks[work.pop()].predecessors:
+                    if predecessor not in body:
+                        body.add(predecessor)
+                        work.append(predecessor)
+
+            loop = Loop(header, latches, sorted(body))
+            for start in body:
+                reads, writes = self.blocks[start].accesses()
+                loop.reads |= reads
+                loop.writes |= writes
+                loop.halts |= any(instr.name == "halt" for instr in self.blocks[start].instructions)
+            self.blocks[header].loop_header = True
+            self.loops.append(loop)
+
+    def to_text(self):
+        lines = []
+        loops = {loop.header: loop for loop in self.loops}
+        for start in sorted(self.blocks):
+            block = self.blocks[start]
+            lines.append("")
+            if start in self.roots:
+                lines.append("; entry point")
+            if start in self.functions:
+                lines.append("; function")
+            if start in loops:
+                loop = loops[start]
+                lines.append("; loop of {0} block(s), back from {1}{2}".format(len(loop.blocks),
+                    ", ".join("${0:04X}".format(latch) for latch in loop.latches), ", idle" if loop.is_idle() else ""))
+            lines.append("; block ${0:04X}-${1:04X}, from {2}".format(block.start, block.end - 1,
+                ", ".join("${0:04X}".format(p) for p in sorted(block.predecessors)) or "-"))
+            for instr in block.instructions:
+                line = "{0:04X}  {1:<9} {2}".format(instr.addr, instr.bytes.hex(" ").upper(), instr.text())
+                annotation = instr.annotation()
+                if annotation:
+                    line = "{0:<40}; {1}".format(line, annotation)
+                lines.append(line)
+        return "\n".join(lines)
+
+    def to_json(self):
+        def addresses(values):
+            return sorted([value if isinstance(value, str) else address_name(value) for value in values])
+
+        return {"roots": self.roots,
+                "functions": sorted(self.functions),
+                "blocks": [{"start": block.start,
+                            "end": block.end,
+                            "successors": block.successors,
+                            "predecessors": sorted(block.predecessors),
+                            "calls": block.calls,
+                            "external": block.external,
+                            "loop_header": block.loop_header,
+                            "reads": addresses(block.accesses()[0]),
+                            "writes": addresses(block.accesses()[1]),
+                            "instructions": [{"addr": instr.addr,
+                                              "bytes": instr.bytes.hex(),
+                                              "text": instr.text(),
+                                              "annotation": instr.annotation()} for instr in block.instructions]}
+                           for start, block in sorted(self.blocks.items())],
+                "loops": [{"header": loop.header,
+                           "latches": loop.latches,
+                           "blocks": loop.blocks,
+                           "reads": addresses(loop.reads),
+                           "writes": addresses(loop.writes),
+                           "idle": loop.is_idle()} for loop in self.loops]}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Disassemble a GB ROM into basic blocks.')
+    parser.add_argument('-j', help='write the analysis as JSON to this file', metavar='FILE')
+    parser.add_argument('-o', help='write the listing to this file instead of stdout', metavar='FILE')
+    parser.add_argument('-V', help='print how long the analysis took', action="store_true")
+    parser.add_argument('rom_file', help='rom file')
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    analysis = Analysis(emulator.read_rom(args.rom_file, save = False))
+    elapsed = time.monotonic() - start
+
+    if args.j:
+        with open(args.j, "w") as f:
+            json.dump(analysis.to_json(), f, indent=1)
+
+    if args.o:
+        with open(args.o, "w") as f:
+            f.write(analysis.to_text() + "\n")
+    elif not args.j:
+        print(analysis.to_text())
+
+    if args.V:
+        sys.stderr.write(f"{len(analysis.instructions)} instructions, {len(analysis.blocks)} blocks, {len(analysis.loops)} loops in {elapsed * 1000:.1f} ms\n")
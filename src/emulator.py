@@ -1,16 +1,242 @@
 import typing
+import mmap
+import os
+
+# interrupt controller
+IE = 0xFFFF # interrupt enable
+IF = 0xFF0F # interrupt flag
+# VBlank, STAT, Timer, Serial, Joypad, the lowest bit has priority
+INTERRUPT_VECTORS = (0x40, 0x48, 0x50, 0x58, 0x60)
+INTERRUPT_CYCLES = 20
+
+# cartridge header
+CART_TYPE = 0x0147
+CART_RAM_SIZE = 0x0149
+
+ROM_BANK_SIZE = 0x4000
+RAM_BANK_SIZE = 0x2000
+SRAM = 0xA000
+
+# cartridge type -> memory bank controller, None for plain 32 KB ROMs
+MBC_TYPES = {0x00: None, 0x08: None, 0x09: None,
+             0x01: 1, 0x02: 1, 0x03: 1,
+             0x0F: 3, 0x10: 3, 0x11: 3, 0x12: 3, 0x13: 3,
+             0x19: 5, 0x1A: 5, 0x1B: 5, 0x1C: 5, 0x1D: 5, 0x1E: 5}
+# cartridge types that keep their RAM on a battery
+BATTERY_TYPES = {0x03, 0x09, 0x0F, 0x10, 0x13, 0x1B, 0x1E}
+RAM_SIZES = {0x00: 0, 0x01: 0x800, 0x02: 0x2000, 0x03: 0x8000, 0x04: 0x20000, 0x05: 0x10000}
+
+# A ROM image and its memory bank controller. The image can be anything that
+# indexes and slices like bytes, read_rom hands it an mmap so big ROMs are
+# neither read up front nor copied per emulator. A bank is a view into the
+# image, so emulators of the same ROM all map the same pages and nothing is
+# copied until a bank lands in an emulator's memory.
+class Cartridge:
+    def __init__(self, data) -> None:
+        self._data = data
+        try:
+            self._view = memoryview(data)
+        except TypeError:
+            self._view = memoryview(bytes(data))
+        self._short_banks = {} # banks past the end of a short image, padded out
+
+        cart_type = data[CART_TYPE] if len(data) > CART_TYPE else 0
+        ram_size = data[CART_RAM_SIZE] if len(data) > CART_RAM_SIZE else 0
+        self.mbc = MBC_TYPES.get(cart_type)
+        self.battery = cart_type in BATTERY_TYPES
+        self.rom_banks = max(2, (len(data) + ROM_BANK_SIZE - 1) // ROM_BANK_SIZE)
+        self.ram = bytearray(RAM_SIZES.get(ram_size, 0) if self.mbc or self.battery else 0)
+
+        # bank controller registers, RAM without a controller is always on
+        self.ram_enabled = self.mbc is None
+        self._bank1 = 1 # low ROM bank bits
+        self._bank2 = 0 # MBC1 upper ROM bits or RAM bank, MBC3/5 RAM bank
+        self._mode = 0  # MBC1 banking mode
+        # MBC3 clock registers S, M, H, DL, DH. The clock doesn't tick, they
+        # hold what the game writes. rtc_select is the one mapped at $A000
+        # in place of RAM, None while a RAM bank is.
+        self.rtc = bytearray(5)
+        self.rtc_select = None
+
+    # battery RAM is a file next to the ROM, mapped so that saving is a copy
+    # into memory that the kernel writes back, never a rewrite of the file
+    def open_save(self, file_name: str) -> None:
+        size = len(self.ram)
+        if not self.battery or not size:
+            return
+        with open(file_name, "a+b") as f:
+            if os.path.getsize(file_name) < size:
+                f.truncate(size)
+            self.ram = mmap.mmap(f.fileno(), size)
+
+    # a private copy from here on, nothing more reaches the .sav file
+    def close_save(self) -> None:
+        if isinstance(self.ram, mmap.mmap):
+            self.ram = bytearray(self.ram)
+
+    def flush(self) -> None:
+        if isinstance(self.ram, mmap.mmap):
+            self.ram.flush()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __getitem__(self, index):
+        return self._data[index]
+
+    def bank(self, number: int) -> memoryview:
+        number %= self.rom_banks
+        start = number * ROM_BANK_SIZE
+        if start + ROM_BANK_SIZE <= len(self._view):
+            return self._view[start:start + ROM_BANK_SIZE]
+        if number not in self._short_banks:
+            self._short_banks[number] = memoryview(bytes(self._view[start:start + ROM_BANK_SIZE]).ljust(ROM_BANK_SIZE, b"\0"))
+        return self._short_banks[number]
+
+    # bank mapped at $0000-$3FFF, only moves on big MBC1 carts in mode 1
+    def low_bank(self) -> int:
+        if self.mbc == 1 and self._mode == 1:
+            return self._bank2 << 5
+        return 0
+
+    # bank mapped at $4000-$7FFF
+    def high_bank(self) -> int:
+        if self.mbc == 1:
+            return self._bank2 << 5 | self._bank1
+        return self._bank1
+
+    # what $A000-$BFFF shows, compared to notice a remap
+    def ram_mapping(self) -> tuple:
+        return (self.ram_enabled, self.rtc_select, self.ram_offset())
+
+    # offset into ram of the bank mapped at $A000-$BFFF
+    def ram_offset(self) -> int:
+        if self.mbc == 1 and self._mode == 0:
+            return 0
+        offset = self._bank2 * RAM_BANK_SIZE
+        return offset if offset + RAM_BANK_SIZE <= len(self.ram) else 0
+
+    # a store into $0000-$7FFF
+    def control(self, addr: int, value: int) -> None:
+        if self.mbc is None:
+            return
+
+        if addr < 0x2000:
+            self.ram_enabled = value & 0x0F == 0x0A
+        elif self.mbc == 5:
+            if addr < 0x3000:
+                self._bank1 = (self._bank1 & 0x100) | value
+            elif addr < 0x4000:
+                self._bank1 = (self._bank1 & 0xFF) | (value & 0x01) << 8
+            elif addr < 0x6000:
+                self._bank2 = value & 0x0F
+        elif addr < 0x4000:
+            # bank 0 can't be selected at $4000, it gives bank 1
+            self._bank1 = value & (0x1F if self.mbc == 1 else 0x7F) or 1
+        elif addr < 0x6000:
+            if self.mbc == 3 and value >= 0x08:
+                self.rtc_select = value - 0x08 if value <= 0x0C else None
+            else:
+                self.rtc_select = None
+                self._bank2 = value & 0x03
+        elif self.mbc == 1:
+            self._mode = value & 0x01
 
 class Emulator:
     def __init__(self, rom: list[int], verbose: bool = False) -> None:
         self.init_mem(rom)
         self.init_regs()
         self.init_isa()
-        self._interrupts_enabled = True
+        self._interrupts_enabled = True  # IME
+        self._ei_delay = False
         self._verbose = verbose
-
-    def init_mem(self, rom: list[int]) -> None:
-        assert len(rom) <= 0x8000
-        self._mem = rom + [0 for i in range(0, 0x10000 - len(rom))]
+        self._cycles = 0  # T-cycles (4194304 per second), counted by whoever drives run
+        self._ram_dirty = False  # cartridge RAM written since the .sav was last synced
+        self.update_interrupts()
+
+    def init_mem(self, rom) -> None:
+        self._cart = rom if isinstance(rom, Cartridge) else Cartridge(rom)
+        self._low_bank = self._cart.low_bank()
+        self._high_bank = self._cart.high_bank()
+        # one byte per address, a list of ints would be eight times the size
+        self._mem = bytearray(0x10000)
+        self._mem[0:ROM_BANK_SIZE] = self._cart.bank(self._low_bank)
+        self._mem[ROM_BANK_SIZE:2 * ROM_BANK_SIZE] = self._cart.bank(self._high_bank)
+        self.map_ram()
+
+    # a store into ROM has already landed in _mem, put the ROM byte back and
+    # hand the value to the bank controller. Remapping a bank is one slice
+    # assignment of the cached bank, a 16 KB memcpy of about a microsecond,
+    # so every read stays a plain index into _mem rather than paying for a
+    # bank lookup.
+    def mbc_write(self, addr: int) -> None:
+        value = self._mem[addr]
+        bank = self._low_bank if addr < ROM_BANK_SIZE else self._high_bank
+        self._mem[addr] = self._cart.bank(bank)[addr % ROM_BANK_SIZE]
+
+        self._cart.control(addr, value)
+
+        if self._cart.low_bank() != self._low_bank:
+            self._low_bank = self._cart.low_bank()
+            self._mem[0:ROM_BANK_SIZE] = self._cart.bank(self._low_bank)
+        if self._cart.high_bank() != self._high_bank:
+            self._high_bank = self._cart.high_bank()
+            self._mem[ROM_BANK_SIZE:2 * ROM_BANK_SIZE] = self._cart.bank(self._high_bank)
+        if self._cart.ram_mapping() != self._ram_mapping:
+            self.map_ram()
+
+    # fill $A000-$BFFF with what the cartridge maps there: a RAM bank, a
+    # clock register repeated, or $FF while RAM is disabled
+    def map_ram(self) -> None:
+        self._ram_mapping = self._cart.ram_mapping()
+        self._ram_offset = self._cart.ram_offset()
+        if not self._cart.ram_enabled:
+            self._mem[SRAM:SRAM + RAM_BANK_SIZE] = b"\xff" * RAM_BANK_SIZE
+        elif self._cart.rtc_select is not None:
+            self._mem[SRAM:SRAM + RAM_BANK_SIZE] = bytes([self._cart.rtc[self._cart.rtc_select]]) * RAM_BANK_SIZE
+        else:
+            ram = self._cart.ram[self._ram_offset:self._ram_offset + RAM_BANK_SIZE]
+            self._mem[SRAM:SRAM + len(ram)] = ram
+
+    # a store into $A000-$BFFF, called by whoever drives run. It goes straight
+    # into the cartridge RAM, the .sav mapping for a battery, so whatever the
+    # game has saved is in the kernel's hands as soon as it is stored. With
+    # RAM disabled the store is dropped, a clock register takes the value.
+    def write_ram(self, addr: int) -> None:
+        if not self._cart.ram_enabled:
+            self._mem[addr] = 0xFF
+        elif self._cart.rtc_select is not None:
+            self._cart.rtc[self._cart.rtc_select] = self._mem[addr]
+            self.map_ram()
+        else:
+            offset = self._ram_offset + addr - SRAM
+            if offset < len(self._cart.ram):
+                self._cart.ram[offset] = self._mem[addr]
+                self._ram_dirty = True
+
+    # copy the whole mapped RAM bank back into the cartridge, for stores
+    # that did not go through write_ram
+    def save_ram(self) -> None:
+        if self._ram_mapping != (True, None, self._ram_offset):
+            return
+        size = min(RAM_BANK_SIZE, len(self._cart.ram) - self._ram_offset)
+        if size > 0:
+            self._cart.ram[self._ram_offset:self._ram_offset + size] = bytes(self._mem[SRAM:SRAM + size])
+            self._ram_dirty = True
+
+    # the stores are in the mapping already, this asks the kernel to write
+    # them to the .sav file now rather than when it gets round to it, so a
+    # crash of the machine loses no more than since the last sync
+    def sync_ram(self) -> None:
+        if self._ram_dirty:
+            self._ram_dirty = False
+            self._cart.flush()
+
+    # at shutdown, make sure the .sav file has everything
+    def flush_ram(self) -> None:
+        self.save_ram()
+        self._ram_dirty = False
+        self._cart.flush()
 
     def init_regs(self):
         self._regs = {}
@@ -33,10 +259,12 @@ class Emulator:
         self._isa = {}
         self._isa[0xF3] = self.disable_interrupts
         self._isa[0xFB] = self.enable_interrupts
+        self._isa[0xD9] = self.reti
 
         self._isa[0x00] = self.nop
 
         self._isa[0xC3] = self.jump
+        # conditional branches return whether they were taken, it decides their cycles
         self._isa[0xC2] = self.jp_nz_n16
         self._isa[0xCA] = self.jp_z_n16
         self._isa[0xD2] = self.jp_nc_n16
@@ -138,6 +366,11 @@ class Emulator:
         
         self._isa[0xEA] = self.ld_mem_n16_a
         self._isa[0xFA] = self.ld_a_mem_n16
+
+        self._isa[0xE0] = self.ldh_mem_n8_a
+        self._isa[0xF0] = self.ldh_a_mem_n8
+        self._isa[0xE2] = self.ld_mem_c_a
+        self._isa[0xF2] = self.ld_a_mem_c
         
         self._isa[0X04] = lambda: self.inc_r8("b")
         self._isa[0X0C] = lambda: self.inc_r8("c")
@@ -435,6 +668,8 @@ class Emulator:
             
     def run(self) -> None:
         while True:
+            if self._interrupt_pending:
+                self.service_interrupt()
             opcode = self.fetch()
             instr = self.decode(opcode)
             instr()
@@ -526,12 +761,53 @@ class Emulator:
         if self._verbose:
             print("di")
         self._interrupts_enabled = False
+        self._ei_delay = False
+        self.update_interrupts()
 
     def enable_interrupts(self):
         instr = self.fetch_operands(0)
         if self._verbose:
             print("ei")
+        # only takes effect after the next instruction, stop at the boundary
+        # before it so service_interrupt can count it
         self._interrupts_enabled = True
+        self._ei_delay = True
+        self._interrupt_pending = 1
+
+    # call whenever IE, IF or IME changes. _interrupt_ready wakes up halt,
+    # _interrupt_pending is the only thing tested before every instruction
+    def update_interrupts(self) -> None:
+        self._interrupt_ready = self._mem[IE] & self._mem[IF] & 0x1F
+        self._interrupt_pending = self._interrupt_ready if self._interrupts_enabled else 0
+
+    def request_interrupt(self, flag: int) -> None:
+        self._mem[IF] |= flag
+        self.update_interrupts()
+
+    # called before an instruction while _interrupt_pending is set
+    def service_interrupt(self) -> None:
+        if self._ei_delay:
+            # the instruction after ei runs first
+            self._ei_delay = False
+            self.update_interrupts()
+            return
+
+        flag = self._interrupt_pending & -self._interrupt_pending
+        vector = INTERRUPT_VECTORS[flag.bit_length() - 1]
+        if self._verbose:
+            print("interrupt ${0:02X}".format(vector))
+
+        self._mem[IF] &= ~flag & 0xFF
+        self._interrupts_enabled = False
+
+        pc = self._regs["pc"]
+        self._regs["sp"] -= 2
+        self._mem[self._regs["sp"]] = pc & 0xFF
+        self._mem[self._regs["sp"] + 1] = pc >> 8
+        self._regs["pc"] = vector
+        self._cycles += INTERRUPT_CYCLES
+
+        self.update_interrupts()
 
     def jump(self) -> None:
         instr = self.fetch_operands(2)
@@ -605,6 +881,28 @@ class Emulator:
         address = self.to_little(instr)
         self._regs["a"] = self._mem[address]
 
+    def ldh_mem_n8_a(self) -> None:
+        instr = self.fetch_operands(1)
+        if self._verbose:
+            print("ldh [n8], a")
+        self._mem[0xFF00 + instr[0]] = self._regs["a"]
+
+    def ldh_a_mem_n8(self) -> None:
+        instr = self.fetch_operands(1)
+        if self._verbose:
+            print("ldh a, [n8]")
+        self._regs["a"] = self._mem[0xFF00 + instr[0]]
+
+    def ld_mem_c_a(self) -> None:
+        if self._verbose:
+            print("ld [c], a")
+        self._mem[0xFF00 + self._regs["c"]] = self._regs["a"]
+
+    def ld_a_mem_c(self) -> None:
+        if self._verbose:
+            print("ld a, [c]")
+        self._regs["a"] = self._mem[0xFF00 + self._regs["c"]]
+
     def ld_r8_r8(self, reg_1: str, reg_2: str) -> None:
         if self._verbose:
             print(f"ld {reg_1}, {reg_2}")
@@ -645,7 +943,9 @@ class Emulator:
         if (self._verbose):
             print("ld [n16], sp")
         instr = self.fetch_operands(2)
-        self._mem[self.to_little(instr)] = self._regs["sp"]
+        address = self.to_little(instr)
+        self._mem[address] = self._regs["sp"] & 0xFF
+        self._mem[(address + 1) & 0xFFFF] = self._regs["sp"] >> 8
         
     def ld_sp_n16(self) -> None:
         if self._verbose:
@@ -796,37 +1096,45 @@ class Emulator:
             self.set_c()
 
 
-    def jp_nz_n16(self) -> None:
+    def jp_nz_n16(self) -> bool:
         if (self._verbose):
             print("jp nz, n16")
         if (not self.z_is_set()):
             self.jump()
+            return True
         else:
             self.fetch_operands(2)
+            return False
 
-    def jp_z_n16(self) -> None:
+    def jp_z_n16(self) -> bool:
         if (self._verbose):
             print("jp z, n16")
         if (self.z_is_set()):
             self.jump()
+            return True
         else:
             self.fetch_operands(2)
+            return False
 
-    def jp_c_n16(self) -> None:
+    def jp_c_n16(self) -> bool:
         if (self._verbose):
             print("jp c, n16")
         if (self.c_is_set()):
             self.jump()
+            return True
         else:
             self.fetch_operands(2)
+            return False
 
-    def jp_nc_n16(self) -> None:
+    def jp_nc_n16(self) -> bool:
         if (self._verbose):
             print("jp nc, n16")
         if (not self.c_is_set()):
             self.jump()
+            return True
         else:
             self.fetch_operands(2)
+            return False
 
     def add_a_r8(self, reg: str) -> None:
         if (self._verbose):
@@ -1166,7 +1474,7 @@ class Emulator:
             print(f"set {position}, [hl]")
         value = 1 << position
         address = self.get_16_bit_reg_val("hl")
-        self.mem[address] = self._mem[address] | value
+        self._mem[address] = self._mem[address] | value
         if (self._mem[address] == 0):
             self.set_z()
         else:
@@ -1204,7 +1512,7 @@ class Emulator:
             print(f"swap {reg}")
         val = self._regs[reg]
         most_sig = val >> 4
-        least_sig = val << 4 % 256
+        least_sig = (val << 4) & 0xF0
         self._regs[reg] = most_sig | least_sig
 
     def swap_mem_hl(self) -> None:
@@ -1213,13 +1521,15 @@ class Emulator:
         addr = self.get_16_bit_reg_val("hl")
         val = self._mem[addr]
         most_sig = val >> 4
-        least_sig = val << 4 % 256
+        least_sig = (val << 4) & 0xF0
         self._mem[addr] = most_sig | least_sig
 
     def reti(self) -> None:
         if (self._verbose):
             print("reti")
-        self.enable_interrupts()
+        # unlike ei there is no delay
+        self._interrupts_enabled = True
+        self.update_interrupts()
         self.ret()
 
     def cpl(self) -> None:
@@ -1228,15 +1538,20 @@ class Emulator:
         self._regs["a"] = self._regs["a"] ^ 0B11111111
 
 
-def read_rom(file_name: str, verbose: bool = False) -> list[int]:
-    rom = []
+# the file is mapped rather than read, pages are loaded as banks get used
+# and are shared by every emulator with the same ROM open.
+# Without save, battery RAM starts blank and is never written back.
+def read_rom(file_name: str, verbose: bool = False, save: bool = True) -> Cartridge:
     with open(file_name, "rb") as f:
-        rom = list(f.read())
-        if verbose:
-            print("read:", len(rom), "bytes")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    rom = Cartridge(data)
+    if save:
+        rom.open_save(os.path.splitext(file_name)[0] + ".sav")
+    if verbose:
+        print("read:", len(rom), "bytes,", rom.rom_banks, "banks, mbc", rom.mbc)
     return rom
 
-def print_rom(rom: list[int], start: int = 0, end: int = 0x8000) -> None:
+def print_rom(rom: Cartridge, start: int = 0, end: int = 0x8000) -> None:
     for address in range(start, end, 0x10):
         print("{0:04X}".format(address), end="\t")
         for i in range(0,16):
@@ -1245,7 +1560,7 @@ def print_rom(rom: list[int], start: int = 0, end: int = 0x8000) -> None:
 
 if __name__ == "__main__":
     verbose = True
-    rom = read_rom("game.gb", verbose)
+    rom = read_rom("game.gb", verbose, save = False)
     if verbose:
         print_rom(rom)
 
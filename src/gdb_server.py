@@ -0,0 +1,328 @@
+import asyncio
+import threading
+import queue
+
+#Debug server speaking the GDB remote serial protocol, for gdb builds or
+#scripts that talk RSP. It runs an asyncio loop in its own thread, so the
+#emulation keeps running until a breakpoint, watchpoint, step or ^C pauses it
+#through the Debugger, and Tk keeps drawing throughout. Registers, memory and
+#the debugger's tables are only ever touched from the emulation thread: this
+#thread hands it requests, run from on_pause while it is paused and at the
+#start of the next vblank while it runs.
+#
+#There is no SM83 in gdb, so the register layout is our own: a f b c d e h l
+#one byte each, then sp and pc little endian, 12 bytes in all (p/P number
+#them 0-9 in that order). Memory reads are answered in one packet up to
+#PacketSize, 8 KB of VRAM is a single m8000,2000.
+
+PACKET_SIZE = 0x4400 # enough for an 8 KB read in hex plus framing
+REGISTERS = ("a", "f", "b", "c", "d", "e", "h", "l", "sp", "pc")
+SIGTRAP = 5
+
+WATCH_STOPS = {"write": "watch", "read": "rwatch"}
+
+#the emulation thread has finished, nothing will run a request any more
+class EmulationEnded(Exception):
+    pass
+
+def checksum(payload):
+    return sum(payload) & 0xFF
+
+#"1234" or "localhost:1234" is TCP on 127.0.0.1, anything else a unix socket path
+def parse_listen_address(text):
+    port = text.rsplit(":", 1)[-1]
+    if port.isdigit() and (":" in text or text.isdigit()):
+        return int(port)
+    return text
+
+class GdbServer:
+    def __init__(self, debugger, driver, address, verbose = False):
+        self._debugger = debugger
+        self._driver = driver
+        self._hamulator = driver._hamulator
+        self._address = parse_listen_address(address)
+        self._verbose = verbose
+
+        self._loop = None
+        self._writer = None
+        self._ack = True
+        self._waiting = False # a continue, step or ? is owed a stop reply
+        self._stopped = False # the emulation is paused in on_pause, waiting on _requests
+        self._stop_reply = f"S{SIGTRAP:02X}"
+        self._requests = queue.Queue() # run by on_pause in order, None resumes
+
+        debugger.on_pause = self.on_pause
+
+    def start(self):
+        self._thread = threading.Thread(target = lambda: asyncio.run(self.serve()), daemon = True)
+        self._thread.start()
+
+    async def serve(self):
+        self._loop = asyncio.get_running_loop()
+        if isinstance(self._address, int):
+            server = await asyncio.start_server(self.handle_client, "127.0.0.1", self._address)
+        else:
+            server = await asyncio.start_unix_server(self.handle_client, self._address)
+        print(f"gdb: listening on {self._address}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    # the emulation thread
+
+    #blocks the emulation until the client continues or steps, or the driver
+    #ends, running what the client asks for meanwhile
+    def on_pause(self, reason):
+        watch = self._debugger.watch_hit
+        if watch is not None:
+            reply = "T{0:02X}{1}:{2:04X};".format(SIGTRAP, WATCH_STOPS[watch[0]], watch[1])
+        else:
+            reply = f"S{SIGTRAP:02X}"
+        if self._verbose:
+            print(f"gdb: {reason}", flush=True)
+
+        if self._loop is None or self._writer is None:
+            return
+        self._loop.call_soon_threadsafe(self.stopped, reply)
+        while True:
+            try:
+                request = self._requests.get(timeout = 0.1)
+            except queue.Empty:
+                if self._driver._ending:
+                    return
+                continue
+            if request is None:
+                return
+            request()
+
+    # the server thread
+
+    #the emulation has paused and waits on _requests
+    def stopped(self, reply):
+        self._stop_reply = reply
+        self._stopped = True
+        if self._waiting:
+            self._waiting = False
+            self.send(reply)
+
+    def resume(self):
+        if self._stopped:
+            self._stopped = False
+            self._requests.put(None)
+
+    #fn runs on the emulation thread, straight away while it is paused and at
+    #the start of the next vblank while it runs. False when the emulation has
+    #ended and fn will never run.
+    def call_emulation(self, fn):
+        if not self._driver.emulation_alive():
+            return False
+        if self._stopped:
+            self._requests.put(fn)
+        else:
+            self._driver._emulation_requests.append(fn)
+        return True
+
+    #the same, the result is what fn gives back
+    async def ask_emulation(self, fn):
+        future = self._loop.create_future()
+        def request():
+            try:
+                result = fn()
+            except Exception as e:
+                self._loop.call_soon_threadsafe(future.set_exception, e)
+            else:
+                self._loop.call_soon_threadsafe(future.set_result, result)
+        if not self.call_emulation(request):
+            raise EmulationEnded()
+        # the emulation can end with fn still queued
+        while not future.done():
+            if not self._driver.emulation_alive():
+                raise EmulationEnded()
+            await asyncio.wait([future], timeout = 0.1)
+        return future.result()
+
+    #a client left waiting on the emulation once it has ended is told it
+    #exited and let go
+    async def watch_emulation(self, writer):
+        while self._writer is writer:
+            if not self._driver.emulation_alive():
+                if self._waiting:
+                    self._waiting = False
+                    self.send("W00")
+                print("gdb: emulation ended", flush=True)
+                writer.close()
+                return
+            await asyncio.sleep(0.1)
+
+    def send(self, payload):
+        if self._writer is None:
+            return
+        data = payload.encode("latin-1")
+        self._writer.write(b"$" + data + b"#" + "{0:02x}".format(checksum(data)).encode())
+
+    async def handle_client(self, reader, writer):
+        if self._writer is not None:
+            writer.close()
+            return
+        self._writer = writer
+        self._ack = True
+        print("gdb: client connected", flush=True)
+
+        # gdb expects the target stopped when it attaches
+        self.call_emulation(lambda: self._debugger.step("attached"))
+        watcher = asyncio.ensure_future(self.watch_emulation(writer))
+
+        buffer = b""
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                buffer += data
+                while buffer:
+                    if buffer[0] in b"+-":
+                        buffer = buffer[1:]
+                    elif buffer[0] == 0x03:
+                        buffer = buffer[1:]
+                        self.call_emulation(lambda: self._debugger.step("interrupted"))
+                    elif buffer[0:1] != b"$":
+                        buffer = buffer[1:]
+                    else:
+                        end = buffer.find(b"#")
+                        if end < 0 or len(buffer) < end + 3:
+                            break
+                        payload = buffer[1:end]
+                        valid = "{0:02x}".format(checksum(payload)) == buffer[end + 1:end + 3].decode("latin-1").lower()
+                        buffer = buffer[end + 3:]
+                        if self._ack:
+                            writer.write(b"+" if valid else b"-")
+                        if not valid:
+                            continue
+                        try:
+                            reply = await self.handle_packet(payload.decode("latin-1"))
+                        except EmulationEnded:
+                            reply = "E01"
+                        if reply is not None:
+                            self.send(reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            watcher.cancel()
+            # nobody left to continue, so let it run
+            print("gdb: client disconnected", flush=True)
+            self._writer = None
+            self._waiting = False
+            self.call_emulation(self._debugger.remove_all)
+            self.resume()
+            writer.close()
+
+    #the reply, or None when it comes later as a stop reply. Packets are
+    #parsed here, what they read or change is done on the emulation thread.
+    async def handle_packet(self, packet):
+        command, args = packet[0:1], packet[1:]
+        regs = self._hamulator._regs
+        mem = self._hamulator._mem
+
+        if command == "?":
+            # only once the emulation has really paused
+            if self._stopped:
+                return self._stop_reply
+            if not self._driver.emulation_alive():
+                return "W00"
+            self._waiting = True
+            return None
+        elif command == "g":
+            return await self.ask_emulation(self.read_registers)
+        elif command == "G":
+            data = bytes.fromhex(args)
+            await self.ask_emulation(lambda: self.write_registers(data))
+            return "OK"
+        elif command == "p":
+            number = int(args, 16)
+            if number >= len(REGISTERS):
+                return "E01"
+            value = await self.ask_emulation(lambda: regs[REGISTERS[number]])
+            return value.to_bytes(1 if number < 8 else 2, "little").hex()
+        elif command == "P":
+            number, value = args.split("=")
+            number = int(number, 16)
+            if number >= len(REGISTERS):
+                return "E01"
+            value = int.from_bytes(bytes.fromhex(value), "little")
+            await self.ask_emulation(lambda: regs.__setitem__(REGISTERS[number], value))
+            return "OK"
+        elif command == "m":
+            addr, length = [int(arg, 16) for arg in args.split(",")]
+            length = min(length, 0x10000 - addr, (PACKET_SIZE - 4) // 2)
+            return (await self.ask_emulation(lambda: bytes(mem[addr:addr + length]))).hex()
+        elif command == "M":
+            where, data = args.split(":")
+            addr, length = [int(arg, 16) for arg in where.split(",")]
+            values = list(bytes.fromhex(data))[:length]
+            await self.ask_emulation(lambda: self._debugger.poke(addr, values))
+            return "OK"
+        elif command == "Z" or command == "z":
+            kind, addr, length = args.split(",")[0:3]
+            addr = int(addr, 16)
+            length = max(int(length, 16), 1)
+            if kind in ("0", "1"):
+                if command == "Z":
+                    await self.ask_emulation(lambda: self._debugger.add_breakpoint(addr))
+                else:
+                    await self.ask_emulation(lambda: self._debugger.remove_breakpoint(addr))
+            elif kind in ("2", "3", "4"):
+                kinds = {"2": "w", "3": "r", "4": "rw"}[kind]
+                if command == "Z":
+                    await self.ask_emulation(lambda: self._debugger.add_watch(addr, addr + length - 1, kinds))
+                else:
+                    await self.ask_emulation(lambda: self._debugger.remove_watch(addr, addr + length - 1, kinds))
+            else:
+                return ""
+            return "OK"
+        elif command == "c" or command == "s":
+            if not self._driver.emulation_alive():
+                return "W00"
+            if args:
+                pc = int(args, 16)
+                self.call_emulation(lambda: regs.__setitem__("pc", pc))
+            if command == "s":
+                self.call_emulation(self._debugger.step)
+            self._waiting = True
+            self.resume()
+            return None
+        elif command == "k":
+            self._driver._ending = True
+            self.resume()
+            return None
+        elif command == "D":
+            self.call_emulation(self._debugger.remove_all)
+            self.resume()
+            return "OK"
+        elif packet.startswith("qSupported"):
+            return f"PacketSize={PACKET_SIZE:x};QStartNoAckMode+"
+        elif packet == "QStartNoAckMode":
+            self._ack = False
+            return "OK"
+        elif packet == "qAttached":
+            return "1"
+        elif packet == "qC":
+            return "QC1"
+        elif packet == "qfThreadInfo":
+            return "m1"
+        elif packet == "qsThreadInfo":
+            return "l"
+        elif command == "H" or command == "T":
+            return "OK"
+        return ""
+
+    def read_registers(self):
+        regs = self._hamulator._regs
+        return bytes([regs[name] for name in REGISTERS[0:8]]).hex() + \
+            regs["sp"].to_bytes(2, "little").hex() + regs["pc"].to_bytes(2, "little").hex()
+
+    def write_registers(self, data):
+        regs = self._hamulator._regs
+        for i, name in enumerate(REGISTERS[0:8]):
+            regs[name] = data[i]
+        regs["sp"] = data[8] | data[9] << 8
+        regs["pc"] = data[10] | data[11] << 8
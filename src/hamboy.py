@@ -1,15 +1,39 @@
 import sys
 import argparse
 import emulator
+import rom_cache
+import debugger
+import gdb_server
+import movie
 import time
+import heapq
+import hashlib
 import threading
+import collections
+import multiprocessing
+from multiprocessing import shared_memory
 from tkinter import * 
 from tkinter.ttk import *
 
+#startup milestones, printed with -V once the first frame is up
+LAUNCH_TIME = time.monotonic()
+_startup_marks = []
 
-#VBlank
+def startup_mark(label):
+    _startup_marks.append((label, time.monotonic() - LAUNCH_TIME))
+
+def print_startup_report():
+    for label, seconds in _startup_marks:
+        print(f"startup: {label:<16}{seconds * 1000:7.1f} ms", flush=True)
+
+#interrupts
 IEF_VBLANK = 0b00000001 # V-Blank
+IEF_STAT   = 0b00000010 # LCDC (see STAT)
+IEF_TIMER  = 0b00000100 # Timer Overflow
+IEF_SERIAL = 0b00001000 # Serial I/O transfer end
+IEF_HILO   = 0b00010000 # Transition from High to Low of Pin number P10-P13
 rIE = 0xFFFF # interrupt enable register
+rIF = 0xFF0F # interrupt flag register
 
 #VRAM
 _VRAM = 0x8000
@@ -17,6 +41,8 @@ _VRAM8000 = 0x8000
 _VRAM8800 = 0x8800
 _VRAM9000 = 0x9000
 _SRAM = 0xA000
+_RAM = 0xC000
+_HRAM = 0xFF80
 
 START_TILESET = 0x8000
 START_TILEMAP1 = 0x9800
@@ -26,6 +52,48 @@ START_TILEMAP2 = 0x9C00
 SCRN_Y = 144
 SCRN_X = 160
 rLY = 0xFF44
+rLYC = 0xFF45
+
+#LCD status
+rSTAT = 0xFF41
+
+STATF_LYC     = 0b01000000 # LYC=LY Coincidence (Selectable)
+STATF_MODE10  = 0b00100000 # Mode 10
+STATF_MODE01  = 0b00010000 # Mode 01 (V-Blank)
+STATF_MODE00  = 0b00001000 # Mode 00 (H-Blank)
+STATF_LYCF    = 0b00000100 # Coincidence Flag
+STATF_HBL     = 0b00000000 # H-Blank
+STATF_VBL     = 0b00000001 # V-Blank
+STATF_OAM     = 0b00000010 # OAM-RAM is used by system
+STATF_LCD     = 0b00000011 # Both OAM and VRAM used by system
+
+#LCD timing in T-cycles, 154 lines of which the last 10 are vblank.
+#Frames start every FRAME_CYCLES from cycle 0.
+CPU_HZ = 4194304
+LINE_CYCLES = 456
+FRAME_CYCLES = 154 * LINE_CYCLES
+VBLANK_START_CYCLES = SCRN_Y * LINE_CYCLES
+FRAME_RATE = CPU_HZ / FRAME_CYCLES # ~59.73 Hz
+LINES = 154
+OAM_SCAN_CYCLES = 80  # mode 2 at the start of each visible line
+TRANSFER_CYCLES = 172 # then mode 3, the rest of the line is hblank
+HBLANK_START_CYCLES = OAM_SCAN_CYCLES + TRANSFER_CYCLES
+
+#timer
+rDIV  = 0xFF04 # upper byte of a counter that goes up every T-cycle
+rTIMA = 0xFF05 # counts at the TAC rate, raises the timer interrupt when it overflows
+rTMA  = 0xFF06 # loaded into TIMA on overflow
+rTAC  = 0xFF07
+
+TACF_START = 0b00000100
+# T-cycles per TIMA increment for each TAC clock select
+TIMER_PERIODS = (1024, 16, 64, 256)
+
+#event queue
+NEVER = float("inf")
+
+#battery RAM written since the last sync is flushed to its .sav file this often
+SAVE_INTERVAL_FRAMES = 60
 
 #Background
 rBGP = 0xFF47
@@ -62,6 +130,10 @@ WX_OFS = 7
 #sprites
 _OAMRAM = 0xFE00
 
+#OAM DMA, writing $XX copies $XX00-$XX9F into OAM
+rDMA = 0xFF46
+DMA_CYCLES = 160 * 4
+
 rOBP0 = 0xFF48
 rOBP1 = 0xFF49
 
@@ -108,6 +180,11 @@ JOYPAD_BUTTON_MAP =      \
      "a"       : "B",      
      "s"       : "A"}
 
+# bit order of the joypad bitmask, the dpad is the low nibble and the buttons
+# the high nibble, each in the order P1 reports them
+JOYPAD_BUTTONS = ("RIGHT", "LEFT", "UP", "DOWN", "A", "B", "SELECT", "START")
+JOYPAD_BUTTON_MASKS = {button: 1 << i for i, button in enumerate(JOYPAD_BUTTONS)}
+
 JOYPAD_BUTTON_TO_BITS = \
     {"DOWN"   : 0b00001000,
      "UP"     : 0b00000100,
@@ -118,518 +195,19 @@ JOYPAD_BUTTON_TO_BITS = \
      "B"      : 0b00000010,
      "A"      : 0b00000001}
 
-OPCODES = """0x00	nop	1	1	----
-0x01	ld bc,n16	3	3	----
-0x02	ld [bc],a	1	2	----
-0x03	inc bc	1	2	----
-0x04	inc b	1	1	Z0H-
-0x05	dec b	1	1	Z1H-
-0x06	ld b,n8	2	2	----
-0x07	rlca	1	1	000C
-0x08	ld [n16],sp	3	5	----
-0x09	add hl,bc	1	2	-0HC
-0x0A	ld a,[bc]	1	2	----
-0x0B	dec bc	1	2	----
-0x0C	inc c	1	1	Z0H-
-0x0D	dec c	1	1	Z1H-
-0x0E	ld c,n8	2	2	----
-0x0F	rrca	1	1	000C
-0x10	stop	2	1	----
-0x11	ld de,n16	3	3	----
-0x12	ld [de],a	1	2	----
-0x13	inc de	1	2	----
-0x14	inc d	1	1	Z0H-
-0x15	dec d	1	1	Z1H-
-0x16	ld d,n8	2	2	----
-0x17	rla	1	1	000C
-0x18	jr s8	2	3	----
-0x19	add hl,de	1	2	-0HC
-0x1A	ld a,[de]	1	2	----
-0x1B	dec de	1	2	----
-0x1C	inc e	1	1	Z0H-
-0x1D	dec e	1	1	Z1H-
-0x1E	ld e,n8	2	2	----
-0x1F	rra	1	1	000C
-0x20	jr nz,s8	2	3/2	----
-0x21	ld hl,n16	3	3	----
-0x22	ldi [hl],a	1	2	----
-0x23	inc hl	1	2	----
-0x24	inc h	1	1	Z0H-
-0x25	dec h	1	1	Z1H-
-0x26	ld h,n8	2	2	----
-0x27	daa	1	1	Z-0C
-0x28	jr z,s8	2	3/2	----
-0x29	add hl,hl	1	2	-0HC
-0x2A	ldi a,[hl]	1	2	----
-0x2B	dec hl	1	2	----
-0x2C	inc l	1	1	Z0H-
-0x2D	dec l	1	1	Z1H-
-0x2E	ld l,n8	2	2	----
-0x2F	cpl	1	1	-11-
-0x30	jr nc,s8	2	3/2	----
-0x31	ld sp,n16	3	3	----
-0x32	ldd [hl],a	1	2	----
-0x33	inc sp	1	2	----
-0x34	inc [hl]	1	3	Z0H-
-0x35	dec [hl]	1	3	Z1H-
-0x36	ld [hl],n8	2	3	----
-0x37	scf	1	1	-001
-0x38	jr c,s8	2	3/2	----
-0x39	add hl,sp	1	1	----
-0x3A	ldd a,[hl]	1	2	----
-0x3B	dec sp	1	1	----
-0x3C	inc a	1	1	Z0H-
-0x3D	dec a	1	1	----
-0x3E	ld a,n8	2	2	----
-0x3F	ccf	1	1	Z0HC
-0x40	ld b,b	1	1	----
-0x41	ld b,c	1	1	Z0HC
-0x42	ld b,d	1	1	----
-0x43	ld b,e	1	1	Z0HC
-0x44	ld b,h	1	1	----
-0x45	ld b,l	1	1	Z0HC
-0x46	ld b,[hl]	1	2	----
-0x47	ld b,a	1	1	Z0HC
-0x48	ld c,b	1	1	----
-0x49	ld c,c	1	1	Z0HC
-0x4A	ld c,d	1	1	----
-0x4B	ld c,e	1	1	Z0HC
-0x4C	ld c,h	1	1	----
-0x4D	ld c,l	1	1	Z0HC
-0x4E	ld c,[hl]	1	2	----
-0x4F	ld c,a	1	1	Z1HC
-0x50	ld d,b	1	1	----
-0x51	ld d,c	1	1	Z1HC
-0x52	ld d,d	1	1	----
-0x53	ld d,e	1	1	Z1HC
-0x54	ld d,h	1	1	----
-0x55	ld d,l	1	1	11HC
-0x56	ld d,[hl]	1	2	----
-0x57	ld d,a	1	1	Z1HC
-0x58	ld e,b	1	1	----
-0x59	ld e,c	1	1	Z1HC
-0x5A	ld e,d	1	1	----
-0x5B	ld e,e	1	1	Z1HC
-0x5C	ld e,h	1	1	----
-0x5D	ld e,l	1	1	Z1HC
-0x5E	ld e,[hl]	1	2	----
-0x5F	ld e,a	1	1	Z010
-0x60	ld h,b	1	1	----
-0x61	ld h,c	1	1	Z010
-0x62	ld h,d	1	1	----
-0x63	ld h,e	1	1	Z010
-0x64	ld h,h	1	1	----
-0x65	ld h,l	1	1	Z010
-0x66	ld h,[hl]	1	2	----
-0x67	ld h,a	1	1	Z000
-0x68	ld l,b	1	1	----
-0x69	ld l,c	1	1	Z000
-0x6A	ld l,d	1	1	----
-0x6B	ld l,e	1	1	Z000
-0x6C	ld l,h	1	1	----
-0x6D	ld l,l	1	1	1000
-0x6E	ld l,[hl]	1	2	----
-0x6F	ld l,a	1	1	Z000
-0x70	ld [hl],b	1	2	----
-0x71	ld [hl],c	1	1	Z000
-0x72	ld [hl],d	1	2	----
-0x73	ld [hl],e	1	1	Z000
-0x74	ld [hl],h	1	2	----
-0x75	ld [hl],l	1	1	Z000
-0x76	halt	1	1	----
-0x77	ld [hl],a	1	1	Z1HC
-0x78	ld a,b	1	1	----
-0x79	ld a,c	1	1	Z1HC
-0x7A	ld a,d	1	1	----
-0x7B	ld a,e	1	1	----
-0x7C	ld a,h	1	1	----
-0x7D	ld a,l	1	1	----
-0x7E	ld a,[hl]	1	2	----
-0x7F	ld a,a	1	1	----
-0x80	add a,b	1	1	Z0HC
-0x81	add a,c	1	1	Z0HC
-0x82	add a,d	1	1	Z0HC
-0x83	add a,e	1	1	Z0HC
-0x84	add a,h	1	1	Z0HC
-0x85	add a,l	1	1	Z0HC
-0x86	add a,[hl]	1	2	Z0HC
-0x87	add a,a	1	1	Z0HC
-0x88	adc a,b	1	1	Z0HC
-0x89	adc a,c	1	1	Z0HC
-0x8A	adc a,d	1	1	Z0HC
-0x8B	adc a,e	1	1	Z0HC
-0x8C	adc a,h	1	1	Z0HC
-0x8D	adc a,l	1	1	Z0HC
-0x8E	adc a,[hl]	1	2	Z0HC
-0x8F	adc a,a	1	1	Z0HC
-0x90	sub b	1	1	Z1HC
-0x91	sub c	1	1	Z1HC
-0x92	sub d	1	1	Z1HC
-0x93	sub e	1	1	Z1HC
-0x94	sub h	1	1	Z1HC
-0x95	sub l	1	1	Z1HC
-0x96	sub [hl]	1	2	Z1HC
-0x97	sub a	1	1	11HC
-0x98	sbc a,b	1	1	Z1HC
-0x99	sbc a,c	1	1	Z1HC
-0x9A	sbc a,d	1	1	Z1HC
-0x9B	sbc a,e	1	1	Z1HC
-0x9C	sbc a,h	1	1	Z1HC
-0x9D	sbc a,l	1	1	Z1HC
-0x9E	sbc a,[hl]	1	2	Z1HC
-0x9F	sbc a,a	1	1	Z1HC
-0xA0	and b	1	1	Z010
-0xA1	and c	1	1	Z010
-0xA2	and d	1	1	Z010
-0xA3	and e	1	1	Z010
-0xA4	and h	1	1	Z010
-0xA5	and l	1	1	Z010
-0xA6	and [hl]	1	2	Z010
-0xA7	and a	1	1	Z010
-0xA8	xor b	1	1	Z000
-0xA9	xor c	1	1	Z000
-0xAA	xor d	1	1	Z000
-0xAB	xor e	1	1	Z000
-0xAC	xor h	1	1	Z000
-0xAD	xor l	1	1	Z000
-0xAE	xor [hl]	1	2	Z000
-0xAF	xor a	1	1	1000
-0xB0	or b	1	1	Z000
-0xB1	or c	1	1	Z000
-0xB2	or d	1	1	Z000
-0xB3	or e	1	1	Z000
-0xB4	or h	1	1	Z000
-0xB5	or l	1	1	Z000
-0xB6	or [hl]	1	2	Z000
-0xB7	or a	1	1	Z000
-0xB8	cp b	1	1	Z1HC
-0xB9	cp c	1	1	Z1HC
-0xBA	cp d	1	1	Z1HC
-0xBB	cp e	1	1	Z1HC
-0xBC	cp h	1	1	Z1HC
-0xBD	cp l	1	1	Z1HC
-0xBE	cp [hl]	1	2	Z1HC
-0xBF	cp a	1	1	11HC
-0xC0	ret nz	1	5/2	----
-0xC1	pop bc	1	3	----
-0xC2	jp nz,n16	3	4/3	----
-0xC3	jp n16	3	4	----
-0xC4	call nz,n16	3	6/3	----
-0xC5	push bc	1	4	----
-0xC6	add a,n8	2	2	Z0HC
-0xC7	rst 00h	1	4	----
-0xC8	ret z	1	5/2	----
-0xC9	ret	1	4	----
-0xCA	jp z,n16	3	4/3	----
-0xCB	prefix	-	-	----
-0xCC	call z,n16	3	6/3	----
-0xCD	call n16	3	6	----
-0xCE	adc a,n8	2	2	Z0HC
-0xCF	rst 08h	1	4	----
-0xD0	ret nc	1	5/2	----
-0xD1	pop de	1	3	----
-0xD2	jp nc,n16	3	4/3	----
-0xD3	-	-	-	----
-0xD4	call nc,n16	3	6/3	----
-0xD5	push de	1	4	----
-0xD6	sub n8	2	2	Z1HC
-0xD7	rst 10h	1	4	----
-0xD8	ret c	1	5/2	----
-0xD9	reti	1	4	----
-0xDA	jp c,n16	3	4/3	----
-0xDB	-	-	-	----
-0xDC	call c,n16	3	6/3	----
-0xDD	-	-	-	----
-0xDE	sbc a,n8	2	2	Z1HC
-0xDF	rst 18h	1	4	----
-0xE0	ldh [a8],a	2	3	----
-0xE1	pop hl	1	3	----
-0xE2	ld [c],a	1	2	----
-0xE3	-	-	-	----
-0xE4	-	-	-	----
-0xE5	push hl	1	4	----
-0xE6	and n8	2	2	Z010
-0xE7	rst 20h	1	4	----
-0xE8	add sp,s8	2	4	00HC
-0xE9	jp hl	1	1	----
-0xEA	ld [n16],a	3	4	----
-0xEB	-	-	-	----
-0xEC	-	-	-	----
-0xED	-	-	-	----
-0xEE	xor n8	2	2	Z000
-0xEF	rst 28h	1	4	----
-0xF0	ldh a,[a8]	2	3	----
-0xF1	pop af	1	3	ZNHC
-0xF2	ld a,[c]	2	3	----
-0xF3	di	1	1	----
-0xF4	-	-	-	----
-0xF5	push af	1	4	----
-0xF6	or n8	2	2	Z000
-0xF7	rst 30h	1	4	----
-0xF8	ld hl,sp	2	3	00HC
-0xF9	ld sp,hl	1	2	----
-0xFA	ld a,[n16]	3	4	----
-0xFB	ei	1	1	----
-0xFC	-	-	-	----
-0xFD	-	-	-	----
-0xFE	cp n8	2	2	Z1HC
-0xFF	rst 38h	1	4	----
-0xCB00	rlc b	2	2	Z00C
-0xCB01	rlc c	2	2	Z00C
-0xCB02	rlc d	2	2	Z00C
-0xCB03	rlc e	2	2	Z00C
-0xCB04	rlc h	2	2	Z00C
-0xCB05	rlc l	2	2	Z00C
-0xCB06	rlc [hl]	2	4	Z00C
-0xCB07	rlc a	2	2	Z00C
-0xCB08	rrc b	2	2	Z00C
-0xCB09	rrc c	2	2	Z00C
-0xCB0A	rrc d	2	2	Z00C
-0xCB0B	rrc e	2	2	Z00C
-0xCB0C	rrc h	2	2	Z00C
-0xCB0D	rrc l	2	2	Z00C
-0xCB0E	rrc [hl]	2	4	Z00C
-0xCB0F	rrc a	2	2	Z00C
-0xCB10	rl b	2	2	Z00C
-0xCB11	rl c	2	2	Z00C
-0xCB12	rl d	2	2	Z00C
-0xCB13	rl e	2	2	Z00C
-0xCB14	rl h	2	2	Z00C
-0xCB15	rl l	2	2	Z00C
-0xCB16	rl [hl]	2	4	Z00C
-0xCB17	rl a	2	2	Z00C
-0xCB18	rr b	2	2	Z00C
-0xCB19	rr c	2	2	Z00C
-0xCB1A	rr d	2	2	Z00C
-0xCB1B	rr e	2	2	Z00C
-0xCB1C	rr h	2	2	Z00C
-0xCB1D	rr l	2	2	Z00C
-0xCB1E	rr [hl]	2	4	Z00C
-0xCB1F	rr a	2	2	Z00C
-0xCB20	sla b	2	2	Z00C
-0xCB21	sla c	2	2	Z00C
-0xCB22	sla d	2	2	Z00C
-0xCB23	sla e	2	2	Z00C
-0xCB24	sla h	2	2	Z00C
-0xCB25	sla l	2	2	Z00C
-0xCB26	sla [hl]	2	4	Z00C
-0xCB27	sla a	2	2	Z00C
-0xCB28	sra b	2	2	Z00C
-0xCB29	sra c	2	2	Z00C
-0xCB2A	sra d	2	2	Z00C
-0xCB2B	sra e	2	2	Z00C
-0xCB2C	sra h	2	2	Z00C
-0xCB2D	sra l	2	2	Z00C
-0xCB2E	sra [hl]	2	4	Z00C
-0xCB2F	sra a	2	2	Z00C
-0xCB30	swap b	2	2	Z000
-0xCB31	swap c	2	2	Z000
-0xCB32	swap d	2	2	Z000
-0xCB33	swap e	2	2	Z000
-0xCB34	swap h	2	2	Z000
-0xCB35	swap l	2	2	Z000
-0xCB36	swap [hl]	2	4	Z000
-0xCB37	swap a	2	2	Z000
-0xCB38	srl b	2	2	Z00C
-0xCB39	srl c	2	2	Z00C
-0xCB3A	srl d	2	2	Z00C
-0xCB3B	srl e	2	2	Z00C
-0xCB3C	srl h	2	2	Z00C
-0xCB3D	srl l	2	2	Z00C
-0xCB3E	srl [hl]	2	4	Z00C
-0xCB3F	srl a	2	2	Z00C
-0xCB40	bit 0,b	2	2	Z01-
-0xCB41	bit 0,c	2	2	Z01-
-0xCB42	bit 0,d	2	2	Z01-
-0xCB43	bit 0,e	2	2	Z01-
-0xCB44	bit 0,h	2	2	Z01-
-0xCB45	bit 0,l	2	2	Z01-
-0xCB46	bit 0,[hl]	2	3	Z01-
-0xCB47	bit 0,a	2	2	Z01-
-0xCB48	bit 1,b	2	2	Z01-
-0xCB49	bit 1,c	2	2	Z01-
-0xCB4A	bit 1,d	2	2	Z01-
-0xCB4B	bit 1,e	2	2	Z01-
-0xCB4C	bit 1,h	2	2	Z01-
-0xCB4D	bit 1,l	2	2	Z01-
-0xCB4E	bit 1,[hl]	2	3	Z01-
-0xCB4F	bit 1,a	2	2	Z01-
-0xCB50	bit 2,b	2	2	Z01-
-0xCB51	bit 2,c	2	2	Z01-
-0xCB52	bit 2,d	2	2	Z01-
-0xCB53	bit 2,e	2	2	Z01-
-0xCB54	bit 2,h	2	2	Z01-
-0xCB55	bit 2,l	2	2	Z01-
-0xCB56	bit 2,[hl]	2	3	Z01-
-0xCB57	bit 2,a	2	2	Z01-
-0xCB58	bit 3,b	2	2	Z01-
-0xCB59	bit 3,c	2	2	Z01-
-0xCB5A	bit 3,d	2	2	Z01-
-0xCB5B	bit 3,e	2	2	Z01-
-0xCB5C	bit 3,h	2	2	Z01-
-0xCB5D	bit 3,l	2	2	Z01-
-0xCB5E	bit 3,[hl]	2	3	Z01-
-0xCB5F	bit 3,a	2	2	Z01-
-0xCB60	bit 4,b	2	2	Z01-
-0xCB61	bit 4,c	2	2	Z01-
-0xCB62	bit 4,d	2	2	Z01-
-0xCB63	bit 4,e	2	2	Z01-
-0xCB64	bit 4,h	2	2	Z01-
-0xCB65	bit 4,l	2	2	Z01-
-0xCB66	bit 4,[hl]	2	3	Z01-
-0xCB67	bit 4,a	2	2	Z01-
-0xCB68	bit 5,b	2	2	Z01-
-0xCB69	bit 5,c	2	2	Z01-
-0xCB6A	bit 5,d	2	2	Z01-
-0xCB6B	bit 5,e	2	2	Z01-
-0xCB6C	bit 5,h	2	2	Z01-
-0xCB6D	bit 5,l	2	2	Z01-
-0xCB6E	bit 5,[hl]	2	3	Z01-
-0xCB6F	bit 5,a	2	2	Z01-
-0xCB70	bit 6,b	2	2	Z01-
-0xCB71	bit 6,c	2	2	Z01-
-0xCB72	bit 6,d	2	2	Z01-
-0xCB73	bit 6,e	2	2	Z01-
-0xCB74	bit 6,h	2	2	Z01-
-0xCB75	bit 6,l	2	2	Z01-
-0xCB76	bit 6,[hl]	2	3	Z01-
-0xCB77	bit 6,a	2	2	Z01-
-0xCB78	bit 7,b	2	2	Z01-
-0xCB79	bit 7,c	2	2	Z01-
-0xCB7A	bit 7,d	2	2	Z01-
-0xCB7B	bit 7,e	2	2	Z01-
-0xCB7C	bit 7,h	2	2	Z01-
-0xCB7D	bit 7,l	2	2	Z01-
-0xCB7E	bit 7,[hl]	2	3	Z01-
-0xCB7F	bit 7,a	2	2	Z01-
-0xCB80	res 0,b	2	2	----
-0xCB81	res 0,c	2	2	----
-0xCB82	res 0,d	2	2	----
-0xCB83	res 0,e	2	2	----
-0xCB84	res 0,h	2	2	----
-0xCB85	res 0,l	2	2	----
-0xCB86	res 0,[hl]	2	4	----
-0xCB87	res 0,a	2	2	----
-0xCB88	res 1,b	2	2	----
-0xCB89	res 1,c	2	2	----
-0xCB8A	res 1,d	2	2	----
-0xCB8B	res 1,e	2	2	----
-0xCB8C	res 1,h	2	2	----
-0xCB8D	res 1,l	2	2	----
-0xCB8E	res 1,[hl]	2	4	----
-0xCB8F	res 1,a	2	2	----
-0xCB90	res 2,b	2	2	----
-0xCB91	res 2,c	2	2	----
-0xCB92	res 2,d	2	2	----
-0xCB93	res 2,e	2	2	----
-0xCB94	res 2,h	2	2	----
-0xCB95	res 2,l	2	2	----
-0xCB96	res 2,[hl]	2	4	----
-0xCB97	res 2,a	2	2	----
-0xCB98	res 3,b	2	2	----
-0xCB99	res 3,c	2	2	----
-0xCB9A	res 3,d	2	2	----
-0xCB9B	res 3,e	2	2	----
-0xCB9C	res 3,h	2	2	----
-0xCB9D	res 3,l	2	2	----
-0xCB9E	res 3,[hl]	2	4	----
-0xCB9F	res 3,a	2	2	----
-0xCBA0	res 4,b	2	2	----
-0xCBA1	res 4,c	2	2	----
-0xCBA2	res 4,d	2	2	----
-0xCBA3	res 4,e	2	2	----
-0xCBA4	res 4,h	2	2	----
-0xCBA5	res 4,l	2	2	----
-0xCBA6	res 4,[hl]	2	4	----
-0xCBA7	res 4,a	2	2	----
-0xCBA8	res 5,b	2	2	----
-0xCBA9	res 5,c	2	2	----
-0xCBAA	res 5,d	2	2	----
-0xCBAB	res 5,e	2	2	----
-0xCBAC	res 5,h	2	2	----
-0xCBAD	res 5,l	2	2	----
-0xCBAE	res 5,[hl]	2	4	----
-0xCBAF	res 5,a	2	2	----
-0xCBB0	res 6,b	2	2	----
-0xCBB1	res 6,c	2	2	----
-0xCBB2	res 6,d	2	2	----
-0xCBB3	res 6,e	2	2	----
-0xCBB4	res 6,h	2	2	----
-0xCBB5	res 6,l	2	2	----
-0xCBB6	res 6,[hl]	2	4	----
-0xCBB7	res 6,a	2	2	----
-0xCBB8	res 7,b	2	2	----
-0xCBB9	res 7,c	2	2	----
-0xCBBA	res 7,d	2	2	----
-0xCBBB	res 7,e	2	2	----
-0xCBBC	res 7,h	2	2	----
-0xCBBD	res 7,l	2	2	----
-0xCBBE	res 7,[hl]	2	4	----
-0xCBBF	res 7,a	2	2	----
-0xCBC0	set 0,b	2	2	----
-0xCBC1	set 0,c	2	2	----
-0xCBC2	set 0,d	2	2	----
-0xCBC3	set 0,e	2	2	----
-0xCBC4	set 0,h	2	2	----
-0xCBC5	set 0,l	2	2	----
-0xCBC6	set 0,[hl]	2	4	----
-0xCBC7	set 0,a	2	2	----
-0xCBC8	set 1,b	2	2	----
-0xCBC9	set 1,c	2	2	----
-0xCBCA	set 1,d	2	2	----
-0xCBCB	set 1,e	2	2	----
-0xCBCC	set 1,h	2	2	----
-0xCBCD	set 1,l	2	2	----
-0xCBCE	set 1,[hl]	2	4	----
-0xCBCF	set 1,a	2	2	----
-0xCBD0	set 2,b	2	2	----
-0xCBD1	set 2,c	2	2	----
-0xCBD2	set 2,d	2	2	----
-0xCBD3	set 2,e	2	2	----
-0xCBD4	set 2,h	2	2	----
-0xCBD5	set 2,l	2	2	----
-0xCBD6	set 2,[hl]	2	4	----
-0xCBD7	set 2,a	2	2	----
-0xCBD8	set 3,b	2	2	----
-0xCBD9	set 3,c	2	2	----
-0xCBDA	set 3,d	2	2	----
-0xCBDB	set 3,e	2	2	----
-0xCBDC	set 3,h	2	2	----
-0xCBDD	set 3,l	2	2	----
-0xCBDE	set 3,[hl]	2	4	----
-0xCBDF	set 3,a	2	2	----
-0xCBE0	set 4,b	2	2	----
-0xCBE1	set 4,c	2	2	----
-0xCBE2	set 4,d	2	2	----
-0xCBE3	set 4,e	2	2	----
-0xCBE4	set 4,h	2	2	----
-0xCBE5	set 4,l	2	2	----
-0xCBE6	set 4,[hl]	2	4	----
-0xCBE7	set 4,a	2	2	----
-0xCBE8	set 5,b	2	2	----
-0xCBE9	set 5,c	2	2	----
-0xCBEA	set 5,d	2	2	----
-0xCBEB	set 5,e	2	2	----
-0xCBEC	set 5,h	2	2	----
-0xCBED	set 5,l	2	2	----
-0xCBEE	set 5,[hl]	2	4	----
-0xCBEF	set 5,a	2	2	----
-0xCBF0	set 6,b	2	2	----
-0xCBF1	set 6,c	2	2	----
-0xCBF2	set 6,d	2	2	----
-0xCBF3	set 6,e	2	2	----
-0xCBF4	set 6,h	2	2	----
-0xCBF5	set 6,l	2	2	----
-0xCBF6	set 6,[hl]	2	4	----
-0xCBF7	set 6,a	2	2	----
-0xCBF8	set 7,b	2	2	----
-0xCBF9	set 7,c	2	2	----
-0xCBFA	set 7,d	2	2	----
-0xCBFB	set 7,e	2	2	----
-0xCBFC	set 7,h	2	2	----
-0xCBFD	set 7,l	2	2	----
-0xCBFE	set 7,[hl]	2	4	----
-0xCBFF	set 7,a	2	2	----"""
+# shades 0-3 as Tk colours, lightest first
+SHADE_COLORS = ("#fff", "#aaa", "#555", "#000")
+
+#shared memory between the Tk process and the emulation process (-p), a header
+#of 32 bit words followed by one byte per LCD pixel holding its shade
+SHM_PUBLISHED = 0 # number of the frame in the framebuffer, written by the emulation
+SHM_PRESENTED = 1 # number of the last frame drawn, written by Tk
+SHM_EMULATED  = 2 # frames emulated so far, written by the emulation
+SHM_JOYPAD    = 3 # buttons held as bits in JOYPAD_BUTTONS order, written by Tk
+SHM_QUIT      = 4 # set by Tk to stop the emulation
+SHM_HEADER_SIZE = 4 * 5
+SHM_SIZE = SHM_HEADER_SIZE + SCRN_X * SCRN_Y
+
 
 #For now, unused. However, if time may try to implement so that 
 #hold works better
@@ -661,46 +239,74 @@ class KeyTracker():
         self.last_release_time = time.time()
 
 class Sprite:
+    __slots__ = ("_hamulator", "_index", "_master", "_canvas", "_y", "_x", "_tile_id", "_flags", "_height",
+                 "_double_sprite", "_pixmap", "_shown", "_photo", "_photo_height", "_photo_id", "_above_id")
+
     def __init__(self, hamulator, master, canvas, index):
         self._hamulator = hamulator
         self._index = index
         self._master = master
         self._canvas = canvas
 
-    def init(self):
-
         self._y = -OAM_Y_OFS
         self._x = -OAM_X_OFS
 
-        self._pixmap = [[0 for i in range(0,8)] for j in range(0,8)]
-
-        self._photo = PhotoImage(width=8, height=8)
+        self._tile_id = 0
+        self._flags = 0
+        self._height = 8
+        self._pixmap = bytearray(8 * 8) # 8 wide, a shade per byte
+        self._shown = False
+        self._photo = None
+
+    #nothing is made here, most sprites never leave OAM position 0,0
+    def init(self, above_id):
+        self._above_id = above_id
+
+    def on_screen(self, mem):
+        y = mem[_OAMRAM + self._index * 4 + OAMA_Y]
+        x = mem[_OAMRAM + self._index * 4 + OAMA_X]
+        return 0 < y < SCRN_Y + OAM_Y_OFS and 0 < x < SCRN_X + OAM_X_OFS
+
+    def create_photo(self):
+        self._photo = PhotoImage(master=self._canvas, width=8, height=self._height)
+        self._photo_height = self._height
         self._photo_id = self._canvas.create_image(-8, -16, image = self._photo, anchor=NW, state='hidden')
+        self._canvas.tag_raise(self._photo_id, self._above_id)
+        self._shown = False
+        self._x = -8
+        self._y = -16
 
-        self.init_from_oam()
-        self._canvas.tag_raise(self._photo_id)
+    #decode the tile into the pixmap, no Tk involved
+    def rasterise(self, mem):
+        self._tile_id = mem[_OAMRAM + self._index * 4 + OAMA_TILEID]
+        self._flags = mem[_OAMRAM + self._index * 4 + OAMA_FLAGS]
 
+        self._double_sprite = mem[rLCDC] & LCDCF_OBJ16 == LCDCF_OBJ16
+        self._height = 16 if self._double_sprite else 8
 
-    #grab all the bytes
-    def init_from_oam(self, new_photo=False):
-        self._tile_id = self._hamulator._mem[_OAMRAM + self._index * 4 + OAMA_TILEID]
-        self._flags = self._hamulator._mem[_OAMRAM + self._index * 4 + OAMA_FLAGS]
+        if len(self._pixmap) != 8 * self._height:
+            self._pixmap = bytearray(8 * self._height)
 
-        self._double_sprite = self._hamulator._mem[rLCDC] & LCDCF_OBJ16 == LCDCF_OBJ16
-        self._height = 16 if self._double_sprite else 8
+        fill_tile(self._pixmap, mem, _VRAM8000, self._tile_id, self._double_sprite)
+
+    #grab all the bytes. True when the photo was (re)made, it is then back at
+    #-8,-16 and needs moving to the sprite's position
+    def init_from_oam(self, mem, new_photo=False):
+        self.rasterise(mem)
+
+        if self._photo is None:
+            if not self.on_screen(mem):
+                return False
+            self.create_photo()
+            new_photo = True
 
         #resize, should not happen often
-        if len(self._pixmap) != self._height:
+        if self._photo_height != self._height:
             self._canvas.delete(self._photo_id)
-            self._pixmap = [[0 for i in range(0,8)] for j in range(0,self._height)]
-            self._photo = PhotoImage(width=8, height=self._height)
-            self._photo_id = self._canvas.create_image(-8, -16, image = self._photo, anchor=NW, state='hidden')
-            self._x = -8
-            self._y = -16
+            self.create_photo()
+            new_photo = True
 
-        fill_tile(self._pixmap, self._hamulator._mem, _VRAM8000, self._tile_id, self._double_sprite)
-    
-        palette = hamulator._mem[rOBP1] if self._flags & OAMF_PAL1 == OAMF_PAL1 else hamulator._mem[rOBP0]
+        palette = mem[rOBP1] if self._flags & OAMF_PAL1 == OAMF_PAL1 else mem[rOBP0]
         palette_map = {0: palette & 0x03, 1: (palette >> 2) & 0x03, 2: (palette >> 4) & 0x03, 3: (palette >> 6) & 0x03}
 
         colors = ["#fff" for i in range(0, 8)]
@@ -711,7 +317,7 @@ class Sprite:
 
         for j in y_range:
             for i in x_range:
-                color = palette_map[self._pixmap[j % self._height][ i %8]]
+                color = palette_map[self._pixmap[8 * (j % self._height) + i % 8]]
                 fill_color = "#fff"
                 if color == 3:
                     fill_color = "#000"
@@ -729,26 +335,53 @@ class Sprite:
                 #print("color=" + fill_color + ", ", (j, i), flush=True)
 
         self._photo.put(color_string)
+        return new_photo
 
 
-    def update(self):
-        self.init_from_oam()
-        self.move()
+    def update(self, mem):
+        self.init_from_oam(mem)
+        self.move(mem)
+
+    #draw into 160 wide screen lines for single image mode, color 0 is transparent
+    def blit(self, lines, mem):
+        top  = mem[_OAMRAM + self._index * 4 + OAMA_Y] - OAM_Y_OFS
+        left = mem[_OAMRAM + self._index * 4 + OAMA_X] - OAM_X_OFS
+        if top >= SCRN_Y or top <= -self._height or left >= SCRN_X or left <= -8:
+            return
+
+        palette = mem[rOBP1] if self._flags & OAMF_PAL1 == OAMF_PAL1 else mem[rOBP0]
+        y_flip = self._flags & OAMF_YFLIP == OAMF_YFLIP
+        x_flip = self._flags & OAMF_XFLIP == OAMF_XFLIP
+
+        for j in range(max(0, -top), min(self._height, SCRN_Y - top)):
+            row = 8 * (self._height - 1 - j if y_flip else j)
+            line = lines[top + j]
+            for i in range(max(0, -left), min(8, SCRN_X - left)):
+                color = self._pixmap[row + (7 - i if x_flip else i)]
+                if color != 0:
+                    line[left + i] = (palette >> (2 * color)) & 0x03
 
     def show(self):
+        if self._shown or self._photo is None:
+            return
         self._canvas.itemconfigure(self._photo_id, state='normal')
-        self._canvas.update_idletasks()
-        pass
+        self._shown = True
 
     def hide(self):
+        if not self._shown:
+            return
         self._canvas.itemconfigure(self._photo_id, state='hidden')
-        self._canvas.update_idletasks()
-        pass
+        self._shown = False
 
-    def move(self):
+    def move(self, mem):
+        # first time on screen, make the image before moving it there
+        if self._photo is None:
+            if not self.on_screen(mem):
+                return
+            self.init_from_oam(mem)
 
-        new_y = self._hamulator._mem[_OAMRAM + self._index * 4 + OAMA_Y] - OAM_Y_OFS
-        new_x = self._hamulator._mem[_OAMRAM + self._index * 4 + OAMA_X] - OAM_X_OFS
+        new_y = mem[_OAMRAM + self._index * 4 + OAMA_Y] - OAM_Y_OFS
+        new_x = mem[_OAMRAM + self._index * 4 + OAMA_X] - OAM_X_OFS
 
         #if self._verbose:
         #print("sprite offset = x,y=", new_x, new_y, flush=True)
@@ -757,6 +390,9 @@ class Sprite:
         delta_x = new_x - self._x
         delta_y = new_y - self._y
 
+        if delta_x == 0 and delta_y == 0:
+            return
+
         #print("moving sprite: x,y=", delta_x, delta_y)
         self._canvas.move(self._photo_id, delta_x, delta_y)
 
@@ -765,11 +401,10 @@ class Sprite:
         self._x  = new_x
         self._y  = new_y
 
-        #print(f"(after) x={self._bg_x},y={self._bg_y}", flush=True)
-
-        self._canvas.update_idletasks()
-
 class WindowTilemap:
+    __slots__ = ("_hamulator", "_master", "_canvas", "_verbose", "_x", "_y", "_dirty_tiles",
+                 "_pixmap", "_shadow", "_photo", "_photo_id")
+
     def __init__(self, hamulator, master, canvas, verbose = False):
 
         self._hamulator = hamulator
@@ -780,49 +415,35 @@ class WindowTilemap:
         # TODO: use -7  for beginning x?
         self._x = 0
         self._y = 0
-        self._pixmap_changed = True
+        self._dirty_tiles = []
 
-        self._prev_pixmap = [[0 for i in range(0, 256)] for j in range(0, 256)]
-        self._pixmap      = [[0 for i in range(0, 256)] for j in range(0, 256)]
+        self._pixmap = bytearray(256 * 256)
+        self._shadow = TilemapShadow()
 
     def init(self):
-        self._photo = PhotoImage(width=256, height=256)
+        self._photo = PhotoImage(master=self._canvas, width=256, height=256)
+        # blank like the pixmap, an update only uploads once that changes
+        self._photo.put(SHADE_COLORS[0], to=(0, 0, 256, 256))
         self._photo_id = self._canvas.create_image(0, 0, image = self._photo, anchor=NW, state='hidden')
         self._canvas.tag_raise(self._photo_id)
 
-    def update(self):
-        lcd_flags = self._hamulator._mem[rLCDC]
+    #refresh the pixmap from VRAM, no Tk involved
+    def fill(self, mem):
+        lcd_flags = mem[rLCDC]
 
         #convert to signed number if $8800 mode
         base = _VRAM9000 if lcd_flags & LCDCF_BG8800 == LCDCF_BG8800 else _VRAM8000
         tilemap_addr = START_TILEMAP2 if lcd_flags & LCDCF_WIN9C00 == LCDCF_WIN9C00 else START_TILEMAP1
 
-        pixmap_changed = fill_pixmap(self._hamulator._mem, self._prev_pixmap, self._pixmap, base, tilemap_addr)
+        self._dirty_tiles = fill_pixmap(mem, self._pixmap, self._shadow, base, tilemap_addr)
 
-        colors = ["#fff" for i in range(0, 256)]
-        color_string = ""
-        for j in range(0,256):
-            for i in range(0, 256):
-                color = self._pixmap[j % 256][i%256]
-                fill_color = "#fff"
-                if color == 3:
-                    fill_color = "#000"
-                if color == 2:
-                    fill_color = "#555"
-                if color == 1:
-                    fill_color = "#aaa"
-
-                colors[i] = fill_color
-
-            if j == 0:
-                color_string = "{" + " ".join(colors) + "}"
-            else:
-                color_string += " {" + " ".join(colors) + "}"
-                #print("color=" + fill_color + ", ", (j, i), flush=True)
-
-        self._photo.put(color_string)
-        self.move()
-        self._canvas.update_idletasks()
+    #upload only the tiles that changed
+    def update(self, mem):
+        self.fill(mem)
+        for x0, y0, x1, y1 in tile_rects(self._dirty_tiles):
+            self._photo.put(pixmap_data(self._pixmap, x0, y0, x1, y1), to=(x0, y0, x1, y1))
+        self._dirty_tiles = []
+        self.move(mem)
 
     def hide(self):
         self._canvas.itemconfigure(self._photo_id, state='hidden')
@@ -832,9 +453,9 @@ class WindowTilemap:
         self._canvas.itemconfigure(self._photo_id, state='normal')
         self._canvas.update_idletasks()
 
-    def move(self):
-        window_x = self._hamulator._mem[rWX] - WX_OFS
-        window_y = self._hamulator._mem[rWY]
+    def move(self, mem):
+        window_x = mem[rWX] - WX_OFS
+        window_y = mem[rWY]
 
         # this is the delta for
         delta_x = window_x - self._x
@@ -865,8 +486,8 @@ def fill_tile(tile, mem, base, tile_index, is_double=False):
         #print()
 
         byte_index = 0
-        # get tile(s) -> 2 if OAM in 8x16 mode
-        for i in range(0,len(tile)):
+        # get tile(s) -> 2 if OAM in 8x16 mode, tile is 8 shades a row
+        for i in range(0,len(tile) // 8):
             byte1 = tile_bytes[byte_index]
             byte2 = tile_bytes[byte_index + 1]
             #print("byte1={0:08b}".format(byte1))
@@ -875,58 +496,385 @@ def fill_tile(tile, mem, base, tile_index, is_double=False):
             for j in range(7,-1, -1):
                 bit1 = byte1 & power
                 bit2 = byte2 & power
-                tile[i][j] = 2*bit2 + bit1
+                tile[8 * i + j] = 2*bit2 + bit1
                 byte1 >>= 1
                 byte2 >>= 1
 
             #print("unzipped=[ ", end="")
             #for k in range(0,8):
-            #    print("{0:02b}".format(tile[i][k]), end=" ")
+            #    print("{0:02b}".format(tile[8 * i + k]), end=" ")
 
             #print("]")
 
             byte_index += 2
 
-def fill_pixmap(mem, prev_pixmap, pixmap, base, tilemap_addr):
-    bg_palette = hamulator._mem[rBGP]
-
-    palette_map = {0: bg_palette & 0x03, 1: (bg_palette >> 2) & 0x03, 2: (bg_palette >> 4) & 0x03, 3: (bg_palette >> 6) & 0x03}
-
-    # read first tile index in tilemap
-    tile_index = mem[tilemap_addr]
-    #print("tile_index =", tile_index)
-
-    tile = [[0 for i in range(8)] for i in range(8)]
-
-    for tile_row in range(0,32):
-        for tile_col in range(0,32):
+#What a pixmap was last filled from, so the next fill only redraws the map
+#entries that changed or point at a tile that did
+class TilemapShadow:
+    __slots__ = ("state", "tilemap", "tiles")
+
+    def __init__(self):
+        self.state = None   # palette, tile data base and map address, None before the first fill
+        self.tilemap = None # the 32x32 map entries
+        self.tiles = None   # tile data $8000-$97FF
+
+#redraw the tiles of the 32x32 map that changed since the shadow was taken
+#into pixmap, and return the ones whose pixels did as row * 32 + col.
+#Each tile is decoded once and copied in a row of 8 at a time.
+def fill_pixmap(mem, pixmap, shadow, base, tilemap_addr):
+    bg_palette = mem[rBGP]
+
+    # translate table from tile colors to shades
+    palette_map = bytes([bg_palette & 0x03, (bg_palette >> 2) & 0x03, (bg_palette >> 4) & 0x03, (bg_palette >> 6) & 0x03]) + bytes(252)
+
+    state = (bg_palette, base, tilemap_addr)
+    tilemap = mem[tilemap_addr:tilemap_addr + 32 * 32]
+    tiles = mem[_VRAM8000:START_TILEMAP1]
+
+    # map entries to redraw
+    if shadow.state != state:
+        cells = range(0, 32 * 32)
+    elif tilemap == shadow.tilemap and tiles == shadow.tiles:
+        cells = ()
+    else:
+        # tiles rewritten, numbered from $8000
+        dirty_tiles = set()
+        if tiles != shadow.tiles:
+            prev_tiles = shadow.tiles
+            for tile in range(0, len(tiles) // 16):
+                if tiles[16 * tile:16 * tile + 16] != prev_tiles[16 * tile:16 * tile + 16]:
+                    dirty_tiles.add(tile)
+        # the tile an entry points at, numbered the same way
+        offset = 0 if base == _VRAM8000 else 256
+        signed = base == _VRAM9000
+        prev_tilemap = shadow.tilemap
+        cells = []
+        for row in range(0, 32 * 32, 32):
+            if dirty_tiles or tilemap[row:row + 32] != prev_tilemap[row:row + 32]:
+                cells += [cell for cell in range(row, row + 32)
+                          if tilemap[cell] != prev_tilemap[cell] or
+                          (tilemap[cell] - 256 if signed and tilemap[cell] > 127 else tilemap[cell]) + offset in dirty_tiles]
+
+    shadow.state = state
+    shadow.tilemap = tilemap
+    shadow.tiles = tiles
+
+    tile = bytearray(8 * 8)
+    shaded_tiles = {} # tile index: its 64 shades
+    changed = []
+
+    for cell in cells:
+        tile_index = tilemap[cell]
+        shaded = shaded_tiles.get(tile_index)
+        if shaded is None:
+            fill_tile(tile, mem, base, tile_index)
+            shaded = shaded_tiles[tile_index] = tile.translate(palette_map)
+
+        # now copy tile into screen
+        tile_row, tile_col = divmod(cell, 32)
+        offset = 256 * 8 * tile_row + 8 * tile_col
+        tile_changed = False
+        for i in range(0, 64, 8):
+            if pixmap[offset:offset + 8] != shaded[i:i + 8]:
+                pixmap[offset:offset + 8] = shaded[i:i + 8]
+                tile_changed = True
+            offset += 256
+        if tile_changed:
+            changed.append(cell)
+
+    return changed
+
+#Tiles (row * 32 + col) as pixel rectangles (x0, y0, x1, y1), runs of tiles
+#along a row joined with the same runs on the rows below. Past max_rects it
+#is one rectangle around them all, fewer Tk calls beat fewer pixels.
+def tile_rects(cells, max_rects = 32):
+    # runs of tiles along each row
+    runs = {}
+    for cell in sorted(cells):
+        row, col = divmod(cell, 32)
+        row_runs = runs.setdefault(row, [])
+        if row_runs and row_runs[-1][1] == col:
+            row_runs[-1][1] = col + 1
+        else:
+            row_runs.append([col, col + 1])
+
+    rects = []
+    growing = {} # (col0, col1): first row of a rectangle that reached the row above
+    for row in range(0, 33):
+        extended = {}
+        for col0, col1 in runs.get(row, ()):
+            extended[(col0, col1)] = growing.pop((col0, col1), row)
+        rects += [(8 * col0, 8 * row0, 8 * col1, 8 * row) for (col0, col1), row0 in growing.items()]
+        growing = extended
+
+    if len(rects) > max_rects:
+        rects = [(min(rect[0] for rect in rects), min(rect[1] for rect in rects),
+                  max(rect[2] for rect in rects), max(rect[3] for rect in rects))]
+    return rects
+
+#Tk image data for a rectangle of a 256 wide pixmap
+def pixmap_data(pixmap, x0, y0, x1, y1):
+    return " ".join(["{" + " ".join([SHADE_COLORS[color] for color in pixmap[256 * y + x0:256 * y + x1]]) + "}"
+                     for y in range(y0, y1)])
+
+#Paces emulated frames against the monotonic clock at FRAME_RATE times a
+#speed multiplier. Deadlines are counted from the last resync, so the
+#rounding of each sleep never adds up to drift. A speed of 0 is turbo,
+#frames are counted but never waited for.
+class FrameScheduler:
+    def __init__(self, speed = 1.0):
+        self.late_frames = 0
+        self.set_speed(speed)
+
+    # 2 runs twice as fast as a DMG, 0.5 is slow motion, 0 as fast as it can
+    def set_speed(self, speed):
+        self._speed = speed
+        self._period = 1 / (FRAME_RATE * speed) if speed > 0 else 0
+        self.resync()
+
+    def turbo(self):
+        return self._speed == 0
+
+    def resync(self):
+        self._base = time.monotonic()
+        self._frames = 0
+
+    def time_to_next_frame(self):
+        return max(0, self._base + (self._frames + 1) * self._period - time.monotonic())
+
+    # called once per emulated frame, sleeps for what is left of its period
+    def wait(self):
+        self._frames += 1
+        if self.turbo():
+            return
+        remaining = self._base + self._frames * self._period - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        elif remaining < -self._period:
+            # a whole frame behind, count it and start over instead of rushing to catch up
+            self.late_frames += 1
+            self.resync()
+
+#A finished frame, handed from the emulation thread to the Tk thread.
+#mem is a copy of memory taken when vblank starts and the *_changes
+#counters say which layers were written since the start of the run.
+#Nothing writes to a Frame once it is published.
+class Frame:
+    __slots__ = ("number", "mem", "bg_changes", "window_changes", "sprite_changes")
+
+    def __init__(self, number, mem, bg_changes, window_changes, sprite_changes):
+        self.number = number
+        self.mem = mem
+        self.bg_changes = bg_changes
+        self.window_changes = window_changes
+        self.sprite_changes = sprite_changes
+
+def speed_title(emulated, drawn, elapsed):
+    return f"Hamulator - {emulated / (elapsed * FRAME_RATE):.0%} speed, {drawn}/{emulated} frames drawn"
+
+#Things due at a given T-cycle, kept in a heap so run() only has to compare
+#the cycle counter with next_time after each instruction
+class EventQueue:
+    __slots__ = ("_heap", "_count", "next_time")
+
+    def __init__(self):
+        self._heap = []
+        self._count = 0 # events due at the same time run in the order they were scheduled
+        self.next_time = NEVER
+
+    #callback(when) is called once the cycle counter reaches when
+    def schedule(self, when, callback):
+        event = [when, self._count, callback]
+        self._count += 1
+        heapq.heappush(self._heap, event)
+        self.next_time = self._heap[0][0]
+        return event
+
+    #dropped when it comes up
+    def cancel(self, event):
+        event[2] = None
+
+    def run_due(self, cycles):
+        heap = self._heap
+        while heap and heap[0][0] <= cycles:
+            when, count, callback = heapq.heappop(heap)
+            if callback is not None:
+                callback(when)
+        self.next_time = heap[0][0] if heap else NEVER
+
+#DIV, TIMA and TAC without ticking anything. DIV is the upper byte of a counter
+#that started at _div_start, TIMA is counted up from the last time it was
+#written or synced, and its overflow is an event on the queue. A ROM that never
+#starts the timer never has an event scheduled for it.
+class Timer:
+    __slots__ = ("_hamulator", "_events", "_div_start", "_tima", "_tima_cycles", "_period", "_overflow")
+
+    def __init__(self, hamulator, events):
+        self._hamulator = hamulator
+        self._events = events
+
+        self._div_start = 0
+        self._tima = 0
+        self._tima_cycles = 0
+        self._period = 0 # 0 while stopped
+        self._overflow = None
+
+    #TIMA goes up each time the counter behind DIV passes a multiple of the period
+    def sync(self):
+        cycles = self._hamulator._cycles
+        if self._period:
+            counted = (self._tima_cycles - self._div_start) // self._period
+            self._tima += (cycles - self._div_start) // self._period - counted
+        self._tima_cycles = cycles
+
+    def schedule_overflow(self):
+        if self._overflow is not None:
+            self._events.cancel(self._overflow)
+            self._overflow = None
+        if not self._period:
+            return
 
-            tile_index = mem[tilemap_addr]
-            tilemap_addr += 1
+        # cycle of the increment from $FF to $100
+        next_tick = ((self._tima_cycles - self._div_start) // self._period + 1) * self._period + self._div_start
+        when = next_tick + (0xFF - self._tima) * self._period
+        self._overflow = self._events.schedule(when, self.overflow)
+
+    def overflow(self, when):
+        self._tima = self._hamulator._mem[rTMA]
+        self._tima_cycles = when
+        self._hamulator.request_interrupt(IEF_TIMER)
+        self._overflow = None
+        self.schedule_overflow()
+
+    def read_div(self):
+        self._hamulator._mem[rDIV] = ((self._hamulator._cycles - self._div_start) >> 8) & 0xFF
+
+    def read_tima(self):
+        self.sync()
+        self._hamulator._mem[rTIMA] = self._tima
+
+    #any write clears the counter, which also moves the TIMA edges
+    def write_div(self):
+        self.sync()
+        self._div_start = self._hamulator._cycles
+        self._hamulator._mem[rDIV] = 0
+        self.schedule_overflow()
+
+    def write_tima(self):
+        self.sync()
+        self._tima = self._hamulator._mem[rTIMA]
+        self.schedule_overflow()
+
+    def write_tac(self):
+        self.sync()
+        tac = self._hamulator._mem[rTAC]
+        self._period = TIMER_PERIODS[tac & 0b11] if tac & TACF_START else 0
+        self.schedule_overflow()
+
+#first cycle after `after` that is `offset` cycles into one of the lines
+#first to last of a frame
+def next_line_event(after, offset, first, last):
+    frame_start = after - after % FRAME_CYCLES
+    line = max(first, (after - frame_start - offset) // LINE_CYCLES + 1)
+    if line > last:
+        frame_start += FRAME_CYCLES
+        line = first
+    return frame_start + line * LINE_CYCLES + offset
+
+#LY and the mode and coincidence bits of STAT, worked out from the cycle
+#counter when read. The STAT interrupt is a single event for the next time
+#any of the enabled sources fires, none is scheduled while all are off.
+class LcdStatus:
+    __slots__ = ("_hamulator", "_events", "_stat_event")
+
+    def __init__(self, hamulator, events):
+        self._hamulator = hamulator
+        self._events = events
+        self._stat_event = None
 
-            fill_tile(tile, mem, base, tile_index)
+    def lcd_on(self):
+        return self._hamulator._mem[rLCDC] & LCDCF_ON == LCDCF_ON
 
-            pixmap_changed = False
+    #LY is 0 while the LCD is off
+    def read_ly(self):
+        if self.lcd_on():
+            self._hamulator._mem[rLY] = self._hamulator._cycles % FRAME_CYCLES // LINE_CYCLES
+        else:
+            self._hamulator._mem[rLY] = 0
 
-            # now copy tile into screen
-            screen_row = 8 * tile_row
-            screen_col = 8 * tile_col
-            for i in range(0,8):
-                for j in range(0,8):
-                    if prev_pixmap[screen_row + i][screen_col + j] != pixmap[screen_row + i][screen_col + j]:
-                        pixmap_changed = True
-                    prev_pixmap[screen_row + i][screen_col + j] = pixmap[screen_row + i][screen_col + j]
-                    pixmap[screen_row + i][screen_col + j] = palette_map[tile[i][j]]
+    def read_stat(self):
+        mem = self._hamulator._mem
+        mode = STATF_HBL
+        coincidence = 0
+        if self.lcd_on():
+            cycles = self._hamulator._cycles % FRAME_CYCLES
+            line = cycles // LINE_CYCLES
+            dot = cycles % LINE_CYCLES
+            if line >= SCRN_Y:
+                mode = STATF_VBL
+            elif dot < OAM_SCAN_CYCLES:
+                mode = STATF_OAM
+            elif dot < HBLANK_START_CYCLES:
+                mode = STATF_LCD
+            if line == mem[rLYC]:
+                coincidence = STATF_LYCF
+        # bit 7 always reads 1, the game only gets to set the enable bits
+        mem[rSTAT] = 0b10000000 | (mem[rSTAT] & 0b01111000) | coincidence | mode
+
+    #after a write to STAT, LYC or LCDC
+    def schedule_stat(self):
+        if self._stat_event is not None:
+            self._events.cancel(self._stat_event)
+            self._stat_event = None
+        self.schedule_stat_after(self._hamulator._cycles)
+
+    def schedule_stat_after(self, after):
+        mem = self._hamulator._mem
+        sources = mem[rSTAT] & (STATF_LYC | STATF_MODE10 | STATF_MODE01 | STATF_MODE00)
+        if not sources or not self.lcd_on():
+            return
 
-    return pixmap_changed
+        times = []
+        if sources & STATF_MODE10:
+            times.append(next_line_event(after, 0, 0, SCRN_Y - 1))
+        if sources & STATF_MODE00:
+            times.append(next_line_event(after, HBLANK_START_CYCLES, 0, SCRN_Y - 1))
+        if sources & STATF_MODE01:
+            times.append(next_line_event(after, 0, SCRN_Y, SCRN_Y))
+        if sources & STATF_LYC and mem[rLYC] < LINES:
+            times.append(next_line_event(after, 0, mem[rLYC], mem[rLYC]))
+        if times:
+            self._stat_event = self._events.schedule(min(times), self.stat_interrupt)
+
+    #sources firing together raise one interrupt, as they share the STAT line
+    def stat_interrupt(self, when):
+        self._stat_event = None
+        self._hamulator.request_interrupt(IEF_STAT)
+        self.schedule_stat_after(when)
+
+#Stands in for the Tcl interpreter of a widget and counts every call made through it.
+#Canvas methods, PhotoImage.put and update_idletasks all go through tk.call.
+class TkCallCounter:
+    def __init__(self, tk):
+        self._tk = tk
+        self.count = 0
+
+    def call(self, *args):
+        self.count += 1
+        return self._tk.call(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._tk, name)
 
 class Renderer:
-    def __init__(self, master = None, hamulator = None, unimplemented = True, fast = False, verbose = False):
+    def __init__(self, master = None, hamulator = None, unimplemented = True, fast = False, verbose = False, single_image = False, speed = 1.0):
         self._num_presses = 0
         self.master = master
         self._hamulator = hamulator 
         self._unimplemented = unimplemented
         self._fast = fast
+        self._single_image = single_image
+        self._scheduler = FrameScheduler(0 if fast else speed)
 
         self._verbose = verbose
 
@@ -934,6 +882,11 @@ class Renderer:
         self._current_frame = 0
         self._last_frame_time = 0
         self._last_frame_drawn = 0
+        self._draw_time = 0
+        self._title_time = time.monotonic()
+        self._title_frame = 0
+        self._title_drawn = 0
+        self._frames_drawn = 0
         self._keys = set()
 
         # Calls create method of class Shape
@@ -942,13 +895,15 @@ class Renderer:
     def end(self):
         self._ending = True
         self._emuthread.join()
+        self._hamulator.flush_ram()
+        self.save_movie()
 
     def key_press(self, e):
         self._num_presses += 1
         #print(("{0}. Yep " + e.keysym) .format(self._num_presses), flush=True)
         if e.keysym in JOYPAD_BUTTON_MAP:
-            self._joypad.add(JOYPAD_BUTTON_MAP[e.keysym])
-            #print(self._joypad)
+            self._joypad_held |= JOYPAD_BUTTON_MASKS[JOYPAD_BUTTON_MAP[e.keysym]]
+            self._joypad_taps.append(JOYPAD_BUTTON_MASKS[JOYPAD_BUTTON_MAP[e.keysym]])
         self._keys.add(e.keysym)
         if ("Control_L" in self._keys or "Control_R" in self._keys) and "c" in self._keys:
             sys.stderr.write("Exiting...\n")
@@ -957,15 +912,23 @@ class Renderer:
     def key_release(self, e):
         #print("{0}. Nope".format(self._num_presses), flush=True)
 
-        if e.keysym in JOYPAD_BUTTON_MAP and JOYPAD_BUTTON_MAP[e.keysym] in self._joypad:
-            self._joypad.remove(JOYPAD_BUTTON_MAP[e.keysym])
-            #print(self._joypad)
+        if e.keysym in JOYPAD_BUTTON_MAP:
+            self._joypad_held &= ~JOYPAD_BUTTON_MASKS[JOYPAD_BUTTON_MAP[e.keysym]]
         if e.keysym in self._keys:
             self._keys.remove(e.keysym)
 
     def init_joypad(self):
-        self._joypad = set()
-        #self._joypad_byte = 0b11111111
+        # buttons held, written by the Tk thread only, and every press since the
+        # last latch even if let go, appended by the Tk thread and drained by the
+        # emulation thread. deque appends and pops are atomic, so no press
+        # lands between a read and a clear.
+        self._joypad_held = 0
+        self._joypad_taps = collections.deque()
+        # buttons the emulation sees this frame, latched by the emulation thread
+        self._joypad_buttons = 0
+        # P1 lines pulled low when the emulation last looked, for the joypad interrupt
+        self._joypad_lines = 0
+        self.set_movie(None)
 
         self._hamulator._mem[rP1] = 0b11111111
 
@@ -979,44 +942,140 @@ class Renderer:
         self.master.bind('<KeyRelease>', lambda e: renderer.key_release(e))
         pass
 
-    def write_joypad_poll_result(self):
-        byte = self._hamulator._mem[rP1]
-        
-        if byte   & P1F_GET_NONE == P1F_GET_DPAD and \
-            self._instr_count - self._instr_last_dpad > 2:
-
-            byte |= 0x0F
-            #print("RIGHT in joypad? {}".format("RIGHT" in self._joypad))
-            byte &= ~JOYPAD_BUTTON_TO_BITS["UP"]    if "UP"    in self._joypad else 0xFF
-            byte &= ~JOYPAD_BUTTON_TO_BITS["DOWN"]  if "DOWN"  in self._joypad else 0xFF
-            byte &= ~JOYPAD_BUTTON_TO_BITS["LEFT"]  if "LEFT"  in self._joypad else 0xFF
-            byte &= ~JOYPAD_BUTTON_TO_BITS["RIGHT"] if "RIGHT" in self._joypad else 0xFF
-            self._instr_last_dpad = self._instr_count
-        elif byte & P1F_GET_NONE == P1F_GET_BTN and \
-            self._instr_count - self._instr_last_btn > 6:
-
-            byte |= 0x0F
-            #print(f"joypad={self._joypad}",flush=True)
-            byte &= ~JOYPAD_BUTTON_TO_BITS["START"]  if "START"  in self._joypad else 0xFF
-            byte &= ~JOYPAD_BUTTON_TO_BITS["SELECT"] if "SELECT" in self._joypad else 0xFF
-            byte &= ~JOYPAD_BUTTON_TO_BITS["A"]      if "A"      in self._joypad else 0xFF
-            byte &= ~JOYPAD_BUTTON_TO_BITS["B"]      if "B"      in self._joypad else 0xFF
-
-            #print("BUTTONS!!!")
-            self._instr_last_btn = self._instr_count
-
-        self._hamulator._mem[rP1] = byte
-        #print("Wrote joypad poll result: {0:02X}".format(byte), flush=True)
-        #if self._verbose:
-        #if byte & P1F_GET_NONE != P1F_GET_NONE:
+    #called once before the first instruction and then at the start of every
+    #vblank from the emulation thread, latches the buttons for the frame
+    def joypad_event(self):
+        buttons = self._joypad_held
+        taps = self._joypad_taps
+        while taps:
+            buttons |= taps.popleft()
+        self.latch_joypad(buttons)
+
+    #the game only ever sees buttons latched here, so a movie of them replays
+    #the same run
+    def latch_joypad(self, buttons):
+        if self._movie is not None:
+            buttons = self._movie.latch(buttons)
+        self._joypad_buttons = buttons
+        self.update_joypad_lines()
+
+    #a movie being recorded is written to file_name when the run ends
+    def set_movie(self, movie, file_name = None):
+        self._movie = movie
+        self._movie_file = file_name
+
+    def save_movie(self):
+        if self._movie is not None and not self._movie.playing and self._movie_file:
+            self._movie.save(self._movie_file)
+
+    #the low nibble of P1 with 1 for a line pulled low, by a button held in
+    #a group the select bits the game wrote pick
+    def joypad_lines(self):
+        select = self._hamulator._mem[rP1] & P1F_GET_NONE
+        pressed = 0
+        if select & P1F_4 == 0:
+            pressed |= self._joypad_buttons & 0x0F
+        if select & P1F_5 == 0:
+            pressed |= self._joypad_buttons >> 4
+        return pressed
+
+    #the joypad interrupt is a P1 line going from high to low. That happens
+    #when a latch presses a selected button or a write to P1 selects a group
+    #with one held.
+    def update_joypad_lines(self):
+        lines = self.joypad_lines()
+        if lines & ~self._joypad_lines:
+            self._hamulator.request_interrupt(IEF_HILO)
+        self._joypad_lines = lines
+
+    #P1 is only worked out when the CPU reads it, from the select bits the
+    #game wrote and the buttons held at that moment. 0 means pressed.
+    def read_joypad(self):
+        mem = self._hamulator._mem
+        mem[rP1] = 0b11000000 | (mem[rP1] & P1F_GET_NONE) | (~self.joypad_lines() & 0x0F)
+
+    #the run loop charges a conditional branch its cycles when not taken,
+    #the handler gives back True when it took the branch and the rest is
+    #added here. Other opcodes keep their handler.
+    def catch_branch(self, opcode):
+        op = self._all_ops[opcode]
+        extra = op[3] - op[2]
+        if not extra or opcode not in self._hamulator._isa:
+            return
+
+        handler = self._hamulator._isa[opcode]
+        hamulator = self._hamulator
+        def branch_catch():
+            if handler():
+                hamulator._cycles += extra
+        self._hamulator._isa[opcode] = branch_catch
+
+    #a byte as the CPU would read it now, for code outside the run loop. IO
+    #registers in _io_reads are only brought up to date when read.
+    def read_mem(self, addr):
+        io_read = self._io_reads.get(addr)
+        if io_read is not None:
+            io_read()
+        return self._hamulator._mem[addr]
+
+    #the pages (high address bytes) with an entry in _io_reads, $FF for the IO
+    #registers and any a read watchpoint covers. Changed in place, the read
+    #wrappers hold on to it.
+    def update_io_read_pages(self):
+        pages = bytearray(256)
+        for addr in self._io_reads:
+            pages[addr >> 8] = 1
+        self._io_read_pages[:] = pages
+
+    #wrap the handler of an opcode that reads memory, so reading an address
+    #in _io_reads (P1, DIV, TIMA, LY, STAT, watchpoints) sees its value as of
+    #now. Opcodes that never read memory keep their handler. The address is
+    #worked out in the wrapper before the opcode runs (pc is just past the
+    #opcode), and only looked up when its page has entries in _io_reads.
+    def catch_io_reads(self, opcode):
+        if opcode not in self._loads or opcode not in self._hamulator._isa:
+            return
+
+        operand = self._loads[opcode]
+        handler = self._hamulator._isa[opcode]
+        regs = self._hamulator._regs
+        mem = self._hamulator._mem
+        io_reads = self._io_reads
+        io_read_pages = self._io_read_pages
+        if operand == "a8":
+            def read_catch():
+                io_read = io_reads.get(0xFF00 | mem[regs["pc"]])
+                if io_read is not None:
+                    io_read()
+                handler()
+        elif operand == "c":
+            def read_catch():
+                io_read = io_reads.get(0xFF00 | regs["c"])
+                if io_read is not None:
+                    io_read()
+                handler()
+        elif operand == "n16":
+            def read_catch():
+                pc = regs["pc"]
+                if io_read_pages[mem[pc + 1]]:
+                    io_read = io_reads.get(mem[pc + 1] << 8 | mem[pc])
+                    if io_read is not None:
+                        io_read()
+                handler()
+        else:
+            high, low = operand
+            def read_catch():
+                if io_read_pages[regs[high]]:
+                    io_read = io_reads.get(regs[high] << 8 | regs[low])
+                    if io_read is not None:
+                        io_read()
+                handler()
+        self._hamulator._isa[opcode] = read_catch
 
     def init(self):
         self._start = time.monotonic()
 
         self.init_joypad()
-        self._instr_count = 0
-        self._instr_last_dpad = 0
-        self._instr_last_btn  = 0
 
         self._last_frame_rendered = 0
         self._current_frame = 0
@@ -1029,7 +1088,7 @@ class Renderer:
         # background stuff
         self._bg_x = 0
         self._bg_y = 0
-        self._pixmap_changed = True
+        self._dirty_tiles = [] # map entries redrawn in the pixmap, not yet uploaded
 
         #vram / lcd
         self._opcodes_seen_before = set()
@@ -1044,9 +1103,20 @@ class Renderer:
         self._wrote_to_oam = True
         self._changed_lcd = True
 
-        self._redraw_sprites = True
-        self._redraw_window  = True
-        self._redraw_bg      = True
+        # bumped by the emulation thread on writes, compared by the Tk thread
+        # against what it last drew, so skipped frames never lose a change
+        self._sprite_changes = 1
+        self._window_changes = 1
+        self._bg_changes     = 1
+
+        self._drawn_sprite_changes = 0
+        self._drawn_window_changes = 0
+        self._drawn_bg_changes     = 0
+
+        # what the sprites were last drawn from, so only changed sprites get redrawn
+        self._oam_shadow = None
+        self._obj_shadow = None
+        self._obj_tiles_shadow = None
 
         #lcd
         self._lcd_on     = True
@@ -1054,10 +1124,37 @@ class Renderer:
         self._window_on  = False
         self._bg_on      = False
 
-        self._pixmap_lock = threading.Lock()
+        #frames, produced by run() and presented by my_update()
+        self._in_vblank = False
+        self._frame_start = 0
+        self._events = EventQueue()
+        self._events.schedule(VBLANK_START_CYCLES, self.vblank_start)
+
+        # IO registers worked out when read or acted on when written
+        self._timer = Timer(self._hamulator, self._events)
+        self._lcd_status = LcdStatus(self._hamulator, self._events)
+        self._io_reads = {rP1:   self.read_joypad,
+                          rDIV:  self._timer.read_div,
+                          rTIMA: self._timer.read_tima,
+                          rLY:   self._lcd_status.read_ly,
+                          rSTAT: self._lcd_status.read_stat}
+        self._io_read_pages = bytearray(256)
+        self.update_io_read_pages()
+        self._io_writes = {rP1:   self.update_joypad_lines,
+                           rDIV:  self._timer.write_div,
+                           rTIMA: self._timer.write_tima,
+                           rTAC:  self._timer.write_tac,
+                           rSTAT: self._lcd_status.schedule_stat,
+                           rLYC:  self._lcd_status.schedule_stat}
+        self._frame_number = 0
+        self._stop_frame = None
+        # callables other threads need run on the emulation thread, the debug
+        # server's, run at the start of the next vblank
+        self._emulation_requests = collections.deque()
+        self._emuthread = None
+        self._front = None
+        self._presented = 0
 
-        #vblank stuff
-        self._vblank_lock = threading.Lock()
         self._hamulator._mem[rLCDC] = LCDCF_ON
         self._window = WindowTilemap(self._hamulator, self.master, self.canvas, self._verbose)
         self._sprites = [Sprite(self._hamulator, self.master, self.canvas, i) for i in range(0, OAM_COUNT)]
@@ -1067,20 +1164,13 @@ class Renderer:
         # register halt
         self._hamulator._isa[0x76] = lambda: self.halt()
 
-        self._all_ops = {}
-
-        # register unsupported instructions
-        ops = OPCODES.split("\n")
-        for line in ops:
-            args = line.strip().split("\t")
-            opcode = int(args[0], 16)
-            opcode_bytes = 1 if opcode < 256 else 2
-            op_string = args[1]
-            operand_bytes = 0 if args[2] == '-' else int(args[2]) - opcode_bytes
-
-            self._all_ops[opcode] = (op_string, operand_bytes)
+        # how each opcode touches memory, from the cache when this ROM has been run before
+        analysis = rom_cache.load(self._hamulator._cart, self._verbose)
+        self._all_ops = analysis["ops"]
+        self._stores = analysis["stores"]
+        self._loads = analysis["loads"]
+        startup_mark("rom analysis")
 
-        self.set_vblank(True)
         if self._verbose:
             print(f"{self.time():.2f} done initting", flush=True)
 
@@ -1089,43 +1179,51 @@ class Renderer:
 
     def run(self) -> None:
         while not self._ending:
+            if self._hamulator._interrupt_pending:
+                self._hamulator.service_interrupt()
+                self.check_stack_writes()
             opcode = self._hamulator.fetch()
 
-            if self._unimplemented and opcode not in self._hamulator._isa:
-                self._hamulator._isa[opcode] = lambda: self.print_and_read_operands(self._all_ops[opcode])
-            
             if opcode not in self._ram_catch:
-                if self._all_ops[opcode][0].startswith("ld [") or \
-                    self._all_ops[opcode][0].startswith("ldi [") or \
-                    self._all_ops[opcode][0].startswith("ldd ["):
-                    op_str = self._all_ops[opcode][0]
-                    first_operand = ((op_str.split(" "))[1].split(","))[0]
-                    assert first_operand[0] == "[" and first_operand[-1] == "]"
-                    first_addr = first_operand[1:-1]
-                    bytes_to_rewind = 2 if first_addr == 'n16' else 0
-                    if self._verbose:
-                        print(f"{opcode:02X} -> {op_str} -> {first_addr} -> {bytes_to_rewind}")
-                    self._for_ram_catch[opcode] = (first_addr, bytes_to_rewind)
-                    self._ram_catch[opcode] = lambda: self.check_ram_writes(self._for_ram_catch[opcode])
-                else:
-                    self._ram_catch[opcode] = self.nop
+                self.prepare_opcode(opcode)
 
             instr = self._hamulator.decode(opcode)
             self._hamulator._isa[opcode]()
             self._ram_catch[opcode]()
-            self._instr_count += 1
-            self.write_joypad_poll_result()
+            self._hamulator._cycles += self._all_ops[opcode][2]
+            if self._hamulator._cycles >= self._events.next_time:
+                self._events.run_due(self._hamulator._cycles)
 
             #print("Releasing render lock for instruction")
             #self._render_lock.release()
     
+    #hooks the memory accesses of an opcode in, the first time it runs.
+    #The debugger does it ahead of time before wrapping a handler.
+    def prepare_opcode(self, opcode):
+        if opcode in self._ram_catch:
+            return
+        if self._unimplemented and opcode not in self._hamulator._isa:
+            self._hamulator._isa[opcode] = lambda: self.print_and_read_operands(self._all_ops[opcode])
+        if opcode in self._stores:
+            first_addr, bytes_to_rewind, offset, size = self._stores[opcode]
+            if self._verbose:
+                print(f"{opcode:02X} -> {self._all_ops[opcode][0]} -> {first_addr} -> {bytes_to_rewind}")
+            self._for_ram_catch[opcode] = self._stores[opcode]
+            if first_addr == "sp":
+                self._ram_catch[opcode] = self.check_stack_writes
+            else:
+                self._ram_catch[opcode] = lambda: self.check_ram_writes(self._for_ram_catch[opcode])
+        else:
+            self._ram_catch[opcode] = self.nop
+        self.catch_io_reads(opcode)
+        self.catch_branch(opcode)
+
     def check_ram_writes(self, for_ram_catch):
         #assert self._render_lock.locked()
         if self._verbose:
             print("; Prof Note: checking for VRAM write...", flush=True)
 
-        first_addr = for_ram_catch[0]
-        bytes_to_rewind = for_ram_catch[1]
+        first_addr, bytes_to_rewind, offset, size = for_ram_catch
 
         # simulate write to discover address
         saved_pc = self._hamulator._regs["pc"]
@@ -1139,48 +1237,80 @@ class Renderer:
         #restore this way, in case anything goes wrong
         self._hamulator._regs["pc"] = saved_pc
 
+        addr = (addr + offset) & 0xFFFF
+        self.check_write(addr)
+        if size == 2:
+            self.check_write((addr + 1) & 0xFFFF)
+
+    #pushes, calls and interrupts store to the stack. Stores to work RAM and
+    #HRAM have no side effects, so only a stack anywhere else is checked
+    def check_stack_writes(self):
+        sp = self._hamulator._regs["sp"]
+        if _RAM <= sp < _OAMRAM - 1 or _HRAM <= sp < rIE - 1:
+            return
+        self.check_write(sp)
+        self.check_write((sp + 1) & 0xFFFF)
+
+    #the side effects of a store to addr, every opcode that stores comes here
+    def check_write(self, addr):
         if self._verbose:
             print("; Prof: caught a write to RAM at address 0x{0:04X}".format(addr), flush=True)
 
-        if not self._fast:
-            self._pixmap_lock.acquire()
-
-        # check for writing within VRAM or within two bytes after VRAM
-        if addr in range(_VRAM, _SRAM + 2):
+        # check for writing within VRAM
+        if _VRAM <= addr < _SRAM:
             if self._lcd_on:
                 if self._verbose:
                     print("Need to redraw", flush=True)
             if self._verbose:
                 print("; Prof: caught a write to VRAM at address 0x{0:04X}".format(addr), flush=True)
 
-            self._redraw_window  = True
-            self._redraw_bg      = True
-            self._redraw_sprites = True
+            self._window_changes += 1
+            self._bg_changes     += 1
+
+            # sprites only use tiles from $8000-$8FFF
+            if addr < _VRAM9000:
+                self._sprite_changes += 1
 
             #print(f"Write to VRAM, need to redraw!", flush=True)
 
+        if addr < _VRAM:
+            self._hamulator.mbc_write(addr)
+        elif _SRAM <= addr < _RAM:
+            self._hamulator.write_ram(addr)
+
+        if addr == rDMA:
+            self.oam_dma(self._hamulator._mem[addr])
+
+        if addr == rIE or addr == rIF:
+            self._hamulator.update_interrupts()
+
+        if addr in self._io_writes:
+            self._io_writes[addr]()
+
         # check if sprite updated
-        if addr in range(_OAMRAM, _OAMRAM + 4 * OAM_COUNT + 1):
-            self._redraw_sprites = True
+        if _OAMRAM <= addr < _OAMRAM + 4 * OAM_COUNT or addr == rOBP0 or addr == rOBP1:
+            self._sprite_changes += 1
 
         if addr == rLCDC:
+            # the STAT interrupt stops while the LCD is off
+            self._lcd_status.schedule_stat()
+
             if (not self._lcd_on) and self._hamulator._mem[addr] & LCDCF_ON == LCDCF_ON:
                 self._lcd_on = True
-                self._redraw_bg = True
-                self._redraw_window = True
-                self._redraw_sprites = True
+                self._bg_changes += 1
+                self._window_changes += 1
 
                 if self._verbose:
                     print("Need to redraw", flush=True)
 
-            if (not self._sprites_on) and self._hamulator._mem[addr] & LCDCF_OBJON == LCDCF_OBJON:
-                self._redraw_sprites = True
+            # may have changed the sprite size, update_sprites works out if anything moved
+            self._sprite_changes += 1
 
             if (not self._window_on) and self._hamulator._mem[addr] & LCDCF_WINON == LCDCF_WINON:
-                self._redraw_window = True
+                self._window_changes += 1
 
             if (not self._bg_on) and self._hamulator._mem[addr] & LCDCF_BGON == LCDCF_BGON:
-                self._redraw_bg = True
+                self._bg_changes += 1
 
             #bg
             #if self._lcd_on and self._hamulator._mem[addr] & LCDCF_BGON == LCDCF_BGON:
@@ -1209,10 +1339,66 @@ class Renderer:
 
         #print(f"Set window on={self._window_on}")
 
-        if not self._fast:
-            self._pixmap_lock.release()
+    #copy the 160 bytes at $XX00 into OAM as one slice, and flag the sprites once
+    def oam_dma(self, source):
+        # $E000-$FFFF sources read the echo of work RAM
+        if source >= 0xE0:
+            source -= 0x20
+        start = source << 8
+        mem = self._hamulator._mem
+        mem[_OAMRAM:_OAMRAM + 4 * OAM_COUNT] = mem[start:start + 4 * OAM_COUNT]
+        self._hamulator._cycles += DMA_CYCLES
+        self._sprite_changes += 1
+
+    #events, when is the T-cycle they were due
+    def vblank_start(self, when):
+        self._in_vblank = True
+        self._events.schedule(self._frame_start + FRAME_CYCLES, self.frame_end)
+        # frames go on being timed with the LCD off, but there is no vblank
+        if self._hamulator._mem[rLCDC] & LCDCF_ON:
+            self._hamulator.request_interrupt(IEF_VBLANK)
+        self.joypad_event()
+        self.publish_frame()
+        if self._frame_number == self._stop_frame:
+            self._ending = True
+            self.print_state()
+        requests = self._emulation_requests
+        while requests:
+            requests.popleft()()
+        if self._frame_number % SAVE_INTERVAL_FRAMES == 0:
+            self._hamulator.sync_ram()
+        self._scheduler.wait()
+
+    #-d runs stop at the start of vblank of this frame. Only emulated cycles and
+    #the latched buttons decide what happens up to there, so the state printed
+    #is the same every run. Pacing is left to the scheduler, on top.
+    def stop_at_frame(self, frame):
+        self._stop_frame = frame
+
+    def print_state(self):
+        mem = self._hamulator._mem
+        print(f"frame {self._frame_number} cycles {self._hamulator._cycles} state {hashlib.sha1(bytes(mem)).hexdigest()}", flush=True)
+
+    def frame_end(self, when):
+        self._in_vblank = False
+        self._frame_start = when
+        self._events.schedule(when + VBLANK_START_CYCLES, self.vblank_start)
+
+    #the back buffer is the copy of memory, publishing it is a single attribute
+    #store which is atomic, so neither thread has to take a lock.
+    #While the Tk thread has not taken the last frame there is no point copying
+    #memory again, the frame is skipped and its changes roll into the next one.
+    def publish_frame(self):
+        self._frame_number += 1
+        if self._front is not None and self._front.number != self._presented:
+            return
+        self._front = Frame(self._frame_number, self._hamulator._mem[:],
+                            self._bg_changes, self._window_changes, self._sprite_changes)
 
     def resolve_addr(self, operand):
+        # ld [c], a and friends are relative to $FF00
+        if operand == 'c':
+            return 0xFF00 + self._hamulator._regs["c"]
         return int(self.get_loc(operand), 16)
 
     def from_little(self, operands):
@@ -1224,6 +1410,11 @@ class Renderer:
         if isinstance(expr, int):
             return str(expr)
 
+        # before the hex check, a8 would parse as 0xA8
+        elif expr == 'a8':
+            val = 0xFF00 + self._hamulator.fetch_operands(1)[0]
+            return '0x{0:04X}'.format(val)
+
         elif len(expr) == 2 and expr[0] in self._hamulator._regs and expr[1] in self._hamulator._regs:
             return '0x{0:04X}'.format((self._hamulator._regs[expr[0]] << 8) | self._hamulator._regs[expr[1]])
 
@@ -1262,8 +1453,17 @@ class Renderer:
         #    self._start_halt = time.monotonic()
 
         if self._hamulator._verbose:
-            print("halt ; waiting for vblank", end="", flush=True)
-        time.sleep(0.015)
+            print("halt ; waiting for an interrupt", end="", flush=True)
+
+        # sleep until an enabled interrupt is requested, whether IME is set or not.
+        # only events raise interrupts, so skip straight from one to the next
+        while not self._hamulator._interrupt_ready and not self._ending:
+            self._hamulator._cycles = max(self._hamulator._cycles, self._events.next_time)
+            self._events.run_due(self._hamulator._cycles)
+
+        # stopped before anything woke it, halt again when run() is next called
+        if not self._hamulator._interrupt_ready:
+            self._hamulator._regs["pc"] -= 1
 
         # if (self._hamulator._mem[rIE] & IEF_VBLANK) != IEF_VBLANK or \
         #     (self._hamulator._mem[rLCDC] & LCDCF_ON) == LCDCF_OFF or \
@@ -1287,7 +1487,13 @@ class Renderer:
         #if self._verbose:
         #    print(f"Time for halt: {time.monotonic() - self._start_halt:.2}s", flush=True)
 
+    #whether there is an emulation thread left to run requests, it is gone
+    #once a -d run got to its frame or the debug server killed it
+    def emulation_alive(self):
+        return self._emuthread is None or self._emuthread.is_alive()
+
     def start_execution(self):
+        self.joypad_event()
         self._emuthread = threading.Thread(target = self.run)
         self._emuthread.start()
 
@@ -1298,46 +1504,43 @@ class Renderer:
         # with the help of this we can create different shapes
         self.canvas = Canvas(self.master)
 
+        # everything drawn goes through the canvas, so count the calls there
+        self._tk = TkCallCounter(self.canvas.tk)
+        self.canvas.tk = self._tk
+        self._frame_tk_calls = 0
+
         self.init()
         self.canvas.pack(fill = BOTH, expand = 0)
         self.master.after(1, lambda: self.start_execution())
 
     def init_screen(self):
-        self._pixmap      = [[0 for i in range(256)] for j in range(256)]
-        self._prev_pixmap = [[0 for i in range(256)] for j in range(256)]
-        self._photo = PhotoImage(width=512, height=512)
+        # 256x256 shades, a byte each, row after row
+        self._pixmap = bytearray(256 * 256)
+        self._bg_shadow = TilemapShadow()
+
+        if self._single_image:
+            # one image the size of the LCD, everything is composited before upload
+            self._photo = PhotoImage(master=self.canvas, width=SCRN_X, height=SCRN_Y)
+            self._photo_id = self.canvas.create_image(0, 0, image = self._photo, anchor=NW)
+            self.canvas.pack(fill = BOTH, expand = 1)
+            startup_mark("screen")
+            return
 
-        self.update_pixmap(self._hamulator)
+        self._photo = PhotoImage(master=self.canvas, width=512, height=512)
 
-        #for j in range(0,100,5):
-        for j in range(0,512):
-            self._hamulator._mem[rLY] = j//5
-            for i in range(0,512):
-                color = self._pixmap[j % 256][i % 256] #pixmap[(row_start + j//5) % SCRN_Y][(col_start + i//5) % SCRN_X]
-                fill_color = "#fff"
-                if color == 3:
-                    fill_color = "#000"
-                if color == 2:
-                    fill_color = "#555"
-                if color == 1:
-                    fill_color = "#aaa"
-
-                self._photo.put("{" + fill_color +"}", (i, j))
-                #self._rect_ids[j//5][i//5] = self.canvas.create_rectangle(i, j, i+5, j+5, outline=fill_color, fill=fill_color)
+        # blank in one call, the first frame draws the real background
+        self._photo.put(SHADE_COLORS[0], to=(0, 0, 512, 512))
 
         self._photo_id = self.canvas.create_image(0, 0, image = self._photo, anchor=NW)
 
-        # order here is important, so sprites render below window
+        # sprites make their images once they are first on screen, just above the bg so they stay below the window
         for sprite in self._sprites:
-            sprite.init()
+            sprite.init(self._photo_id)
 
         self._window.init()
 
         self.canvas.pack(fill = BOTH, expand = 1)
-
-        #simulate vblank
-        self._hamulator._mem[rLY] = SCRN_Y
-        #time.sleep(0.001)
+        startup_mark("screen")
 
     def hide_bg(self):
         self.canvas.itemconfigure(self._photo_id, state='hidden')
@@ -1347,62 +1550,47 @@ class Renderer:
         self.canvas.itemconfigure(self._photo_id, state='normal')
         self.canvas.update_idletasks()
 
-    def draw_bg(self):
-        #only draw if in VBlank and LCD is on
-        assert not self._in_vblank
+    #runs on the Tk thread and only looks at the published frame, never at the live memory
+    def draw_bg(self, frame):
+        mem = frame.mem
 
+        #only draw if LCD is on
         if self._verbose:
-            print("[rLCDC]={0:02X}".format(self._hamulator._mem[rLCDC]), flush=True)
-        if (self._hamulator._mem[rLCDC] & LCDCF_ON) == 0:
+            print("[rLCDC]={0:02X}".format(mem[rLCDC]), flush=True)
+        if (mem[rLCDC] & LCDCF_ON) == 0:
             return
 
-        self._hamulator._mem[rLY] = 0
         if self._verbose:
             print("[{0:03f}] Drawing screen".format(self.time()), flush=True)
 
+        if self._single_image:
+            self.draw_frame(frame)
+            return
+
         reload_photo = False
 
         self._current_frame += 1
 
-        self._pixmap_lock.acquire()
-        if self._redraw_bg: # or self._current_frame > self._last_frame_rendered + 3: #self._pixmap_changed: #self._pixmap != self._prev_pixmap:
-            self.update_pixmap(self._hamulator)
-
-            self._redraw_bg = False
+        if frame.bg_changes != self._drawn_bg_changes:
+            self.update_pixmap(mem)
+            self._drawn_bg_changes = frame.bg_changes
 
+        # only the tiles that changed, VRAM written with what was there already uploads nothing
+        if self._dirty_tiles:
             self._last_frame_rendered = self._current_frame
             if self._verbose:
-                print("updating photo", flush=True)
+                print(f"updating photo, {len(self._dirty_tiles)} tiles", flush=True)
             reload_photo = True
             #self.canvas.delete("all")
             #self._photo = PhotoImage(width=512, height=512)
 
-            self._hamulator._mem[rLY] = 0
-
-            colors = ["#fff" for i in range(0, 512)]
-            color_string = ""
-            for j in range(0,512):
-                for i in range(0, 512):
-                    color = self._pixmap[j % 256][i%256]
-                    fill_color = "#fff"
-                    if color == 3:
-                        fill_color = "#000"
-                    if color == 2:
-                        fill_color = "#555"
-                    if color == 1:
-                        fill_color = "#aaa"
-
-                    colors[i] = fill_color
-                    #self._photo.put("{" + fill_color +"}", (i, j))
-                    #self._rect_ids[j//5][i//5] = self.canvas.create_rectangle(i, j, i+5, j+5, outline=fill_color, fill=fill_color)
-
-                if j == 0:
-                    color_string = "{" + " ".join(colors) + "}"
-                else:
-                    color_string += " {" + " ".join(colors) + "}"
-                #print("color=" + fill_color + ", ", (j, i), flush=True)
-
-            self._photo.put(color_string)
+            # the 512x512 image is the 256x256 map twice over in both directions,
+            # so each rectangle is converted once and put in all four copies
+            for x0, y0, x1, y1 in tile_rects(self._dirty_tiles):
+                data = pixmap_data(self._pixmap, x0, y0, x1, y1)
+                for x, y in ((0, 0), (256, 0), (0, 256), (256, 256)):
+                    self._photo.put(data, to=(x0 + x, y0 + y, x1 + x, y1 + y))
+            self._dirty_tiles = []
 
             #self._photo_id = self.canvas.create_image(0, 0, image = self._photo, anchor=NW)
             #self.canvas.pack(fill = BOTH, expand = 1)
@@ -1413,24 +1601,28 @@ class Renderer:
             #self._bg_x = 0
             #self._bg_y = 0
 
-        if self._redraw_sprites:
-            for sprite in self._sprites:
-                sprite.update()
-            self._redraw_sprites = False
+        if frame.sprite_changes != self._drawn_sprite_changes:
+            self.update_sprites(mem)
+            self._drawn_sprite_changes = frame.sprite_changes
         
-        if self._redraw_window:
-            self._window.update()
-            self._redraw_window = False
+        if frame.window_changes != self._drawn_window_changes:
+            self._window.update(mem)
+            self._drawn_window_changes = frame.window_changes
 
-        if True: #(self._hamulator._mem[rLCDC] & LCDCF_ON) == LCDCF_ON:
+        lcd_on     = mem[rLCDC] & LCDCF_ON    == LCDCF_ON
+        bg_on      = mem[rLCDC] & LCDCF_BGON  == LCDCF_BGON
+        window_on  = mem[rLCDC] & LCDCF_WINON == LCDCF_WINON
+        sprites_on = mem[rLCDC] & LCDCF_OBJON == LCDCF_OBJON
+
+        if True: #(mem[rLCDC] & LCDCF_ON) == LCDCF_ON:
             #show background
-            if self._lcd_on and self._bg_on:
+            if lcd_on and bg_on:
                 self.show_bg()
             else:
                 self.hide_bg()
 
             #show window
-            if self._lcd_on and self._window_on:
+            if lcd_on and window_on:
                 if self._verbose:
                     print("Showing window...")
                 self._window.show()
@@ -1440,7 +1632,7 @@ class Renderer:
                 self._window.hide()
 
             # show sprites
-            if self._lcd_on and self._sprites_on:
+            if lcd_on and sprites_on:
                 for sprite in self._sprites:
                     sprite.show()
             else:
@@ -1450,8 +1642,8 @@ class Renderer:
         if self._verbose:
             print("Redrawing sprites!")
 
-        row_start = self._hamulator._mem[rSCY]
-        col_start = self._hamulator._mem[rSCX]
+        row_start = mem[rSCY]
+        col_start = mem[rSCX]
         if self._verbose:
             print("screen offset = x,y=", col_start, row_start, flush=True)
 
@@ -1476,10 +1668,7 @@ class Renderer:
         self._bg_x  = col_start
         self._bg_y  = row_start
 
-        self._window.move()
-
-        for sprite in self._sprites:
-            sprite.move()
+        self._window.move(mem)
 
         #print(f"(after) x={self._bg_x},y={self._bg_y}", flush=True)
 
@@ -1488,62 +1677,184 @@ class Renderer:
         if self._verbose:
             print("[{0:03f}] Drawn".format(self.time()), flush=True)
 
-        #simulate vblank
-        self._hamulator._mem[rLY] = SCRN_Y
-        #time.sleep(0.001)
+    #diff OAM, the palettes and the sprite size against what was last drawn.
+    #only sprites with a new tile, flags or palette get rasterised again and
+    #only sprites with a new position get moved.
+    def update_sprites(self, mem):
+        oam = mem[_OAMRAM:_OAMRAM + 4 * OAM_COUNT]
+        obj_state = (mem[rOBP0], mem[rOBP1], mem[rLCDC] & LCDCF_OBJ16)
+
+        # tiles rewritten since the last frame that was drawn
+        tiles = mem[_VRAM8000:_VRAM9000]
+        prev_tiles = self._obj_tiles_shadow
+        dirty_tiles = set()
+        if prev_tiles is not None and tiles != prev_tiles:
+            for tile in range(0, 256):
+                if tiles[16 * tile:16 * tile + 16] != prev_tiles[16 * tile:16 * tile + 16]:
+                    dirty_tiles.add(tile)
+        self._obj_tiles_shadow = tiles
+
+        shadow = self._oam_shadow
+        obj_shadow = self._obj_shadow
+        if shadow is None:
+            shadow = [-1 for i in range(0, 4 * OAM_COUNT)]
+            obj_shadow = (-1, -1, -1)
+
+        if oam == shadow and obj_state == obj_shadow and not dirty_tiles:
+            return
+
+        size_changed = obj_state[2] != obj_shadow[2]
+        obp0_changed = obj_state[0] != obj_shadow[0]
+        obp1_changed = obj_state[1] != obj_shadow[1]
 
-        self._pixmap_lock.release()
+        for sprite in self._sprites:
+            i = sprite._index * 4
+            tile_id = oam[i + OAMA_TILEID]
+            flags = oam[i + OAMA_FLAGS]
+            palette_changed = obp1_changed if flags & OAMF_PAL1 == OAMF_PAL1 else obp0_changed
+            new_photo = False
+
+            if size_changed or palette_changed or \
+                tile_id != shadow[i + OAMA_TILEID] or flags != shadow[i + OAMA_FLAGS] or \
+                tile_id in dirty_tiles or (obj_state[2] and tile_id + 1 in dirty_tiles):
+                if self._single_image:
+                    sprite.rasterise(mem)
+                else:
+                    new_photo = sprite.init_from_oam(mem)
+
+            if not self._single_image and (new_photo or \
+                oam[i + OAMA_Y] != shadow[i + OAMA_Y] or oam[i + OAMA_X] != shadow[i + OAMA_X]):
+                sprite.move(mem)
+
+        self._oam_shadow = oam
+        self._obj_shadow = obj_state
+
+    def draw_frame(self, frame):
+        mem = frame.mem
+        self._current_frame += 1
+
+        self.update_layers(frame)
+        lines = self.compose_frame(mem)
+
+        # the only two Tk calls of the frame
+        self._photo.put(" ".join(["{" + " ".join([SHADE_COLORS[color] for color in line]) + "}" for line in lines]))
+        self.canvas.update_idletasks()
 
-    def set_vblank(self, in_vblank):
         if self._verbose:
-            print("acquiring...", flush=True)
-        self._vblank_lock.acquire()
-        
-        if in_vblank:
-            self._hamulator._mem[rLY] = SCRN_Y
-            self._in_vblank = True
-            if self._verbose:
-                print("[{0:03f}] In     VBlank...".format(self.time()), flush=True)
+            print("[{0:03f}] Drawn".format(self.time()), flush=True)
+
+    #bring the bg, window and sprite pixmaps up to date with the frame
+    def update_layers(self, frame):
+        mem = frame.mem
+
+        if frame.bg_changes != self._drawn_bg_changes:
+            self.update_pixmap(mem)
+            self._drawn_bg_changes = frame.bg_changes
+
+        if frame.window_changes != self._drawn_window_changes:
+            self._window.fill(mem)
+            self._drawn_window_changes = frame.window_changes
+
+        if frame.sprite_changes != self._drawn_sprite_changes:
+            self.update_sprites(mem)
+            self._drawn_sprite_changes = frame.sprite_changes
+
+    #build the 160x144 screen out of the bg, window and sprites as lists of shades
+    def compose_frame(self, mem):
+        lcd_on = mem[rLCDC] & LCDCF_ON == LCDCF_ON
+
+        if lcd_on and mem[rLCDC] & LCDCF_BGON == LCDCF_BGON:
+            row_start = mem[rSCY]
+            col_start = mem[rSCX]
+            lines = []
+            for j in range(0, SCRN_Y):
+                row = 256 * ((row_start + j) % 256)
+                line = self._pixmap[row + col_start:row + min(256, col_start + SCRN_X)]
+                if len(line) < SCRN_X:
+                    line += self._pixmap[row:row + SCRN_X - len(line)]
+                lines.append(line)
         else:
-            if self._verbose:
-                print("[{0:03f}] Out of VBlank...".format(self.time()), flush=True)
-            self._in_vblank = False
-            self._hamulator._mem[rLY] = 0
-            self.draw_bg()
+            lines = [bytearray(SCRN_X) for j in range(0, SCRN_Y)]
 
-        if self._verbose:
-            print("releasing...", flush=True)
-        self._vblank_lock.release()
+        if lcd_on and mem[rLCDC] & LCDCF_WINON == LCDCF_WINON:
+            window_x = mem[rWX] - WX_OFS
+            window_y = mem[rWY]
+            start = max(0, window_x)
+            if start < SCRN_X:
+                for j in range(window_y, SCRN_Y):
+                    row = 256 * (j - window_y)
+                    lines[j][start:] = self._window._pixmap[row + start - window_x:row + SCRN_X - window_x]
+
+        # lowest index has priority, so draw it last
+        if lcd_on and mem[rLCDC] & LCDCF_OBJON == LCDCF_OBJON:
+            for sprite in reversed(self._sprites):
+                sprite.blit(lines, mem)
+
+        return lines
 
     def my_update(self):
         if self._verbose:
             print("in my_update", flush=True)
         self._current_frame += 1
-        start = time.monotonic()
 
         if self._verbose:
             current_time = time.monotonic()
             elapsed = current_time - self._last_frame_time
             if elapsed >= 1:
-                print(f"fps={(self._current_frame-self._last_frame_measured)/elapsed:0.3}", flush=True)
+                print(f"fps={(self._current_frame-self._last_frame_measured)/elapsed:0.3} late frames={self._scheduler.late_frames}", flush=True)
                 self._last_frame_measured = self._current_frame
                 self._last_frame_time = current_time
 
         if self._verbose:
             print("update", flush=True)
-        #LCD on
-        if (self._hamulator._mem[rLCDC] & LCDCF_ON) != 0:
-            self.set_vblank(False)
 
-        #draw screen
+        #draw the newest frame the emulation thread finished, if there is one we have not drawn
+        tk_calls = self._tk.count
+        frame = self._front
+        if frame is not None and frame.number != self._presented:
+            draw_start = time.monotonic()
+            self.draw_bg(frame)
+            self._draw_time = time.monotonic() - draw_start
+            self._frames_drawn += 1
+            self._presented = frame.number
+            if self._frames_drawn == 1:
+                startup_mark("first frame")
+                if self._verbose:
+                    print_startup_report()
+        self._frame_tk_calls = self._tk.count - tk_calls
+        if self._verbose:
+            print(f"tk calls this frame={self._frame_tk_calls}", flush=True)
 
-        self.set_vblank(True)
-        elapsed = time.monotonic() - start
-        elapsed = int(elapsed * 1000)
-        time_to_run = max(0, 15 - elapsed)
-        master.after(time_to_run, lambda: self.my_update())
+        self.update_title()
 
-    def update_pixmap(self, hamulator):
+        # a -d run is over and its last frame is up
+        if self._stop_frame is not None and not self._emuthread.is_alive():
+            self.master.destroy()
+            return
+
+        # wake up just after the emulation thread is due to publish the next frame,
+        # in turbo at the display rate. Either way leave the emulation at least as
+        # long as drawing took, so a slow draw skips frames instead of slowing it down
+        if self._scheduler.turbo():
+            time_to_run = 1 / FRAME_RATE
+        else:
+            time_to_run = self._scheduler.time_to_next_frame()
+        time_to_run = max(time_to_run, self._draw_time)
+        self.master.after(int(time_to_run * 1000) + 1, lambda: self.my_update())
+
+    #once a second, show how fast the emulation runs against a DMG and how many of its frames got drawn
+    def update_title(self):
+        current_time = time.monotonic()
+        elapsed = current_time - self._title_time
+        if elapsed < 1:
+            return
+        self.master.title(speed_title(self._frame_number - self._title_frame,
+                                      self._frames_drawn - self._title_drawn, elapsed))
+        self._title_time = current_time
+        self._title_frame = self._frame_number
+        self._title_drawn = self._frames_drawn
+
+    def update_pixmap(self, mem):
 
         # for testing, temporarily write into VRAM.
         #vram_addr = 0x8000
@@ -1552,19 +1863,13 @@ class Renderer:
         #    vram_addr += 1
 
 
-        #self._pixmap_lock.acquire()
-
-        self._pixmap_changed = False
-
-        lcd_flags = hamulator._mem[rLCDC]
+        lcd_flags = mem[rLCDC]
 
         #convert to signed number if $8800 mode
         base = _VRAM9000 if lcd_flags & LCDCF_BG8800 == LCDCF_BG8800 else _VRAM8000
         tilemap_addr = START_TILEMAP1 if lcd_flags & LCDCF_BG9800 == LCDCF_BG9800 else START_TILEMAP2
 
-        self._pixmap_changed = fill_pixmap(self._hamulator._mem, self._prev_pixmap, self._pixmap, base, tilemap_addr)
-
-        #self._pixmap_lock.release()
+        self._dirty_tiles = fill_pixmap(mem, self._pixmap, self._bg_shadow, base, tilemap_addr)
 
         #if self._verbose:       
         #    print(f"update_pixmap={(time.monotonic() - start):0.3}")
@@ -1582,30 +1887,299 @@ class Renderer:
         if self._hamulator._verbose:
             print(op_string + " ; unsupported")
 
+#The Renderer's emulation without Tk. run_frame() runs up to the start of
+#the next vblank with the buttons given and screen() composites what is there.
+#Turbo unless given a speed.
+class HeadlessRenderer(Renderer):
+    def __init__(self, hamulator, unimplemented = True, fast = True, verbose = False, speed = 1.0):
+        super().__init__(None, hamulator, unimplemented, fast, verbose, True, speed)
+
+    def create(self):
+        self.canvas = None
+        self.init()
+
+    def init_joypad(self):
+        self._joypad_buttons = 0
+        self._joypad_lines = 0
+        self.set_movie(None)
+        self._hamulator._mem[rP1] = 0b11111111
+
+    # buttons are latched by run_frame
+    def joypad_event(self):
+        pass
+
+    def init_screen(self):
+        # 256x256 shades, a byte each, row after row
+        self._pixmap = bytearray(256 * 256)
+        self._bg_shadow = TilemapShadow()
+
+    #the latch happens as the previous frame stopped, at the start of vblank
+    def run_frame(self, buttons = 0):
+        self.latch_joypad(buttons)
+        self._ending = False
+        self.run()
+
+    def publish_frame(self):
+        self._frame_number += 1
+        self._ending = True
+
+    #160x144 shades, a bytearray per row
+    def screen(self):
+        frame = Frame(self._frame_number, self._hamulator._mem,
+                      self._bg_changes, self._window_changes, self._sprite_changes)
+        self.update_layers(frame)
+        return self.compose_frame(frame.mem)
+
+    def end(self):
+        self._hamulator.flush_ram()
+        self.save_movie()
+
+    #run_frame is called from the thread that wants the emulation, which is
+    #there for as long as the process
+    def emulation_alive(self):
+        return True
+
+#Emulation side of -p. Runs the same loop as Renderer but without Tk, every
+#frame the Tk process has room for is composited here and left in shared memory.
+class FrameProducer(HeadlessRenderer):
+    def __init__(self, hamulator, shm_name, unimplemented = True, fast = False, verbose = False, speed = 1.0):
+        self._shm = shared_memory.SharedMemory(name=shm_name)
+        self._header = self._shm.buf[:SHM_HEADER_SIZE].cast("I")
+        self._framebuffer = self._shm.buf[SHM_HEADER_SIZE:SHM_SIZE]
+        super().__init__(hamulator, unimplemented, fast, verbose, speed)
+
+    def joypad_event(self):
+        self.latch_joypad(self._header[SHM_JOYPAD])
+
+    #the Tk process only reads the framebuffer between SHM_PUBLISHED changing
+    #and it writing SHM_PRESENTED, so nothing is written there in between
+    def publish_frame(self):
+        self._frame_number += 1
+        header = self._header
+        header[SHM_EMULATED] = self._frame_number
+
+        if header[SHM_QUIT]:
+            self._ending = True
+
+        if header[SHM_PUBLISHED] != header[SHM_PRESENTED]:
+            return
+
+        # same process as the emulation, the frame can look at live memory
+        lines = self.screen()
+        for j in range(0, SCRN_Y):
+            self._framebuffer[j * SCRN_X:(j + 1) * SCRN_X] = bytes(lines[j])
+        header[SHM_PUBLISHED] = self._frame_number
+
+    def end(self):
+        super().end()
+        self._header.release()
+        self._framebuffer.release()
+        self._shm.close()
+
+#a new movie to record into, or the one to play back
+#-d without a movie to play has no input at all
+def open_movie(rom, record, replay, deterministic = False):
+    if replay:
+        return movie.Movie.load(replay, rom)
+    if deterministic:
+        return movie.Movie(movie.rom_digest(rom), playing = True)
+    if record:
+        return movie.Movie(movie.rom_digest(rom))
+    return None
+
+#entry point of the emulation process, nothing in here touches Tk
+def run_emulation_process(file_name, shm_name, unimplemented, fast, emulator_verbose, verbose, speed, gdb_address = None, record = None, replay = None, stop_frame = None):
+    rom = emulator.read_rom(file_name, emulator_verbose, save = not (record or replay or stop_frame is not None))
+    hamulator = emulator.Emulator(rom, emulator_verbose)
+    producer = FrameProducer(hamulator, shm_name, unimplemented, fast, verbose, speed)
+    if gdb_address:
+        gdb_server.GdbServer(debugger.Debugger(producer), producer, gdb_address, verbose).start()
+    producer.set_movie(open_movie(rom, record, replay, stop_frame is not None), record)
+    producer.stop_at_frame(stop_frame)
+    producer.joypad_event()
+    producer.run()
+    producer.end()
+
+#Tk side of -p. Starts the emulation process, uploads the frames it leaves in
+#shared memory and passes the joypad back. Frames are paced by the emulation.
+class FramePresenter:
+    def __init__(self, master, file_name, unimplemented = True, fast = False, emulator_verbose = False, verbose = False, speed = 1.0, gdb_address = None, record = None, replay = None, stop_frame = None):
+        self.master = master
+        self._deterministic = stop_frame is not None
+        self._verbose = verbose
+        self._keys = set()
+        self._joypad_bits = 0
+        self._presented = 0
+        self._frames_drawn = 0
+        self._draw_time = 0
+        self._title_time = time.monotonic()
+        self._title_frame = 0
+        self._title_drawn = 0
+
+        self._shm = shared_memory.SharedMemory(create=True, size=SHM_SIZE)
+        self._header = self._shm.buf[:SHM_HEADER_SIZE].cast("I")
+        self._framebuffer = self._shm.buf[SHM_HEADER_SIZE:SHM_SIZE]
+
+        self.canvas = Canvas(self.master)
+        self._tk = TkCallCounter(self.canvas.tk)
+        self.canvas.tk = self._tk
+        self._frame_tk_calls = 0
+
+        self._photo = PhotoImage(master=self.canvas, width=SCRN_X, height=SCRN_Y)
+        self._photo_id = self.canvas.create_image(0, 0, image = self._photo, anchor=NW)
+        self.canvas.pack(fill = BOTH, expand = 1)
+
+        self.master.bind('<KeyPress>', lambda e: self.key_press(e))
+        self.master.bind('<KeyRelease>', lambda e: self.key_release(e))
+
+        # spawn rather than fork, a forked copy of the Tk interpreter is not safe to use
+        context = multiprocessing.get_context("spawn")
+        self._process = context.Process(target = run_emulation_process, daemon = True,
+            args = (file_name, self._shm.name, unimplemented, fast, emulator_verbose, verbose, speed, gdb_address, record, replay, stop_frame))
+        self._process.start()
+
+        self.master.after(1, lambda: self.my_update())
+
+    def end(self):
+        self._header[SHM_QUIT] = 1
+        self._process.join(1)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._header.release()
+        self._framebuffer.release()
+        self._shm.close()
+        self._shm.unlink()
+
+    def key_press(self, e):
+        if e.keysym in JOYPAD_BUTTON_MAP:
+            self._joypad_bits |= JOYPAD_BUTTON_MASKS[JOYPAD_BUTTON_MAP[e.keysym]]
+            self._header[SHM_JOYPAD] = self._joypad_bits
+        self._keys.add(e.keysym)
+        if ("Control_L" in self._keys or "Control_R" in self._keys) and "c" in self._keys:
+            sys.stderr.write("Exiting...\n")
+            self.master.destroy()
+
+    def key_release(self, e):
+        if e.keysym in JOYPAD_BUTTON_MAP:
+            self._joypad_bits &= ~JOYPAD_BUTTON_MASKS[JOYPAD_BUTTON_MAP[e.keysym]]
+            self._header[SHM_JOYPAD] = self._joypad_bits
+        if e.keysym in self._keys:
+            self._keys.remove(e.keysym)
+
+    def my_update(self):
+        tk_calls = self._tk.count
+        number = self._header[SHM_PUBLISHED]
+        if number != self._presented:
+            draw_start = time.monotonic()
+            pixels = bytes(self._framebuffer)
+            # copied, the emulation may write the next frame now
+            self._header[SHM_PRESENTED] = number
+            self._presented = number
+
+            self._photo.put(" ".join(["{" + " ".join([SHADE_COLORS[color] for color in pixels[j * SCRN_X:(j + 1) * SCRN_X]]) + "}" for j in range(0, SCRN_Y)]))
+            self.canvas.update_idletasks()
+
+            self._draw_time = time.monotonic() - draw_start
+            self._frames_drawn += 1
+            if self._frames_drawn == 1:
+                startup_mark("first frame")
+                if self._verbose:
+                    print_startup_report()
+        self._frame_tk_calls = self._tk.count - tk_calls
+        if self._verbose:
+            print(f"tk calls this frame={self._frame_tk_calls}", flush=True)
+
+        self.update_title()
+
+        # a -d run is over and its last frame is up
+        if self._deterministic and not self._process.is_alive():
+            self.master.destroy()
+            return
+
+        # never poll faster than the display, or than drawing allows
+        time_to_run = max(1 / FRAME_RATE, self._draw_time)
+        self.master.after(int(time_to_run * 1000) + 1, lambda: self.my_update())
+
+    def update_title(self):
+        current_time = time.monotonic()
+        elapsed = current_time - self._title_time
+        if elapsed < 1:
+            return
+        emulated = self._header[SHM_EMULATED]
+        self.master.title(speed_title(emulated - self._title_frame,
+                                      self._frames_drawn - self._title_drawn, elapsed))
+        self._title_time = current_time
+        self._title_frame = emulated
+        self._title_drawn = self._frames_drawn
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Hamulator, a GB Emulator.')
     parser.add_argument('-v', help='enable verbose output for student emulator', action="store_true")
     parser.add_argument('-V', help='enable verbose output for professor driver', action="store_true")
     parser.add_argument('-u', help='print unimplemented instructions', action="store_true")
-    parser.add_argument('-f', help='go faster (may not render all tiles or frames)', action="store_true")
+    parser.add_argument('-f', help='turbo, run as fast as possible and only draw the frames there is time for', action="store_true")
+    parser.add_argument('-s', help='present each frame as a single composited image', action="store_true")
+    parser.add_argument('-p', help='run the emulation in its own process, frames are shared through shared memory (implies -s)', action="store_true")
+    parser.add_argument('-m', help='speed multiplier, 2 runs twice as fast and 0.5 in slow motion', type=float, default=1.0)
+    parser.add_argument('-b', help='pause at this address, with an optional condition, e.g. 0150 or "0150 a == 0x90"', action="append", default=[], metavar='ADDR')
+    parser.add_argument('-w', help='pause after memory in this range is accessed, e.g. C000-C0FF or "FF44 r", w by default', action="append", default=[], metavar='RANGE')
+    parser.add_argument('-g', help='serve the GDB remote protocol on this localhost port or unix socket path', metavar='ADDR')
+    parser.add_argument('-R', help='record the buttons of every frame into this movie file', metavar='FILE')
+    parser.add_argument('-r', help='play back the buttons from this movie file instead of the keyboard', metavar='FILE')
+    parser.add_argument('-d', help='deterministic, input only from -r, stop at this frame and print a digest of the state', type=int, metavar='FRAMES')
     parser.add_argument('rom_file', default="game.gb", help='rom file')
     args = parser.parse_args()
+    if args.m <= 0:
+        parser.error("-m must be greater than 0")
+    if args.d is not None and args.d <= 0:
+        parser.error("-d must be greater than 0")
+    if args.p and (args.b or args.w):
+        parser.error("-b and -w need the emulation in this process, they can't be used with -p")
+    if args.R and args.r:
+        parser.error("-R and -r can't be used together")
+    if args.d is not None and args.R:
+        parser.error("-d takes no keyboard input, there is nothing to record with -R")
 
     emulator_verbose = args.v
     driver_verbose = args.V
     fast_draw = args.f
     unimplemented = args.u
+    single_image = args.s
+    separate_process = args.p
+    speed = args.m
     file_name = args.rom_file
-    rom = emulator.read_rom(file_name, emulator_verbose)
-    #if verbose:
-    #    emulator.print_rom(rom)
-
-    hamulator = emulator.Emulator(rom, emulator_verbose)
 
     # object of class Tk, responsible for creating
     # a tkinter toplevel window
     master = Tk()
-    renderer = Renderer(master, hamulator, unimplemented, fast_draw, driver_verbose)
+    startup_mark("tk")
+
+    if separate_process:
+        # the emulation process reads the rom itself
+        renderer = FramePresenter(master, file_name, unimplemented, fast_draw, emulator_verbose, driver_verbose, speed, args.g, args.R, args.r, args.d)
+    else:
+        # a movie or -d starts from blank battery RAM, whatever is in the .sav file
+        rom = emulator.read_rom(file_name, emulator_verbose, save = not (args.R or args.r or args.d is not None))
+        #if verbose:
+        #    emulator.print_rom(rom)
+        startup_mark("rom loaded")
+
+        hamulator = emulator.Emulator(rom, emulator_verbose)
+        startup_mark("emulator")
+        renderer = Renderer(master, hamulator, unimplemented, fast_draw, driver_verbose, single_image, speed)
+        renderer.set_movie(open_movie(rom, args.R, args.r, args.d is not None), args.R)
+        renderer.stop_at_frame(args.d)
+
+        if args.b or args.w or args.g:
+            debug = debugger.Debugger(renderer)
+            if args.g:
+                gdb_server.GdbServer(debug, renderer, args.g, driver_verbose).start()
+            for breakpoint in args.b:
+                words = breakpoint.split(" ", 1)
+                debug.add_breakpoint(debugger.parse_address(words[0]), words[1] if len(words) > 1 else None)
+            for watch in args.w:
+                words = watch.split()
+                debug.add_watch(*debugger.parse_range(words[0]), words[1] if len(words) > 1 else "w")
 
     # Sets the title to hamulator
     master.title("Hamulator")
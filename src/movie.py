@@ -0,0 +1,119 @@
+import sys
+import time
+import struct
+import hashlib
+import argparse
+import emulator
+
+#Input movies. The joypad is latched once a frame, at boot and then at the
+#start of every vblank, and a movie is the buttons latched each time, so a
+#replay feeds the emulation exactly what it saw when recorded, whatever the
+#frontend. On disk: MAGIC, version, SHA-1 of the ROM, frame count, then the
+#frames as runs of (buttons, LEB128 run length).
+
+MAGIC = b"HBMV"
+VERSION = 1
+HEADER = struct.Struct("<4sB20sI")
+
+def rom_digest(rom):
+    return hashlib.sha1(bytes(rom[0:len(rom)])).digest()
+
+class Movie:
+    def __init__(self, rom_sha1, frames = b"", playing = False):
+        self.rom_sha1 = rom_sha1
+        self.frames = bytearray(frames)
+        self.playing = playing
+        self.position = 0
+
+    #the buttons to latch this frame, the held ones when recording,
+    #the recorded ones when playing and none once the movie is over
+    def latch(self, buttons):
+        if not self.playing:
+            self.frames.append(buttons)
+            return buttons
+        if self.position >= len(self.frames):
+            return 0
+        buttons = self.frames[self.position]
+        self.position += 1
+        return buttons
+
+    def done(self):
+        return self.playing and self.position >= len(self.frames)
+
+    def save(self, file_name):
+        data = bytearray(HEADER.pack(MAGIC, VERSION, self.rom_sha1, len(self.frames)))
+        i = 0
+        while i < len(self.frames):
+            end = i
+            while end < len(self.frames) and self.frames[end] == self.frames[i]:
+                end += 1
+            data.append(self.frames[i])
+            run = end - i
+            while True:
+                data.append((run & 0x7F) | (0x80 if run > 0x7F else 0))
+                run >>= 7
+                if not run:
+                    break
+            i = end
+        with open(file_name, "wb") as f:
+            f.write(data)
+
+    @classmethod
+    def load(cls, file_name, rom = None):
+        with open(file_name, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError(f"{file_name} is not a version {VERSION} movie")
+        magic, version, rom_sha1, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{file_name} is not a version {VERSION} movie")
+        if rom is not None and rom_digest(rom) != rom_sha1:
+            raise ValueError(f"{file_name} was recorded with a different ROM")
+
+        frames = bytearray()
+        i = HEADER.size
+        while len(frames) < count:
+            if i >= len(data):
+                raise ValueError(f"{file_name} is truncated, {len(frames)} of {count} frames")
+            buttons = data[i]
+            i += 1
+            run = 0
+            shift = 0
+            while True:
+                if i >= len(data):
+                    raise ValueError(f"{file_name} is truncated, {len(frames)} of {count} frames")
+                byte = data[i]
+                i += 1
+                run |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            frames += bytes([buttons]) * run
+        return cls(rom_sha1, frames, playing = True)
+
+if __name__ == '__main__':
+    import hamboy
+
+    parser = argparse.ArgumentParser(description='Replay an input movie headless, as fast as it goes.')
+    parser.add_argument('-H', help='print a hash of the screen after every frame', action="store_true")
+    parser.add_argument('-u', help='print unimplemented instructions', action="store_true")
+    parser.add_argument('rom_file', help='rom file')
+    parser.add_argument('movie_file', help='movie file')
+    args = parser.parse_args()
+
+    rom = emulator.read_rom(args.rom_file, save = False)
+    movie = Movie.load(args.movie_file, rom)
+    renderer = hamboy.HeadlessRenderer(emulator.Emulator(rom), args.u)
+    renderer.set_movie(movie)
+
+    start = time.monotonic()
+    while not movie.done():
+        renderer.run_frame()
+        if args.H:
+            print(f"{renderer._frame_number} {hashlib.sha1(b''.join(bytes(line) for line in renderer.screen())).hexdigest()}")
+    elapsed = time.monotonic() - start
+
+    mem = renderer._hamulator._mem
+    print(f"{len(movie.frames)} frames in {elapsed:.2f} s, {len(movie.frames) / elapsed:.0f} frames/s", file=sys.stderr)
+    print(f"screen {hashlib.sha1(b''.join(bytes(line) for line in renderer.screen())).hexdigest()} ram {hashlib.sha1(bytes(mem[0x8000:])).hexdigest()}")
+    renderer.end()
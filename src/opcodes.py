@@ -0,0 +1,519 @@
+#Opcode metadata for the SM83, precomputed from the opcode table so nothing
+#has to be parsed at startup. CB-prefixed opcodes are $CB00-$CBFF.
+
+# opcode: (mnemonic, length in bytes, T-cycles, T-cycles when a branch is not taken, flags ZNHC)
+# the prefix and the opcodes that do not exist have a length and cycles of 0
+OPCODES = {
+    0x00: ("nop", 1, 4, 4, "----"),
+    0x01: ("ld bc,n16", 3, 12, 12, "----"),
+    0x02: ("ld [bc],a", 1, 8, 8, "----"),
+    0x03: ("inc bc", 1, 8, 8, "----"),
+    0x04: ("inc b", 1, 4, 4, "Z0H-"),
+    0x05: ("dec b", 1, 4, 4, "Z1H-"),
+    0x06: ("ld b,n8", 2, 8, 8, "----"),
+    0x07: ("rlca", 1, 4, 4, "000C"),
+    0x08: ("ld [n16],sp", 3, 20, 20, "----"),
+    0x09: ("add hl,bc", 1, 8, 8, "-0HC"),
+    0x0A: ("ld a,[bc]", 1, 8, 8, "----"),
+    0x0B: ("dec bc", 1, 8, 8, "----"),
+    0x0C: ("inc c", 1, 4, 4, "Z0H-"),
+    0x0D: ("dec c", 1, 4, 4, "Z1H-"),
+    0x0E: ("ld c,n8", 2, 8, 8, "----"),
+    0x0F: ("rrca", 1, 4, 4, "000C"),
+    0x10: ("stop", 2, 4, 4, "----"),
+    0x11: ("ld de,n16", 3, 12, 12, "----"),
+    0x12: ("ld [de],a", 1, 8, 8, "----"),
+    0x13: ("inc de", 1, 8, 8, "----"),
+    0x14: ("inc d", 1, 4, 4, "Z0H-"),
+    0x15: ("dec d", 1, 4, 4, "Z1H-"),
+    0x16: ("ld d,n8", 2, 8, 8, "----"),
+    0x17: ("rla", 1, 4, 4, "000C"),
+    0x18: ("jr s8", 2, 12, 12, "----"),
+    0x19: ("add hl,de", 1, 8, 8, "-0HC"),
+    0x1A: ("ld a,[de]", 1, 8, 8, "----"),
+    0x1B: ("dec de", 1, 8, 8, "----"),
+    0x1C: ("inc e", 1, 4, 4, "Z0H-"),
+    0x1D: ("dec e", 1, 4, 4, "Z1H-"),
+    0x1E: ("ld e,n8", 2, 8, 8, "----"),
+    0x1F: ("rra", 1, 4, 4, "000C"),
+    0x20: ("jr nz,s8", 2, 12, 8, "----"),
+    0x21: ("ld hl,n16", 3, 12, 12, "----"),
+    0x22: ("ldi [hl],a", 1, 8, 8, "----"),
+    0x23: ("inc hl", 1, 8, 8, "----"),
+    0x24: ("inc h", 1, 4, 4, "Z0H-"),
+    0x25: ("dec h", 1, 4, 4, "Z1H-"),
+    0x26: ("ld h,n8", 2, 8, 8, "----"),
+    0x27: ("daa", 1, 4, 4, "Z-0C"),
+    0x28: ("jr z,s8", 2, 12, 8, "----"),
+    0x29: ("add hl,hl", 1, 8, 8, "-0HC"),
+    0x2A: ("ldi a,[hl]", 1, 8, 8, "----"),
+    0x2B: ("dec hl", 1, 8, 8, "----"),
+    0x2C: ("inc l", 1, 4, 4, "Z0H-"),
+    0x2D: ("dec l", 1, 4, 4, "Z1H-"),
+    0x2E: ("ld l,n8", 2, 8, 8, "----"),
+    0x2F: ("cpl", 1, 4, 4, "-11-"),
+    0x30: ("jr nc,s8", 2, 12, 8, "----"),
+    0x31: ("ld sp,n16", 3, 12, 12, "----"),
+    0x32: ("ldd [hl],a", 1, 8, 8, "----"),
+    0x33: ("inc sp", 1, 8, 8, "----"),
+    0x34: ("inc [hl]", 1, 12, 12, "Z0H-"),
+    0x35: ("dec [hl]", 1, 12, 12, "Z1H-"),
+    0x36: ("ld [hl],n8", 2, 12, 12, "----"),
+    0x37: ("scf", 1, 4, 4, "-001"),
+    0x38: ("jr c,s8", 2, 12, 8, "----"),
+    0x39: ("add hl,sp", 1, 4, 4, "----"),
+    0x3A: ("ldd a,[hl]", 1, 8, 8, "----"),
+    0x3B: ("dec sp", 1, 4, 4, "----"),
+    0x3C: ("inc a", 1, 4, 4, "Z0H-"),
+    0x3D: ("dec a", 1, 4, 4, "----"),
+    0x3E: ("ld a,n8", 2, 8, 8, "----"),
+    0x3F: ("ccf", 1, 4, 4, "Z0HC"),
+    0x40: ("ld b,b", 1, 4, 4, "----"),
+    0x41: ("ld b,c", 1, 4, 4, "Z0HC"),
+    0x42: ("ld b,d", 1, 4, 4, "----"),
+    0x43: ("ld b,e", 1, 4, 4, "Z0HC"),
+    0x44: ("ld b,h", 1, 4, 4, "----"),
+    0x45: ("ld b,l", 1, 4, 4, "Z0HC"),
+    0x46: ("ld b,[hl]", 1, 8, 8, "----"),
+    0x47: ("ld b,a", 1, 4, 4, "Z0HC"),
+    0x48: ("ld c,b", 1, 4, 4, "----"),
+    0x49: ("ld c,c", 1, 4, 4, "Z0HC"),
+    0x4A: ("ld c,d", 1, 4, 4, "----"),
+    0x4B: ("ld c,e", 1, 4, 4, "Z0HC"),
+    0x4C: ("ld c,h", 1, 4, 4, "----"),
+    0x4D: ("ld c,l", 1, 4, 4, "Z0HC"),
+    0x4E: ("ld c,[hl]", 1, 8, 8, "----"),
+    0x4F: ("ld c,a", 1, 4, 4, "Z1HC"),
+    0x50: ("ld d,b", 1, 4, 4, "----"),
+    0x51: ("ld d,c", 1, 4, 4, "Z1HC"),
+    0x52: ("ld d,d", 1, 4, 4, "----"),
+    0x53: ("ld d,e", 1, 4, 4, "Z1HC"),
+    0x54: ("ld d,h", 1, 4, 4, "----"),
+    0x55: ("ld d,l", 1, 4, 4, "11HC"),
+    0x56: ("ld d,[hl]", 1, 8, 8, "----"),
+    0x57: ("ld d,a", 1, 4, 4, "Z1HC"),
+    0x58: ("ld e,b", 1, 4, 4, "----"),
+    0x59: ("ld e,c", 1, 4, 4, "Z1HC"),
+    0x5A: ("ld e,d", 1, 4, 4, "----"),
+    0x5B: ("ld e,e", 1, 4, 4, "Z1HC"),
+    0x5C: ("ld e,h", 1, 4, 4, "----"),
+    0x5D: ("ld e,l", 1, 4, 4, "Z1HC"),
+    0x5E: ("ld e,[hl]", 1, 8, 8, "----"),
+    0x5F: ("ld e,a", 1, 4, 4, "Z010"),
+    0x60: ("ld h,b", 1, 4, 4, "----"),
+    0x61: ("ld h,c", 1, 4, 4, "Z010"),
+    0x62: ("ld h,d", 1, 4, 4, "----"),
+    0x63: ("ld h,e", 1, 4, 4, "Z010"),
+    0x64: ("ld h,h", 1, 4, 4, "----"),
+    0x65: ("ld h,l", 1, 4, 4, "Z010"),
+    0x66: ("ld h,[hl]", 1, 8, 8, "----"),
+    0x67: ("ld h,a", 1, 4, 4, "Z000"),
+    0x68: ("ld l,b", 1, 4, 4, "----"),
+    0x69: ("ld l,c", 1, 4, 4, "Z000"),
+    0x6A: ("ld l,d", 1, 4, 4, "----"),
+    0x6B: ("ld l,e", 1, 4, 4, "Z000"),
+    0x6C: ("ld l,h", 1, 4, 4, "----"),
+    0x6D: ("ld l,l", 1, 4, 4, "1000"),
+    0x6E: ("ld l,[hl]", 1, 8, 8, "----"),
+    0x6F: ("ld l,a", 1, 4, 4, "Z000"),
+    0x70: ("ld [hl],b", 1, 8, 8, "----"),
+    0x71: ("ld [hl],c", 1, 4, 4, "Z000"),
+    0x72: ("ld [hl],d", 1, 8, 8, "----"),
+    0x73: ("ld [hl],e", 1, 4, 4, "Z000"),
+    0x74: ("ld [hl],h", 1, 8, 8, "----"),
+    0x75: ("ld [hl],l", 1, 4, 4, "Z000"),
+    0x76: ("halt", 1, 4, 4, "----"),
+    0x77: ("ld [hl],a", 1, 4, 4, "Z1HC"),
+    0x78: ("ld a,b", 1, 4, 4, "----"),
+    0x79: ("ld a,c", 1, 4, 4, "Z1HC"),
+    0x7A: ("ld a,d", 1, 4, 4, "----"),
+    0x7B: ("ld a,e", 1, 4, 4, "----"),
+    0x7C: ("ld a,h", 1, 4, 4, "----"),
+    0x7D: ("ld a,l", 1, 4, 4, "----"),
+    0x7E: ("ld a,[hl]", 1, 8, 8, "----"),
+    0x7F: ("ld a,a", 1, 4, 4, "----"),
+    0x80: ("add a,b", 1, 4, 4, "Z0HC"),
+    0x81: ("add a,c", 1, 4, 4, "Z0HC"),
+    0x82: ("add a,d", 1, 4, 4, "Z0HC"),
+    0x83: ("add a,e", 1, 4, 4, "Z0HC"),
+    0x84: ("add a,h", 1, 4, 4, "Z0HC"),
+    0x85: ("add a,l", 1, 4, 4, "Z0HC"),
+    0x86: ("add a,[hl]", 1, 8, 8, "Z0HC"),
+    0x87: ("add a,a", 1, 4, 4, "Z0HC"),
+    0x88: ("adc a,b", 1, 4, 4, "Z0HC"),
+    0x89: ("adc a,c", 1, 4, 4, "Z0HC"),
+    0x8A: ("adc a,d", 1, 4, 4, "Z0HC"),
+    0x8B: ("adc a,e", 1, 4, 4, "Z0HC"),
+    0x8C: ("adc a,h", 1, 4, 4, "Z0HC"),
+    0x8D: ("adc a,l", 1, 4, 4, "Z0HC"),
+    0x8E: ("adc a,[hl]", 1, 8, 8, "Z0HC"),
+    0x8F: ("adc a,a", 1, 4, 4, "Z0HC"),
+    0x90: ("sub b", 1, 4, 4, "Z1HC"),
+    0x91: ("sub c", 1, 4, 4, "Z1HC"),
+    0x92: ("sub d", 1, 4, 4, "Z1HC"),
+    0x93: ("sub e", 1, 4, 4, "Z1HC"),
+    0x94: ("sub h", 1, 4, 4, "Z1HC"),
+    0x95: ("sub l", 1, 4, 4, "Z1HC"),
+    0x96: ("sub [hl]", 1, 8, 8, "Z1HC"),
+    0x97: ("sub a", 1, 4, 4, "11HC"),
+    0x98: ("sbc a,b", 1, 4, 4, "Z1HC"),
+    0x99: ("sbc a,c", 1, 4, 4, "Z1HC"),
+    0x9A: ("sbc a,d", 1, 4, 4, "Z1HC"),
+    0x9B: ("sbc a,e", 1, 4, 4, "Z1HC"),
+    0x9C: ("sbc a,h", 1, 4, 4, "Z1HC"),
+    0x9D: ("sbc a,l", 1, 4, 4, "Z1HC"),
+    0x9E: ("sbc a,[hl]", 1, 8, 8, "Z1HC"),
+    0x9F: ("sbc a,a", 1, 4, 4, "Z1HC"),
+    0xA0: ("and b", 1, 4, 4, "Z010"),
+    0xA1: ("and c", 1, 4, 4, "Z010"),
+    0xA2: ("and d", 1, 4, 4, "Z010"),
+    0xA3: ("and e", 1, 4, 4, "Z010"),
+    0xA4: ("and h", 1, 4, 4, "Z010"),
+    0xA5: ("and l", 1, 4, 4, "Z010"),
+    0xA6: ("and [hl]", 1, 8, 8, "Z010"),
+    0xA7: ("and a", 1, 4, 4, "Z010"),
+    0xA8: ("xor b", 1, 4, 4, "Z000"),
+    0xA9: ("xor c", 1, 4, 4, "Z000"),
+    0xAA: ("xor d", 1, 4, 4, "Z000"),
+    0xAB: ("xor e", 1, 4, 4, "Z000"),
+    0xAC: ("xor h", 1, 4, 4, "Z000"),
+    0xAD: ("xor l", 1, 4, 4, "Z000"),
+    0xAE: ("xor [hl]", 1, 8, 8, "Z000"),
+    0xAF: ("xor a", 1, 4, 4, "1000"),
+    0xB0: ("or b", 1, 4, 4, "Z000"),
+    0xB1: ("or c", 1, 4, 4, "Z000"),
+    0xB2: ("or d", 1, 4, 4, "Z000"),
+    0xB3: ("or e", 1, 4, 4, "Z000"),
+    0xB4: ("or h", 1, 4, 4, "Z000"),
+    0xB5: ("or l", 1, 4, 4, "Z000"),
+    0xB6: ("or [hl]", 1, 8, 8, "Z000"),
+    0xB7: ("or a", 1, 4, 4, "Z000"),
+    0xB8: ("cp b", 1, 4, 4, "Z1HC"),
+    0xB9: ("cp c", 1, 4, 4, "Z1HC"),
+    0xBA: ("cp d", 1, 4, 4, "Z1HC"),
+    0xBB: ("cp e", 1, 4, 4, "Z1HC"),
+    0xBC: ("cp h", 1, 4, 4, "Z1HC"),
+    0xBD: ("cp l", 1, 4, 4, "Z1HC"),
+    0xBE: ("cp [hl]", 1, 8, 8, "Z1HC"),
+    0xBF: ("cp a", 1, 4, 4, "11HC"),
+    0xC0: ("ret nz", 1, 20, 8, "----"),
+    0xC1: ("pop bc", 1, 12, 12, "----"),
+    0xC2: ("jp nz,n16", 3, 16, 12, "----"),
+    0xC3: ("jp n16", 3, 16, 16, "----"),
+    0xC4: ("call nz,n16", 3, 24, 12, "----"),
+    0xC5: ("push bc", 1, 16, 16, "----"),
+    0xC6: ("add a,n8", 2, 8, 8, "Z0HC"),
+    0xC7: ("rst 00h", 1, 16, 16, "----"),
+    0xC8: ("ret z", 1, 20, 8, "----"),
+    0xC9: ("ret", 1, 16, 16, "----"),
+    0xCA: ("jp z,n16", 3, 16, 12, "----"),
+    0xCB: ("prefix", 0, 0, 0, "----"),
+    0xCC: ("call z,n16", 3, 24, 12, "----"),
+    0xCD: ("call n16", 3, 24, 24, "----"),
+    0xCE: ("adc a,n8", 2, 8, 8, "Z0HC"),
+    0xCF: ("rst 08h", 1, 16, 16, "----"),
+    0xD0: ("ret nc", 1, 20, 8, "----"),
+    0xD1: ("pop de", 1, 12, 12, "----"),
+    0xD2: ("jp nc,n16", 3, 16, 12, "----"),
+    0xD3: ("-", 0, 0, 0, "----"),
+    0xD4: ("call nc,n16", 3, 24, 12, "----"),
+    0xD5: ("push de", 1, 16, 16, "----"),
+    0xD6: ("sub n8", 2, 8, 8, "Z1HC"),
+    0xD7: ("rst 10h", 1, 16, 16, "----"),
+    0xD8: ("ret c", 1, 20, 8, "----"),
+    0xD9: ("reti", 1, 16, 16, "----"),
+    0xDA: ("jp c,n16", 3, 16, 12, "----"),
+    0xDB: ("-", 0, 0, 0, "----"),
+    0xDC: ("call c,n16", 3, 24, 12, "----"),
+    0xDD: ("-", 0, 0, 0, "----"),
+    0xDE: ("sbc a,n8", 2, 8, 8, "Z1HC"),
+    0xDF: ("rst 18h", 1, 16, 16, "----"),
+    0xE0: ("ldh [a8],a", 2, 12, 12, "----"),
+    0xE1: ("pop hl", 1, 12, 12, "----"),
+    0xE2: ("ld [c],a", 1, 8, 8, "----"),
+    0xE3: ("-", 0, 0, 0, "----"),
+    0xE4: ("-", 0, 0, 0, "----"),
+    0xE5: ("push hl", 1, 16, 16, "----"),
+    0xE6: ("and n8", 2, 8, 8, "Z010"),
+    0xE7: ("rst 20h", 1, 16, 16, "----"),
+    0xE8: ("add sp,s8", 2, 16, 16, "00HC"),
+    0xE9: ("jp hl", 1, 4, 4, "----"),
+    0xEA: ("ld [n16],a", 3, 16, 16, "----"),
+    0xEB: ("-", 0, 0, 0, "----"),
+    0xEC: ("-", 0, 0, 0, "----"),
+    0xED: ("-", 0, 0, 0, "----"),
+    0xEE: ("xor n8", 2, 8, 8, "Z000"),
+    0xEF: ("rst 28h", 1, 16, 16, "----"),
+    0xF0: ("ldh a,[a8]", 2, 12, 12, "----"),
+    0xF1: ("pop af", 1, 12, 12, "ZNHC"),
+    0xF2: ("ld a,[c]", 1, 8, 8, "----"),
+    0xF3: ("di", 1, 4, 4, "----"),
+    0xF4: ("-", 0, 0, 0, "----"),
+    0xF5: ("push af", 1, 16, 16, "----"),
+    0xF6: ("or n8", 2, 8, 8, "Z000"),
+    0xF7: ("rst 30h", 1, 16, 16, "----"),
+    0xF8: ("ld hl,sp", 2, 12, 12, "00HC"),
+    0xF9: ("ld sp,hl", 1, 8, 8, "----"),
+    0xFA: ("ld a,[n16]", 3, 16, 16, "----"),
+    0xFB: ("ei", 1, 4, 4, "----"),
+    0xFC: ("-", 0, 0, 0, "----"),
+    0xFD: ("-", 0, 0, 0, "----"),
+    0xFE: ("cp n8", 2, 8, 8, "Z1HC"),
+    0xFF: ("rst 38h", 1, 16, 16, "----"),
+    0xCB00: ("rlc b", 2, 8, 8, "Z00C"),
+    0xCB01: ("rlc c", 2, 8, 8, "Z00C"),
+    0xCB02: ("rlc d", 2, 8, 8, "Z00C"),
+    0xCB03: ("rlc e", 2, 8, 8, "Z00C"),
+    0xCB04: ("rlc h", 2, 8, 8, "Z00C"),
+    0xCB05: ("rlc l", 2, 8, 8, "Z00C"),
+    0xCB06: ("rlc [hl]", 2, 16, 16, "Z00C"),
+    0xCB07: ("rlc a", 2, 8, 8, "Z00C"),
+    0xCB08: ("rrc b", 2, 8, 8, "Z00C"),
+    0xCB09: ("rrc c", 2, 8, 8, "Z00C"),
+    0xCB0A: ("rrc d", 2, 8, 8, "Z00C"),
+    0xCB0B: ("rrc e", 2, 8, 8, "Z00C"),
+    0xCB0C: ("rrc h", 2, 8, 8, "Z00C"),
+    0xCB0D: ("rrc l", 2, 8, 8, "Z00C"),
+    0xCB0E: ("rrc [hl]", 2, 16, 16, "Z00C"),
+    0xCB0F: ("rrc a", 2, 8, 8, "Z00C"),
+    0xCB10: ("rl b", 2, 8, 8, "Z00C"),
+    0xCB11: ("rl c", 2, 8, 8, "Z00C"),
+    0xCB12: ("rl d", 2, 8, 8, "Z00C"),
+    0xCB13: ("rl e", 2, 8, 8, "Z00C"),
+    0xCB14: ("rl h", 2, 8, 8, "Z00C"),
+    0xCB15: ("rl l", 2, 8, 8, "Z00C"),
+    0xCB16: ("rl [hl]", 2, 16, 16, "Z00C"),
+    0xCB17: ("rl a", 2, 8, 8, "Z00C"),
+    0xCB18: ("rr b", 2, 8, 8, "Z00C"),
+    0xCB19: ("rr c", 2, 8, 8, "Z00C"),
+    0xCB1A: ("rr d", 2, 8, 8, "Z00C"),
+    0xCB1B: ("rr e", 2, 8, 8, "Z00C"),
+    0xCB1C: ("rr h", 2, 8, 8, "Z00C"),
+    0xCB1D: ("rr l", 2, 8, 8, "Z00C"),
+    0xCB1E: ("rr [hl]", 2, 16, 16, "Z00C"),
+    0xCB1F: ("rr a", 2, 8, 8, "Z00C"),
+    0xCB20: ("sla b", 2, 8, 8, "Z00C"),
+    0xCB21: ("sla c", 2, 8, 8, "Z00C"),
+    0xCB22: ("sla d", 2, 8, 8, "Z00C"),
+    0xCB23: ("sla e", 2, 8, 8, "Z00C"),
+    0xCB24: ("sla h", 2, 8, 8, "Z00C"),
+    0xCB25: ("sla l", 2, 8, 8, "Z00C"),
+    0xCB26: ("sla [hl]", 2, 16, 16, "Z00C"),
+    0xCB27: ("sla a", 2, 8, 8, "Z00C"),
+    0xCB28: ("sra b", 2, 8, 8, "Z00C"),
+    0xCB29: ("sra c", 2, 8, 8, "Z00C"),
+    0xCB2A: ("sra d", 2, 8, 8, "Z00C"),
+    0xCB2B: ("sra e", 2, 8, 8, "Z00C"),
+    0xCB2C: ("sra h", 2, 8, 8, "Z00C"),
+    0xCB2D: ("sra l", 2, 8, 8, "Z00C"),
+    0xCB2E: ("sra [hl]", 2, 16, 16, "Z00C"),
+    0xCB2F: ("sra a", 2, 8, 8, "Z00C"),
+    0xCB30: ("swap b", 2, 8, 8, "Z000"),
+    0xCB31: ("swap c", 2, 8, 8, "Z000"),
+    0xCB32: ("swap d", 2, 8, 8, "Z000"),
+    0xCB33: ("swap e", 2, 8, 8, "Z000"),
+    0xCB34: ("swap h", 2, 8, 8, "Z000"),
+    0xCB35: ("swap l", 2, 8, 8, "Z000"),
+    0xCB36: ("swap [hl]", 2, 16, 16, "Z000"),
+    0xCB37: ("swap a", 2, 8, 8, "Z000"),
+    0xCB38: ("srl b", 2, 8, 8, "Z00C"),
+    0xCB39: ("srl c", 2, 8, 8, "Z00C"),
+    0xCB3A: ("srl d", 2, 8, 8, "Z00C"),
+    0xCB3B: ("srl e", 2, 8, 8, "Z00C"),
+    0xCB3C: ("srl h", 2, 8, 8, "Z00C"),
+    0xCB3D: ("srl l", 2, 8, 8, "Z00C"),
+    0xCB3E: ("srl [hl]", 2, 16, 16, "Z00C"),
+    0xCB3F: ("srl a", 2, 8, 8, "Z00C"),
+    0xCB40: ("bit 0,b", 2, 8, 8, "Z01-"),
+    0xCB41: ("bit 0,c", 2, 8, 8, "Z01-"),
+    0xCB42: ("bit 0,d", 2, 8, 8, "Z01-"),
+    0xCB43: ("bit 0,e", 2, 8, 8, "Z01-"),
+    0xCB44: ("bit 0,h", 2, 8, 8, "Z01-"),
+    0xCB45: ("bit 0,l", 2, 8, 8, "Z01-"),
+    0xCB46: ("bit 0,[hl]", 2, 12, 12, "Z01-"),
+    0xCB47: ("bit 0,a", 2, 8, 8, "Z01-"),
+    0xCB48: ("bit 1,b", 2, 8, 8, "Z01-"),
+    0xCB49: ("bit 1,c", 2, 8, 8, "Z01-"),
+    0xCB4A: ("bit 1,d", 2, 8, 8, "Z01-"),
+    0xCB4B: ("bit 1,e", 2, 8, 8, "Z01-"),
+    0xCB4C: ("bit 1,h", 2, 8, 8, "Z01-"),
+    0xCB4D: ("bit 1,l", 2, 8, 8, "Z01-"),
+    0xCB4E: ("bit 1,[hl]", 2, 12, 12, "Z01-"),
+    0xCB4F: ("bit 1,a", 2, 8, 8, "Z01-"),
+    0xCB50: ("bit 2,b", 2, 8, 8, "Z01-"),
+    0xCB51: ("bit 2,c", 2, 8, 8, "Z01-"),
+    0xCB52: ("bit 2,d", 2, 8, 8, "Z01-"),
+    0xCB53: ("bit 2,e", 2, 8, 8, "Z01-"),
+    0xCB54: ("bit 2,h", 2, 8, 8, "Z01-"),
+    0xCB55: ("bit 2,l", 2, 8, 8, "Z01-"),
+    0xCB56: ("bit 2,[hl]", 2, 12, 12, "Z01-"),
+    0xCB57: ("bit 2,a", 2, 8, 8, "Z01-"),
+    0xCB58: ("bit 3,b", 2, 8, 8, "Z01-"),
+    0xCB59: ("bit 3,c", 2, 8, 8, "Z01-"),
+    0xCB5A: ("bit 3,d", 2, 8, 8, "Z01-"),
+    0xCB5B: ("bit 3,e", 2, 8, 8, "Z01-"),
+    0xCB5C: ("bit 3,h", 2, 8, 8, "Z01-"),
+    0xCB5D: ("bit 3,l", 2, 8, 8, "Z01-"),
+    0xCB5E: ("bit 3,[hl]", 2, 12, 12, "Z01-"),
+    0xCB5F: ("bit 3,a", 2, 8, 8, "Z01-"),
+    0xCB60: ("bit 4,b", 2, 8, 8, "Z01-"),
+    0xCB61: ("bit 4,c", 2, 8, 8, "Z01-"),
+    0xCB62: ("bit 4,d", 2, 8, 8, "Z01-"),
+    0xCB63: ("bit 4,e", 2, 8, 8, "Z01-"),
+    0xCB64: ("bit 4,h", 2, 8, 8, "Z01-"),
+    0xCB65: ("bit 4,l", 2, 8, 8, "Z01-"),
+    0xCB66: ("bit 4,[hl]", 2, 12, 12, "Z01-"),
+    0xCB67: ("bit 4,a", 2, 8, 8, "Z01-"),
+    0xCB68: ("bit 5,b", 2, 8, 8, "Z01-"),
+    0xCB69: ("bit 5,c", 2, 8, 8, "Z01-"),
+    0xCB6A: ("bit 5,d", 2, 8, 8, "Z01-"),
+    0xCB6B: ("bit 5,e", 2, 8, 8, "Z01-"),
+    0xCB6C: ("bit 5,h", 2, 8, 8, "Z01-"),
+    0xCB6D: ("bit 5,l", 2, 8, 8, "Z01-"),
+    0xCB6E: ("bit 5,[hl]", 2, 12, 12, "Z01-"),
+    0xCB6F: ("bit 5,a", 2, 8, 8, "Z01-"),
+    0xCB70: ("bit 6,b", 2, 8, 8, "Z01-"),
+    0xCB71: ("bit 6,c", 2, 8, 8, "Z01-"),
+    0xCB72: ("bit 6,d", 2, 8, 8, "Z01-"),
+    0xCB73: ("bit 6,e", 2, 8, 8, "Z01-"),
+    0xCB74: ("bit 6,h", 2, 8, 8, "Z01-"),
+    0xCB75: ("bit 6,l", 2, 8, 8, "Z01-"),
+    0xCB76: ("bit 6,[hl]", 2, 12, 12, "Z01-"),
+    0xCB77: ("bit 6,a", 2, 8, 8, "Z01-"),
+    0xCB78: ("bit 7,b", 2, 8, 8, "Z01-"),
+    0xCB79: ("bit 7,c", 2, 8, 8, "Z01-"),
+    0xCB7A: ("bit 7,d", 2, 8, 8, "Z01-"),
+    0xCB7B: ("bit 7,e", 2, 8, 8, "Z01-"),
+    0xCB7C: ("bit 7,h", 2, 8, 8, "Z01-"),
+    0xCB7D: ("bit 7,l", 2, 8, 8, "Z01-"),
+    0xCB7E: ("bit 7,[hl]", 2, 12, 12, "Z01-"),
+    0xCB7F: ("bit 7,a", 2, 8, 8, "Z01-"),
+    0xCB80: ("res 0,b", 2, 8, 8, "----"),
+    0xCB81: ("res 0,c", 2, 8, 8, "----"),
+    0xCB82: ("res 0,d", 2, 8, 8, "----"),
+    0xCB83: ("res 0,e", 2, 8, 8, "----"),
+    0xCB84: ("res 0,h", 2, 8, 8, "----"),
+    0xCB85: ("res 0,l", 2, 8, 8, "----"),
+    0xCB86: ("res 0,[hl]", 2, 16, 16, "----"),
+    0xCB87: ("res 0,a", 2, 8, 8, "----"),
+    0xCB88: ("res 1,b", 2, 8, 8, "----"),
+    0xCB89: ("res 1,c", 2, 8, 8, "----"),
+    0xCB8A: ("res 1,d", 2, 8, 8, "----"),
+    0xCB8B: ("res 1,e", 2, 8, 8, "----"),
+    0xCB8C: ("res 1,h", 2, 8, 8, "----"),
+    0xCB8D: ("res 1,l", 2, 8, 8, "----"),
+    0xCB8E: ("res 1,[hl]", 2, 16, 16, "----"),
+    0xCB8F: ("res 1,a", 2, 8, 8, "----"),
+    0xCB90: ("res 2,b", 2, 8, 8, "----"),
+    0xCB91: ("res 2,c", 2, 8, 8, "----"),
+    0xCB92: ("res 2,d", 2, 8, 8, "----"),
+    0xCB93: ("res 2,e", 2, 8, 8, "----"),
+    0xCB94: ("res 2,h", 2, 8, 8, "----"),
+    0xCB95: ("res 2,l", 2, 8, 8, "----"),
+    0xCB96: ("res 2,[hl]", 2, 16, 16, "----"),
+    0xCB97: ("res 2,a", 2, 8, 8, "----"),
+    0xCB98: ("res 3,b", 2, 8, 8, "----"),
+    0xCB99: ("res 3,c", 2, 8, 8, "----"),
+    0xCB9A: ("res 3,d", 2, 8, 8, "----"),
+    0xCB9B: ("res 3,e", 2, 8, 8, "----"),
+    0xCB9C: ("res 3,h", 2, 8, 8, "----"),
+    0xCB9D: ("res 3,l", 2, 8, 8, "----"),
+    0xCB9E: ("res 3,[hl]", 2, 16, 16, "----"),
+    0xCB9F: ("res 3,a", 2, 8, 8, "----"),
+    0xCBA0: ("res 4,b", 2, 8, 8, "----"),
+    0xCBA1: ("res 4,c", 2, 8, 8, "----"),
+    0xCBA2: ("res 4,d", 2, 8, 8, "----"),
+    0xCBA3: ("res 4,e", 2, 8, 8, "----"),
+    0xCBA4: ("res 4,h", 2, 8, 8, "----"),
+    0xCBA5: ("res 4,l", 2, 8, 8, "----"),
+    0xCBA6: ("res 4,[hl]", 2, 16, 16, "----"),
+    0xCBA7: ("res 4,a", 2, 8, 8, "----"),
+    0xCBA8: ("res 5,b", 2, 8, 8, "----"),
+    0xCBA9: ("res 5,c", 2, 8, 8, "----"),
+    0xCBAA: ("res 5,d", 2, 8, 8, "----"),
+    0xCBAB: ("res 5,e", 2, 8, 8, "----"),
+    0xCBAC: ("res 5,h", 2, 8, 8, "----"),
+    0xCBAD: ("res 5,l", 2, 8, 8, "----"),
+    0xCBAE: ("res 5,[hl]", 2, 16, 16, "----"),
+    0xCBAF: ("res 5,a", 2, 8, 8, "----"),
+    0xCBB0: ("res 6,b", 2, 8, 8, "----"),
+    0xCBB1: ("res 6,c", 2, 8, 8, "----"),
+    0xCBB2: ("res 6,d", 2, 8, 8, "----"),
+    0xCBB3: ("res 6,e", 2, 8, 8, "----"),
+    0xCBB4: ("res 6,h", 2, 8, 8, "----"),
+    0xCBB5: ("res 6,l", 2, 8, 8, "----"),
+    0xCBB6: ("res 6,[hl]", 2, 16, 16, "----"),
+    0xCBB7: ("res 6,a", 2, 8, 8, "----"),
+    0xCBB8: ("res 7,b", 2, 8, 8, "----"),
+    0xCBB9: ("res 7,c", 2, 8, 8, "----"),
+    0xCBBA: ("res 7,d", 2, 8, 8, "----"),
+    0xCBBB: ("res 7,e", 2, 8, 8, "----"),
+    0xCBBC: ("res 7,h", 2, 8, 8, "----"),
+    0xCBBD: ("res 7,l", 2, 8, 8, "----"),
+    0xCBBE: ("res 7,[hl]", 2, 16, 16, "----"),
+    0xCBBF: ("res 7,a", 2, 8, 8, "----"),
+    0xCBC0: ("set 0,b", 2, 8, 8, "----"),
+    0xCBC1: ("set 0,c", 2, 8, 8, "----"),
+    0xCBC2: ("set 0,d", 2, 8, 8, "----"),
+    0xCBC3: ("set 0,e", 2, 8, 8, "----"),
+    0xCBC4: ("set 0,h", 2, 8, 8, "----"),
+    0xCBC5: ("set 0,l", 2, 8, 8, "----"),
+    0xCBC6: ("set 0,[hl]", 2, 16, 16, "----"),
+    0xCBC7: ("set 0,a", 2, 8, 8, "----"),
+    0xCBC8: ("set 1,b", 2, 8, 8, "----"),
+    0xCBC9: ("set 1,c", 2, 8, 8, "----"),
+    0xCBCA: ("set 1,d", 2, 8, 8, "----"),
+    0xCBCB: ("set 1,e", 2, 8, 8, "----"),
+    0xCBCC: ("set 1,h", 2, 8, 8, "----"),
+    0xCBCD: ("set 1,l", 2, 8, 8, "----"),
+    0xCBCE: ("set 1,[hl]", 2, 16, 16, "----"),
+    0xCBCF: ("set 1,a", 2, 8, 8, "----"),
+    0xCBD0: ("set 2,b", 2, 8, 8, "----"),
+    0xCBD1: ("set 2,c", 2, 8, 8, "----"),
+    0xCBD2: ("set 2,d", 2, 8, 8, "----"),
+    0xCBD3: ("set 2,e", 2, 8, 8, "----"),
+    0xCBD4: ("set 2,h", 2, 8, 8, "----"),
+    0xCBD5: ("set 2,l", 2, 8, 8, "----"),
+    0xCBD6: ("set 2,[hl]", 2, 16, 16, "----"),
+    0xCBD7: ("set 2,a", 2, 8, 8, "----"),
+    0xCBD8: ("set 3,b", 2, 8, 8, "----"),
+    0xCBD9: ("set 3,c", 2, 8, 8, "----"),
+    0xCBDA: ("set 3,d", 2, 8, 8, "----"),
+    0xCBDB: ("set 3,e", 2, 8, 8, "----"),
+    0xCBDC: ("set 3,h", 2, 8, 8, "----"),
+    0xCBDD: ("set 3,l", 2, 8, 8, "----"),
+    0xCBDE: ("set 3,[hl]", 2, 16, 16, "----"),
+    0xCBDF: ("set 3,a", 2, 8, 8, "----"),
+    0xCBE0: ("set 4,b", 2, 8, 8, "----"),
+    0xCBE1: ("set 4,c", 2, 8, 8, "----"),
+    0xCBE2: ("set 4,d", 2, 8, 8, "----"),
+    0xCBE3: ("set 4,e", 2, 8, 8, "----"),
+    0xCBE4: ("set 4,h", 2, 8, 8, "----"),
+    0xCBE5: ("set 4,l", 2, 8, 8, "----"),
+    0xCBE6: ("set 4,[hl]", 2, 16, 16, "----"),
+    0xCBE7: ("set 4,a", 2, 8, 8, "----"),
+    0xCBE8: ("set 5,b", 2, 8, 8, "----"),
+    0xCBE9: ("set 5,c", 2, 8, 8, "----"),
+    0xCBEA: ("set 5,d", 2, 8, 8, "----"),
+    0xCBEB: ("set 5,e", 2, 8, 8, "----"),
+    0xCBEC: ("set 5,h", 2, 8, 8, "----"),
+    0xCBED: ("set 5,l", 2, 8, 8, "----"),
+    0xCBEE: ("set 5,[hl]", 2, 16, 16, "----"),
+    0xCBEF: ("set 5,a", 2, 8, 8, "----"),
+    0xCBF0: ("set 6,b", 2, 8, 8, "----"),
+    0xCBF1: ("set 6,c", 2, 8, 8, "----"),
+    0xCBF2: ("set 6,d", 2, 8, 8, "----"),
+    0xCBF3: ("set 6,e", 2, 8, 8, "----"),
+    0xCBF4: ("set 6,h", 2, 8, 8, "----"),
+    0xCBF5: ("set 6,l", 2, 8, 8, "----"),
+    0xCBF6: ("set 6,[hl]", 2, 16, 16, "----"),
+    0xCBF7: ("set 6,a", 2, 8, 8, "----"),
+    0xCBF8: ("set 7,b", 2, 8, 8, "----"),
+    0xCBF9: ("set 7,c", 2, 8, 8, "----"),
+    0xCBFA: ("set 7,d", 2, 8, 8, "----"),
+    0xCBFB: ("set 7,e", 2, 8, 8, "----"),
+    0xCBFC: ("set 7,h", 2, 8, 8, "----"),
+    0xCBFD: ("set 7,l", 2, 8, 8, "----"),
+    0xCBFE: ("set 7,[hl]", 2, 16, 16, "----"),
+    0xCBFF: ("set 7,a", 2, 8, 8, "----"),
+}
@@ -0,0 +1,142 @@
+import os
+import sys
+import marshal
+import hashlib
+import opcodes
+import disassembler
+
+#What is worked out about a ROM (how each opcode touches memory, the blocks
+#and loops of the code) is kept on disk between launches, one marshal file
+#per ROM and kind read back in a single read. The driver only needs the
+#opcodes to start, the code is analysed the first time the debugger lists it.
+#The key is a hash of the code that does the analysis and, for the code
+#analysis only, of the ROM, so editing either one starts cold again. The
+#opcode tables are the same for every ROM and never read it, a launch doesn't
+#hash the ROM. HAMBOY_CACHE moves the directory, empty turns it off.
+CACHE_DIR = os.environ.get("HAMBOY_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "hamboy"))
+ANALYSIS_SOURCES = (opcodes.__file__, disassembler.__file__, __file__)
+
+#opcodes that write back to the memory operand they read
+READ_MODIFY_WRITE = ("inc", "dec", "rlc", "rrc", "rl", "rr", "sla", "sra", "srl", "swap", "set", "res")
+
+_version = None
+_loaded = {}
+
+#marshal's format belongs to the python version, so that is part of it too
+def emulator_version():
+    global _version
+    if _version is None:
+        version = hashlib.sha1(sys.version.encode())
+        for file_name in ANALYSIS_SOURCES:
+            with open(file_name, "rb") as f:
+                version.update(f.read())
+        _version = version.hexdigest()[:16]
+    return _version
+
+def rom_hash(rom):
+    return hashlib.sha1(bytes(rom[0:len(rom)])).hexdigest()
+
+#what the results of an analysis depend on besides the emulator
+def cache_key(rom, kind):
+    if kind == "opcodes":
+        return kind
+    return f"{rom_hash(rom)}-{kind}"
+
+def cache_path(rom, kind):
+    return os.path.join(CACHE_DIR, f"{cache_key(rom, kind)}-{emulator_version()}.marshal")
+
+#(op string, operand bytes, cycles, cycles when a branch is taken) for every
+#opcode, the first cycles being those of a branch not taken,
+#the stores as (destination operand, operand bytes to rewind to reach it,
+#what to add to its address once the opcode has run, bytes written) and the
+#loads as the operand they read from. push, call and rst store to "sp".
+def classify_opcodes():
+    all_ops = {opcode: (op[0], op[1] - (1 if opcode < 256 else 2) if op[1] else 0, op[3], op[2])
+               for opcode, op in opcodes.OPCODES.items()}
+    stores = {}
+    loads = {}
+    for opcode, op in all_ops.items():
+        op_str = op[0]
+        name = op_str.split(" ")[0]
+        if name in ("push", "call", "rst"):
+            stores[opcode] = ("sp", 0, 0, 2)
+        if " " not in op_str:
+            continue
+        operands = op_str.split(" ")[1].split(",")
+        if op_str.startswith(("ld [", "ldi [", "ldd [", "ldh [")):
+            first_addr = operands[0][1:-1]
+            bytes_to_rewind = 2 if first_addr == 'n16' else 1 if first_addr == 'a8' else 0
+            # hl has moved on by the time the store is checked
+            offset = -1 if name == "ldi" else 1 if name == "ldd" else 0
+            stores[opcode] = (first_addr, bytes_to_rewind, offset, 2 if operands[1] == "sp" else 1)
+        elif name in READ_MODIFY_WRITE and "[hl]" in operands:
+            stores[opcode] = ("hl", 0, 0, 1)
+        # the destination of a load is a write, the stores above cover those
+        if op_str.startswith("ld"):
+            operands = operands[1:]
+        sources = [operand[1:-1] for operand in operands if operand[0] == "["]
+        if sources:
+            loads[opcode] = sources[0]
+    return all_ops, stores, loads
+
+def analyse_opcodes(rom):
+    all_ops, stores, loads = classify_opcodes()
+    return {"ops": all_ops, "stores": stores, "loads": loads}
+
+#blocks as start: (end, successors, calls), loops as (header, blocks, idle).
+#Code the disassembler can't follow gives none, the emulator runs without it
+def analyse_code(rom):
+    try:
+        analysis = disassembler.Analysis(rom)
+    except Exception as e:
+        print(f"analysis: code not analysed, {e}", flush=True)
+        return {"blocks": {}, "functions": [], "loops": []}
+    return {"blocks": {start: (block.end, block.successors, block.calls) for start, block in analysis.blocks.items()},
+            "functions": sorted(analysis.functions),
+            "loops": [(loop.header, loop.blocks, loop.is_idle()) for loop in analysis.loops]}
+
+ANALYSES = {"opcodes": analyse_opcodes, "code": analyse_code}
+
+#"ops", "stores" and "loads", what the driver needs to start
+def load(rom, verbose = False):
+    return cached(rom, "opcodes", verbose)
+
+#"blocks", "functions" and "loops"
+def load_code(rom, verbose = False):
+    return cached(rom, "code", verbose)
+
+#every driver of a ROM in the process gets the same results, nothing writes to them
+def cached(rom, kind, verbose = False):
+    key = cache_key(rom, kind)
+    if key not in _loaded:
+        _loaded[key] = fetch(rom, kind, verbose)
+    return _loaded[key]
+
+def fetch(rom, kind, verbose = False):
+    if not CACHE_DIR:
+        return ANALYSES[kind](rom)
+
+    path = cache_path(rom, kind)
+    try:
+        with open(path, "rb") as f:
+            results = marshal.loads(f.read())
+        if verbose:
+            print(f"analysis: loaded {path}", flush=True)
+        return results
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    results = ANALYSES[kind](rom)
+    # written next to its final name and renamed, so a reader never sees half a file
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}"
+        with open(temp_path, "wb") as f:
+            f.write(marshal.dumps(results))
+        os.replace(temp_path, path)
+        if verbose:
+            print(f"analysis: saved {path}", flush=True)
+    except OSError as e:
+        if verbose:
+            print(f"analysis: not cached, {e}", flush=True)
+    return results
@@ -0,0 +1,143 @@
+import os
+import time
+import random
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+import emulator
+import hamboy
+
+#N headless emulators of one ROM for batch play-testing, spread over a pool of
+#worker processes. step() gives every instance its buttons for one frame and
+#returns all the screens, downsampled, as one array in shared memory that the
+#workers write straight into, plus rewards read from memory addresses. IO
+#registers among them (LY, DIV, TIMA, P1) read as the CPU would see them.
+#Every instance maps the ROM file read only, so its pages are shared by all.
+#Battery RAM is not loaded or saved, each instance starts from a blank one.
+
+def frame_shape(downsample):
+    return (hamboy.SCRN_Y + downsample - 1) // downsample, (hamboy.SCRN_X + downsample - 1) // downsample
+
+def new_instance(rom_file, unimplemented):
+    rom = emulator.read_rom(rom_file, save = False)
+    return hamboy.HeadlessRenderer(emulator.Emulator(rom), unimplemented)
+
+#entry point of a worker, runs instances first to first + count - 1
+def run_worker(rom_file, first, count, shm_name, downsample, reward_addresses, unimplemented, conn):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    height, width = frame_shape(downsample)
+    size = height * width
+    instances = [new_instance(rom_file, unimplemented) for i in range(0, count)]
+
+    def write_frames():
+        frames = shm.buf
+        for i, instance in enumerate(instances):
+            offset = (first + i) * size
+            for j, line in enumerate(instance.screen()[::downsample]):
+                frames[offset + j * width:offset + (j + 1) * width] = bytes(line[::downsample])
+        del frames
+
+    try:
+        while True:
+            command, args = conn.recv()
+            if command == "step":
+                rewards = []
+                for i, instance in enumerate(instances):
+                    instance.run_frame(args[i])
+                    rewards.append([instance.read_mem(addr) for addr in reward_addresses])
+                write_frames()
+                conn.send(rewards)
+            elif command == "reset":
+                for instance in instances:
+                    instance.end()
+                instances = [new_instance(rom_file, unimplemented) for i in range(0, count)]
+                write_frames()
+                conn.send(None)
+            else:
+                break
+    finally:
+        for instance in instances:
+            instance.end()
+        shm.close()
+
+class VecEmulator:
+    def __init__(self, rom_file, count, workers = None, downsample = 2, reward_addresses = (), unimplemented = True):
+        self.count = count
+        self.shape = (count,) + frame_shape(downsample)
+        workers = max(1, min(count, workers or os.cpu_count() or 1))
+
+        self._shm = shared_memory.SharedMemory(create=True, size=count * self.shape[1] * self.shape[2])
+        # shades 0-3, one byte a pixel, laid out as shape. np.frombuffer(frames, np.uint8).reshape(shape)
+        # makes an array of it without a copy. Overwritten by the next step(), copy to keep
+        self.frames = self._shm.buf[:count * self.shape[1] * self.shape[2]]
+        self._frame_size = self.shape[1] * self.shape[2]
+
+        # instances split as evenly as they go
+        self._ranges = []
+        self._conns = []
+        self._processes = []
+        context = multiprocessing.get_context("spawn")
+        first = 0
+        for i in range(0, workers):
+            count_here = count // workers + (1 if i < count % workers else 0)
+            conn, child_conn = context.Pipe()
+            process = context.Process(target = run_worker, daemon = True,
+                args = (rom_file, first, count_here, self._shm.name, downsample, list(reward_addresses), unimplemented, child_conn))
+            process.start()
+            self._ranges.append((first, first + count_here))
+            self._conns.append(conn)
+            self._processes.append(process)
+            first += count_here
+
+    #actions are joypad bits in hamboy.JOYPAD_BUTTONS order, one per instance.
+    #Every worker is sent its share before any is waited for.
+    def step(self, actions):
+        assert len(actions) == self.count
+        for conn, (start, end) in zip(self._conns, self._ranges):
+            conn.send(("step", list(actions[start:end])))
+        rewards = []
+        for conn in self._conns:
+            rewards += conn.recv()
+        return self.frames, rewards
+
+    def frame(self, index):
+        return self.frames[index * self._frame_size:(index + 1) * self._frame_size]
+
+    def reset(self):
+        for conn in self._conns:
+            conn.send(("reset", None))
+        for conn in self._conns:
+            conn.recv()
+        return self.frames
+
+    def close(self):
+        for conn in self._conns:
+            conn.send(("close", None))
+        for process in self._processes:
+            process.join()
+        self.frames.release()
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run many headless copies of a ROM with random input and report the aggregate speed.')
+    parser.add_argument('-n', help='instances', type=int, default=8)
+    parser.add_argument('-j', help='worker processes, one per core by default', type=int)
+    parser.add_argument('-f', help='frames to run', type=int, default=300)
+    parser.add_argument('-d', help='downsample factor', type=int, default=2)
+    parser.add_argument('rom_file', help='rom file')
+    args = parser.parse_args()
+
+    with VecEmulator(args.rom_file, args.n, args.j, args.d) as env:
+        env.reset()
+        start = time.monotonic()
+        for frame in range(0, args.f):
+            env.step([random.getrandbits(8) for i in range(0, args.n)])
+        elapsed = time.monotonic() - start
+    print(f"{args.n} instances, {len(env._processes)} workers: {args.n * args.f / elapsed:.0f} frames/s ({args.n * args.f / elapsed / hamboy.FRAME_RATE:.1f}x real time)")
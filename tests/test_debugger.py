@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import emulator
+import hamboy
+import debugger
+
+#a 32 KB ROM that loops reading $C000 through [hl] and through [n16]
+def read_loop_rom():
+    rom = bytearray(0x8000)
+    rom[0x100:0x104] = bytes([0xC3, 0x50, 0x01, 0x00])
+    # ld hl,$C000; loop: ld a,[hl]; ld a,[$C001]; jr loop
+    rom[0x150:0x15A] = bytes([0x21, 0x00, 0xC0, 0x7E, 0xFA, 0x01, 0xC0, 0x18, 0xFA])
+    return rom
+
+class ReadWatchTest(unittest.TestCase):
+    def setUp(self):
+        self.driver = hamboy.HeadlessRenderer(emulator.Emulator(emulator.Cartridge(read_loop_rom())))
+        self.debug = debugger.Debugger(self.driver)
+        self.hits = []
+        self.debug.on_pause = self.hits.append
+
+    def test_wram_read_through_register_pair(self):
+        self.debug.add_watch(0xC000, 0xC000, "r")
+        self.driver.run_frame()
+        self.assertTrue(self.hits)
+        self.assertTrue(all("$C000" in hit for hit in self.hits))
+
+    def test_wram_read_through_n16(self):
+        self.debug.add_watch(0xC001, 0xC001, "r")
+        self.driver.run_frame()
+        self.assertTrue(self.hits)
+        self.assertTrue(all("$C001" in hit for hit in self.hits))
+
+    def test_removed_watch_stops(self):
+        self.debug.add_watch(0xC000, 0xDFFF, "r")
+        self.debug.remove_watch(0xC000, 0xDFFF)
+        self.driver.run_frame()
+        self.assertEqual(self.hits, [])
+        self.assertFalse(self.driver._io_read_pages[0xC0])
+
+if __name__ == "__main__":
+    unittest.main()
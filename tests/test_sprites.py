@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import emulator
+import hamboy
+
+#just enough canvas to follow where each image is
+class StubCanvas:
+    def __init__(self):
+        self.items = {}
+
+    def create_image(self, x, y, **options):
+        item = len(self.items) + 1
+        self.items[item] = [x, y]
+        return item
+
+    def move(self, item, dx, dy):
+        self.items[item][0] += dx
+        self.items[item][1] += dy
+
+    def delete(self, item):
+        del self.items[item]
+
+    def tag_raise(self, item, above):
+        pass
+
+    def itemconfigure(self, item, **options):
+        pass
+
+class StubPhoto:
+    def __init__(self, **options):
+        pass
+
+    def put(self, data):
+        pass
+
+class SpriteResizeTest(unittest.TestCase):
+    def setUp(self):
+        rom = bytearray(0x8000)
+        self.driver = hamboy.HeadlessRenderer(emulator.Emulator(emulator.Cartridge(rom)))
+        self.canvas = StubCanvas()
+        self.driver._single_image = False
+        self.driver._sprites = [hamboy.Sprite(self.driver._hamulator, None, self.canvas, i) for i in range(0, hamboy.OAM_COUNT)]
+        for sprite in self.driver._sprites:
+            sprite.init(0)
+        self.mem = self.driver._hamulator._mem
+
+    def position(self, sprite):
+        return self.canvas.items[sprite._photo_id]
+
+    @mock.patch.object(hamboy, "PhotoImage", StubPhoto)
+    def test_obj_size_change_keeps_position(self):
+        mem = self.mem
+        mem[hamboy.rLCDC] = hamboy.LCDCF_ON | hamboy.LCDCF_OBJON
+        mem[hamboy._OAMRAM + hamboy.OAMA_Y] = 50 + hamboy.OAM_Y_OFS
+        mem[hamboy._OAMRAM + hamboy.OAMA_X] = 60 + hamboy.OAM_X_OFS
+        sprite = self.driver._sprites[0]
+
+        self.driver.update_sprites(mem)
+        self.assertEqual(self.position(sprite), [60, 50])
+
+        mem[hamboy.rLCDC] |= hamboy.LCDCF_OBJ16
+        self.driver.update_sprites(mem)
+        self.assertEqual(sprite._height, 16)
+        self.assertEqual(self.position(sprite), [60, 50])
+
+        mem[hamboy.rLCDC] &= ~hamboy.LCDCF_OBJ16
+        self.driver.update_sprites(mem)
+        self.assertEqual(sprite._height, 8)
+        self.assertEqual(self.position(sprite), [60, 50])
+
+if __name__ == "__main__":
+    unittest.main()
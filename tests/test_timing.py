@@ -0,0 +1,32 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import emulator
+import hamboy
+
+LOOP_CYCLES = 8 + 4 + 12 + 16 # inc bc, xor a, jp nz not taken, jp z taken
+
+#a 32 KB ROM counting loops in bc, each through a jp nz that is never taken
+def branch_loop_rom():
+    rom = bytearray(0x8000)
+    rom[0x100:0x104] = bytes([0xC3, 0x50, 0x01, 0x00])
+    # loop: inc bc; xor a; jp nz,$0150; jp z,$0150
+    rom[0x150:0x159] = bytes([0x03, 0xAF, 0xC2, 0x50, 0x01, 0xCA, 0x50, 0x01])
+    return rom
+
+class BranchCyclesTest(unittest.TestCase):
+    def test_not_taken_branch_cycles(self):
+        driver = hamboy.HeadlessRenderer(emulator.Emulator(emulator.Cartridge(branch_loop_rom())))
+        regs = driver._hamulator._regs
+        driver.run_frame()
+        start_loops = regs["b"] << 8 | regs["c"]
+        start_cycles = driver._hamulator._cycles
+        driver.run_frame()
+        loops = (regs["b"] << 8 | regs["c"]) - start_loops
+        cycles = driver._hamulator._cycles - start_cycles
+        self.assertAlmostEqual(loops, cycles / LOOP_CYCLES, delta = 1)
+
+if __name__ == "__main__":
+    unittest.main()